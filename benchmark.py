@@ -0,0 +1,293 @@
+"""
+M&M Tunning - Benchmark das consultas e gravações mais usadas (sem interface).
+
+Mede as versões headless dos caminhos quentes da interface:
+- cards do Dashboard (`dashboard_counts` + estoque baixo);
+- cada lista das telas (`refresh_*_tree`): primeira página, ordenação por
+  cada coluna e sincronização sem alterações; lista de OS e OS a faturar;
+- busca no catálogo e `check_vehicle_and_client` (com e sem cache);
+- abertura de OS e `update_stock_and_invoice`.
+
+O resultado vai para um arquivo JSON (tempos em ms: mínimo, mediana, p95...),
+junto com a versão, o SQLite e o volume de dados. `--compare anterior.json`
+mostra a variação de cada medida e aponta as regressões.
+
+As gravações rodam numa cópia temporária do banco (a não ser com `--in-place`).
+Para gerar volume, veja datagen.py.
+
+Uso sem interface:
+    python benchmark.py --db volume.db --output bench_v2.json [--compare bench_v1.json]
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from database import DB_NAME, SCHEMA_VERSION, connect, init_db
+from repository import PAGE_SIZE, Repository
+
+# Execuções por medida (as gravações usam WRITE_REPEAT OS novas)
+DEFAULT_REPEAT = 20
+DEFAULT_WRITE_REPEAT = 50
+WARMUP = 1
+
+# Variação (fração da mediana) acima da qual o --compare aponta regressão
+DEFAULT_THRESHOLD = 0.2
+
+# Listas das telas: nome -> (atributo do repo, ordenação e sentido padrão da tela)
+TREES = {
+    "parts": ("parts.listing", None, False),
+    "catalog": ("parts.listing", "name", False),
+    "tools": ("tools.listing", None, False),
+    "cars": ("vehicles.cars_listing", "model", False),
+    "motorcycles": ("vehicles.motorcycles_listing", "model", False),
+    "users": ("users.listing", None, False),
+    "invoices": ("invoices.listing", "date", True),
+}
+
+SEARCH_TERMS = ("filtro", "pastilha bosch", "turbina garrett racing", "SIN-OIL")
+
+SAMPLE_SEED = 7  # Sorteio das placas e peças usadas nas medidas
+PLATE_SAMPLE = 200
+ITEMS_PER_ORDER = 3
+BENCH_SELLER = "Benchmark"
+
+
+def _resolve(repo, path):
+    target = repo
+    for name in path.split("."):
+        target = getattr(target, name)
+    return target
+
+
+def measure(func, repeat, warmup=WARMUP):
+    """Executa `func` `warmup` + `repeat` vezes; devolve a duração de cada execução medida (s)."""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def summarize(samples):
+    ms = sorted(s * 1000 for s in samples)
+    return {
+        "runs": len(ms),
+        "min_ms": round(ms[0], 3),
+        "median_ms": round(statistics.median(ms), 3),
+        "p95_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 3),
+        "mean_ms": round(statistics.fmean(ms), 3),
+        "max_ms": round(ms[-1], 3),
+    }
+
+
+def _cycle(values):
+    state = {"i": -1}
+
+    def next_value():
+        state["i"] = (state["i"] + 1) % len(values)
+        return values[state["i"]]
+
+    return next_value
+
+
+def read_cases(repo, conn):
+    """[(nome, função)] das medidas de leitura."""
+    cases = [("dashboard", lambda: (repo.dashboard_counts(), repo.parts.low_stock(5)))]
+
+    for name, (path, sort, desc) in TREES.items():
+        listing = _resolve(repo, path)
+        cases.append((f"tree.{name}.load", lambda l=listing, s=sort, d=desc: (
+            l.current_seq(), l.page_keyed(None, PAGE_SIZE, s, d))))
+        seq = listing.current_seq()
+        cases.append((f"tree.{name}.sync", lambda l=listing, q=seq: l.changed_since(q)))
+        if name == "catalog":
+            continue  # Mesma consulta de "parts"
+        for column in listing.query.sort_columns:
+            cases.append((f"tree.{name}.sort.{column}",
+                          lambda l=listing, c=column: l.page_keyed(None, PAGE_SIZE, c, False)))
+
+    cases.append(("services.list", repo.services.list))
+    cases.append(("services.open_uninvoiced", repo.services.list_open_uninvoiced))
+    for term in SEARCH_TERMS:
+        cases.append((f"search.{term}", lambda t=term: repo.parts.search(t)))
+
+    rng = random.Random(SAMPLE_SEED)
+    plates = conn.execute("SELECT u.username, v.license_plate FROM vehicle_index v "
+                          "JOIN users u ON u.id = v.client_id").fetchall()
+    sample = rng.sample(plates, min(PLATE_SAMPLE, len(plates)))
+    if sample:
+        check = _cycle(sample)
+
+        def cold_check():
+            repo.cache.clear()
+            repo.vehicles.check_vehicle_and_client(*check())
+
+        cases.append(("check_vehicle_and_client.cold", cold_check))
+        # Mesmo cliente e placa de novo (OS reaberta para o mesmo veículo): resposta do cache
+        cases.append(("check_vehicle_and_client.warm",
+                      lambda: repo.vehicles.check_vehicle_and_client(*sample[0])))
+    return cases
+
+
+def write_cases(repo, conn, repeat):
+    """Abertura de `repeat` OS e o faturamento de cada uma: [(nome, amostras)]."""
+    rng = random.Random(SAMPLE_SEED)
+    owners = conn.execute("SELECT client_id, license_plate FROM vehicle_index WHERE client_id IS NOT NULL "
+                          "LIMIT 1000").fetchall()
+    # Peças com saldo para todas as OS (1 unidade por OS): o faturamento mede o caminho de sucesso
+    stocked = conn.execute("SELECT id, price FROM parts WHERE qty >= ? LIMIT 500", (repeat,)).fetchall()
+    if not owners or len(stocked) < ITEMS_PER_ORDER:
+        return []
+
+    opened = []
+
+    def open_order():
+        client_id, plate = rng.choice(owners)
+        items = [(part_id, 1, price) for part_id, price in rng.sample(stocked, ITEMS_PER_ORDER)]
+        opened.append(repo.services.open_service_order(client_id, plate, "Benchmark", 120.0, items,
+                                                       BENCH_SELLER))
+
+    open_samples = measure(open_order, repeat, warmup=0)
+    pending = list(opened)
+
+    def invoice():
+        ok, result = repo.invoices.update_stock_and_invoice(pending.pop(0), True)
+        if not ok:
+            raise RuntimeError(result)
+
+    invoice_samples = measure(invoice, repeat, warmup=0)
+    return [("open_service_order", open_samples), ("update_stock_and_invoice", invoice_samples)]
+
+
+def row_counts(conn):
+    return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("parts", "tools", "users", "cars", "motorcycles", "services", "service_parts",
+                          "invoices")}
+
+
+def git_version():
+    """Versão do código (git describe), se o diretório for um repositório git."""
+    try:
+        out = subprocess.run(["git", "describe", "--always", "--dirty", "--tags"], capture_output=True,
+                             text=True, timeout=5, cwd=os.path.dirname(os.path.abspath(__file__)))
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def run(db_path, repeat=DEFAULT_REPEAT, write_repeat=DEFAULT_WRITE_REPEAT, in_place=False, label=None,
+        progress=None):
+    """Executa todas as medidas e devolve o resultado (dicionário pronto para JSON)."""
+    tmpdir = None
+    bench_path = db_path
+    if not in_place and write_repeat:
+        tmpdir = tempfile.mkdtemp(prefix="mmtunning_bench_")
+        bench_path = os.path.join(tmpdir, os.path.basename(db_path))
+        # backup() copia uma imagem consistente mesmo com o banco em uso
+        source, target = sqlite3.connect(db_path), sqlite3.connect(bench_path)
+        try:
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
+    repo = Repository(connect(bench_path))
+    try:
+        conn = repo.conn
+        result = {
+            "label": label or git_version(),
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "schema": SCHEMA_VERSION,
+            "sqlite": sqlite3.sqlite_version,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "db": os.path.abspath(db_path),
+            "repeat": repeat,
+            "write_repeat": write_repeat,
+            "rows": row_counts(conn),
+            "results": {},
+        }
+        for name, func in read_cases(repo, conn):
+            result["results"][name] = summarize(measure(func, repeat))
+            if progress:
+                progress(name, result["results"][name])
+        if write_repeat:
+            for name, samples in write_cases(repo, conn, write_repeat):
+                result["results"][name] = summarize(samples)
+                if progress:
+                    progress(name, result["results"][name])
+        return result
+    finally:
+        repo.close()
+        if tmpdir:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def compare(current, previous, threshold=DEFAULT_THRESHOLD):
+    """Linhas de texto com a variação da mediana de cada medida; regressões marcadas com '!'."""
+    lines = []
+    for name, stats in current["results"].items():
+        before = previous.get("results", {}).get(name)
+        if before is None:
+            lines.append(f"  {name}: {stats['median_ms']:.3f} ms (nova)")
+            continue
+        old, new = before["median_ms"], stats["median_ms"]
+        change = (new - old) / old if old else 0.0
+        mark = "!" if change > threshold else " "
+        lines.append(f"{mark} {name}: {old:.3f} -> {new:.3f} ms ({change:+.0%})")
+    return lines
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark - M&M Tunning")
+    parser.add_argument("--db", default=DB_NAME, help="arquivo do banco SQLite")
+    parser.add_argument("--output", default=None, help="arquivo JSON de resultado (padrão: benchmark_<data>.json)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="execuções por medida de leitura")
+    parser.add_argument("--writes", type=int, default=DEFAULT_WRITE_REPEAT,
+                        help="OS abertas e faturadas na medida de gravação (0 desliga)")
+    parser.add_argument("--in-place", action="store_true",
+                        help="grava no próprio banco em vez de numa cópia temporária")
+    parser.add_argument("--label", default=None, help="nome da versão medida (padrão: git describe)")
+    parser.add_argument("--compare", default=None, help="JSON de um benchmark anterior para comparar")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="variação da mediana considerada regressão (ex.: 0.2 = 20%%)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    init_db(args.db)
+    output = args.output or f"benchmark_{datetime.datetime.now():%Y%m%d_%H%M%S}.json"
+    result = run(args.db, args.repeat, args.writes, args.in_place, args.label,
+                 lambda name, stats: print(f"{name}: {stats['median_ms']:.3f} ms", file=sys.stderr))
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"Resultado gravado em {output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)
+        lines = compare(result, previous, args.threshold)
+        print(f"Comparação com {previous.get('label') or args.compare}:")
+        if previous.get("rows") != result["rows"]:
+            print("Atenção: os volumes de dados são diferentes; compare bancos gerados com a mesma semente.")
+        print("\n".join(lines))
+        if any(line.startswith("!") for line in lines):
+            return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
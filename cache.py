@@ -0,0 +1,98 @@
+"""
+M&M Tunning - Cache em memória para as consultas pequenas e repetidas.
+
+Usuário -> id e a validação cliente + placa são lidos a cada cadastro de veículo
+e abertura de OS. `LookupCache` guarda esses resultados em LRUs limitados (um por tipo de consulta), pertencentes a uma
+conexão.
+
+Invalidação:
+- escritas feitas pelo próprio Repository chamam `invalidate`/`clear`;
+- escritas de outras conexões (o worker, outra estação ou um script) mudam o
+  `PRAGMA data_version` desta conexão, e aí todo o cache é descartado.
+Quem gravar SQL direto na mesma conexão (fora do Repository, ex.: importer.py)
+deve chamar `clear()` depois de cada commit.
+"""
+
+from collections import OrderedDict
+
+# Entradas por tipo de consulta antes de descartar a menos usada
+DEFAULT_MAXSIZE = 512
+
+
+class LRUCache:
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, loader):
+        """Valor guardado para `key`, ou `loader()` (guardado se não for None)."""
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._data.move_to_end(key)
+            return value
+        value = loader()
+        if value is not None:
+            self._data[key] = value
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def invalidate(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+
+class LookupCache:
+    """LRUs nomeados de uma conexão, descartados quando outra conexão grava no banco."""
+
+    def __init__(self, conn, maxsize=DEFAULT_MAXSIZE):
+        self.conn = conn
+        self.maxsize = maxsize
+        self.caches = {}
+        self.invalidations = 0
+        self._data_version = None
+
+    def lookup(self, name, key, loader):
+        self._check_data_version()
+        cache = self.caches.get(name)
+        if cache is None:
+            cache = self.caches[name] = LRUCache(self.maxsize)
+        return cache.get(key, loader)
+
+    def invalidate(self, name, key=None):
+        """Descarta uma chave (ou o cache `name` inteiro) após uma escrita desta conexão."""
+        cache = self.caches.get(name)
+        if cache is None:
+            return
+        if key is None:
+            cache.clear()
+        else:
+            cache.invalidate(key)
+
+    def clear(self):
+        for cache in self.caches.values():
+            cache.clear()
+
+    def _check_data_version(self):
+        # data_version só muda com commits de OUTRAS conexões; é lido sem acessar tabelas
+        version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != self._data_version:
+            if self._data_version is not None:
+                self.invalidations += 1
+                self.clear()
+            self._data_version = version
+
+    def stats(self):
+        """{nome: (acertos, faltas, entradas)} para acompanhamento na tela de Configurações."""
+        return {name: (cache.hits, cache.misses, len(cache)) for name, cache in sorted(self.caches.items())}
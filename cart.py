@@ -0,0 +1,125 @@
+"""
+M&M Tunning - Carrinho da Ordem de Serviço (sem interface gráfica).
+
+As linhas do catálogo exibidas na tela de Serviços (listagem paginada ou
+busca) são guardadas já tipadas em `Cart.catalog`, por ID da peça (só as que
+estão na tela ou no carrinho, ver `retain`; `clear` descarta todas): adicionar
+ao carrinho não relê o preço do texto formatado da Treeview nem consulta o
+banco. O total é atualizado a cada alteração (sem somar o carrinho de novo)
+e cada operação devolve apenas a linha afetada, para a tela atualizar só ela.
+
+A falta de estoque (quantidade no carrinho acima do estoque do catálogo) é
+acompanhada na hora, inclusive quando o catálogo sincroniza um estoque novo;
+a baixa continua sendo feita no Faturamento.
+"""
+
+
+class CatalogItem:
+    """Linha do catálogo: (id, name, sku, qty, price) da PartsRepository, com tipos."""
+
+    __slots__ = ("id", "name", "sku", "stock", "price")
+
+    def __init__(self, part_id, name, sku, stock, price):
+        self.id = part_id
+        self.name = name
+        self.sku = sku
+        self.stock = stock or 0
+        self.price = price or 0.0
+
+
+class CartLine:
+    __slots__ = ("item", "qty", "price")
+
+    def __init__(self, item, qty):
+        self.item = item
+        self.qty = qty
+        self.price = item.price  # Preço unitário de quando a peça entrou no carrinho
+
+    @property
+    def subtotal(self):
+        return self.qty * self.price
+
+    @property
+    def shortfall(self):
+        """Unidades que faltam no estoque atual (0 se há saldo)."""
+        return max(0, self.qty - self.item.stock)
+
+
+class Cart:
+    def __init__(self):
+        self.catalog = {}  # part_id -> CatalogItem (linhas já exibidas no catálogo/busca)
+        self.lines = {}  # part_id -> CartLine, na ordem em que entraram
+        self.total = 0.0
+        self.short = set()  # part_ids com falta de estoque
+
+    def remember(self, row):
+        """Guarda (ou atualiza) a linha do catálogo `row` = (id, name, sku, qty, price).
+
+        Devolve a CartLine da peça se ela está no carrinho e o estoque mudou (para a tela
+        atualizar o aviso de falta), senão None."""
+        part_id, name, sku, stock, price = row
+        item = self.catalog.get(part_id)
+        if item is None:
+            self.catalog[part_id] = CatalogItem(part_id, name, sku, stock, price)
+            return None
+        changed = item.stock != (stock or 0)
+        item.name, item.sku, item.stock, item.price = name, sku, stock or 0, price or 0.0
+        line = self.lines.get(part_id)
+        if line is not None and changed:
+            self._track(line)
+            return line
+        return None
+
+    def add(self, part_id, qty):
+        """Soma `qty` unidades da peça (já vista no catálogo) e devolve a linha do carrinho."""
+        item = self.catalog.get(part_id)
+        if item is None:
+            raise LookupError(f"Peça #{part_id} não está no catálogo carregado.")
+        if qty <= 0:
+            raise ValueError("Quantidade inválida (deve ser um número inteiro > 0).")
+        line = self.lines.get(part_id)
+        if line is None:
+            line = self.lines[part_id] = CartLine(item, 0)
+        line.qty += qty
+        self.total += qty * line.price
+        self._track(line)
+        return line
+
+    def remove(self, part_id):
+        """Tira a peça do carrinho; devolve a linha removida (ou None)."""
+        line = self.lines.pop(part_id, None)
+        if line is not None:
+            self.total -= line.subtotal
+            self.short.discard(part_id)
+            if not self.lines:
+                self.total = 0.0  # Sem resíduo de arredondamento com o carrinho vazio
+        return line
+
+    def clear(self):
+        """Carrinho vazio para uma nova OS; o catálogo guardado também é descartado."""
+        self.catalog.clear()
+        self.lines.clear()
+        self.short.clear()
+        self.total = 0.0
+
+    def retain(self, part_ids):
+        """Mantém no catálogo só as peças de `part_ids` (as exibidas) e as que estão no carrinho."""
+        self.catalog = {part_id: item for part_id, item in self.catalog.items()
+                        if part_id in part_ids or part_id in self.lines}
+
+    def _track(self, line):
+        if line.shortfall:
+            self.short.add(line.item.id)
+        else:
+            self.short.discard(line.item.id)
+
+    def shortages(self):
+        """Linhas com falta de estoque, na ordem do carrinho."""
+        return [self.lines[part_id] for part_id in self.lines if part_id in self.short]
+
+    def items(self):
+        """[(part_id, qty, price_unit)] no formato de ServicesRepository.open_service_order."""
+        return [(part_id, line.qty, line.price) for part_id, line in self.lines.items()]
+
+    def __len__(self):
+        return len(self.lines)
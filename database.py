@@ -0,0 +1,611 @@
+"""
+M&M Tunning - Esquema do banco SQLite e migrações versionadas.
+
+A versão do esquema fica gravada em `PRAGMA user_version`. Cada entrada de
+MIGRATIONS leva o banco da versão anterior para a sua; as pendentes rodam
+juntas em uma única transação. Bancos antigos (criados antes das migrações,
+com user_version = 0) são atualizados no lugar, sem perda de dados.
+"""
+
+import sqlite3
+import datetime
+import random
+import time
+from contextlib import contextmanager
+
+DB_NAME = "mmtunning.db"
+
+# Espera (ms) por um lock de outra estação antes de o SQLite devolver SQLITE_BUSY
+BUSY_TIMEOUT_MS = 2000
+# Novas tentativas de uma transação de escrita que recebeu SQLITE_BUSY (ver retry_on_busy)
+BUSY_RETRIES = 3
+BUSY_BACKOFF = 0.05  # Espera inicial (s) entre tentativas; dobra a cada nova tentativa
+
+
+# ---------- Migrações ----------
+# v1: tabelas base (equivalentes ao antigo init_db, por isso IF NOT EXISTS)
+SCHEMA_V1 = [
+    '''
+    CREATE TABLE IF NOT EXISTS users
+    (
+        id       INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE,
+        password TEXT,
+        fullname TEXT,
+        email    TEXT,
+        phone    TEXT,
+        role     TEXT, -- 'admin' ou 'client'
+        photo    TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS parts
+    (
+        id          INTEGER PRIMARY KEY AUTOINCREMENT,
+        name        TEXT,
+        sku         TEXT UNIQUE,
+        qty         INTEGER,
+        price       REAL,
+        description TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS tools
+    (
+        id          INTEGER PRIMARY KEY AUTOINCREMENT,
+        name        TEXT,
+        code        TEXT UNIQUE,
+        available   INTEGER,
+        description TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS cars
+    (
+        id            INTEGER PRIMARY KEY AUTOINCREMENT,
+        client_id     INTEGER,
+        license_plate TEXT UNIQUE,
+        brand         TEXT,
+        model         TEXT,
+        year          INTEGER,
+        color         TEXT,
+        engine        TEXT,
+        FOREIGN KEY (client_id) REFERENCES users (id)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS motorcycles
+    (
+        id            INTEGER PRIMARY KEY AUTOINCREMENT,
+        client_id     INTEGER,
+        license_plate TEXT UNIQUE,
+        brand         TEXT,
+        model         TEXT,
+        year          INTEGER,
+        engine_cc     INTEGER,
+        FOREIGN KEY (client_id) REFERENCES users (id)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS services
+    (
+        id            INTEGER PRIMARY KEY AUTOINCREMENT,
+        client_id     INTEGER,
+        vehicle_plate TEXT, -- Placa do veículo em serviço
+        description   TEXT,
+        labor_price   REAL, -- Preço da Mão de Obra
+        final_total   REAL, -- Total final após faturamento (inclui labor_price + peças)
+        date          TEXT,
+        status        TEXT,
+        seller_name   TEXT, -- Vendedor/Atendente que abriu a OS
+        FOREIGN KEY (client_id) REFERENCES users (id)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS service_parts
+    (
+        service_id INTEGER,
+        part_id    INTEGER,
+        qty_used   INTEGER,
+        price_unit REAL,
+        FOREIGN KEY (service_id) REFERENCES services (id),
+        FOREIGN KEY (part_id) REFERENCES parts (id),
+        PRIMARY KEY (service_id, part_id)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS invoices
+    (
+        id         INTEGER PRIMARY KEY AUTOINCREMENT,
+        service_id INTEGER,
+        total      REAL,
+        date       TEXT,
+        paid       INTEGER,
+        FOREIGN KEY (service_id) REFERENCES services (id)
+    )
+    ''',
+]
+
+# v2: índices secundários para Dashboard, Faturamento e listagens
+SCHEMA_V2 = [
+    # Dashboard (COUNT de abertos) e "Serviços Abertos Prontos para Faturar" (WHERE status ORDER BY date)
+    "CREATE INDEX IF NOT EXISTS idx_services_status_date ON services(status, date)",
+    # refresh_services_tree (ORDER BY date DESC)
+    "CREATE INDEX IF NOT EXISTS idx_services_date ON services(date)",
+    "CREATE INDEX IF NOT EXISTS idx_services_client ON services(client_id)",
+    # LEFT JOIN invoices ON service_id e listagem de faturas por data
+    "CREATE INDEX IF NOT EXISTS idx_invoices_service ON invoices(service_id)",
+    "CREATE INDEX IF NOT EXISTS idx_invoices_date ON invoices(date)",
+    # A PK de service_parts começa por service_id; buscas por peça precisam deste
+    "CREATE INDEX IF NOT EXISTS idx_service_parts_part ON service_parts(part_id)",
+    "CREATE INDEX IF NOT EXISTS idx_cars_client ON cars(client_id)",
+    "CREATE INDEX IF NOT EXISTS idx_motorcycles_client ON motorcycles(client_id)",
+    # Listagens ordenadas (cadastros de veículos, catálogo e alertas de estoque baixo)
+    "CREATE INDEX IF NOT EXISTS idx_cars_brand_model ON cars(brand, model)",
+    "CREATE INDEX IF NOT EXISTS idx_motorcycles_brand_model ON motorcycles(brand, model)",
+    "CREATE INDEX IF NOT EXISTS idx_parts_name ON parts(name)",
+    "CREATE INDEX IF NOT EXISTS idx_parts_qty ON parts(qty)",
+]
+
+# v3: registro de alterações mantido por triggers, usado para atualizar as listas da UI
+# apenas com as linhas que mudaram (em vez de apagar e reinserir tudo)
+CHANGE_TRACKED_TABLES = ["users", "parts", "tools", "cars", "motorcycles", "services", "invoices"]
+
+SCHEMA_V3 = [
+    '''
+    CREATE TABLE IF NOT EXISTS change_log
+    (
+        seq        INTEGER PRIMARY KEY AUTOINCREMENT,
+        table_name TEXT    NOT NULL,
+        row_id     INTEGER NOT NULL,
+        op         TEXT    NOT NULL -- 'I', 'U' ou 'D'
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_change_log_table_seq ON change_log(table_name, seq)",
+] + [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_{table}_log_{op.lower()}
+    AFTER {event} ON {table}
+    BEGIN
+        INSERT INTO change_log(table_name, row_id, op) VALUES ('{table}', {ref}.id, '{op}');
+    END
+    """
+    for table in CHANGE_TRACKED_TABLES
+    for event, op, ref in (("INSERT", "I", "NEW"), ("UPDATE", "U", "NEW"), ("DELETE", "D", "OLD"))
+]
+
+# v4: contadores do Dashboard mantidos por triggers (uma única linha, lida pela PK)
+STATS_COUNTED_TABLES = ["parts", "tools", "users", "cars", "motorcycles"]
+
+STATS_RECOUNT_SQL = '''
+    INSERT OR REPLACE INTO stats(id, parts, tools, users, cars, motorcycles, services_open)
+    SELECT 1,
+           (SELECT COUNT(*) FROM parts),
+           (SELECT COUNT(*) FROM tools),
+           (SELECT COUNT(*) FROM users),
+           (SELECT COUNT(*) FROM cars),
+           (SELECT COUNT(*) FROM motorcycles),
+           (SELECT COUNT(*) FROM services WHERE status = 'Aberto')
+'''
+
+# OS abertas: `IS` (e não `=`) para que um status NULL conte 0, em vez de gravar NULL no contador
+SERVICES_STATS_TRIGGERS = [
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_services_stats_insert
+    AFTER INSERT ON services
+    BEGIN
+        UPDATE stats SET services_open = services_open + (NEW.status IS 'Aberto') WHERE id = 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_services_stats_delete
+    AFTER DELETE ON services
+    BEGIN
+        UPDATE stats SET services_open = services_open - (OLD.status IS 'Aberto') WHERE id = 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_services_stats_status
+    AFTER UPDATE OF status ON services
+    BEGIN
+        UPDATE stats
+        SET services_open = services_open + (NEW.status IS 'Aberto') - (OLD.status IS 'Aberto')
+        WHERE id = 1;
+    END
+    ''',
+]
+
+SCHEMA_V4 = [
+    '''
+    CREATE TABLE IF NOT EXISTS stats
+    (
+        id            INTEGER PRIMARY KEY CHECK (id = 1),
+        parts         INTEGER NOT NULL DEFAULT 0,
+        tools         INTEGER NOT NULL DEFAULT 0,
+        users         INTEGER NOT NULL DEFAULT 0,
+        cars          INTEGER NOT NULL DEFAULT 0,
+        motorcycles   INTEGER NOT NULL DEFAULT 0,
+        services_open INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+    STATS_RECOUNT_SQL,
+] + [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_{table}_stats_{event.lower()}
+    AFTER {event} ON {table}
+    BEGIN
+        UPDATE stats SET {table} = {table} {sign} 1 WHERE id = 1;
+    END
+    """
+    for table in STATS_COUNTED_TABLES
+    for event, sign in (("INSERT", "+"), ("DELETE", "-"))
+] + SERVICES_STATS_TRIGGERS
+
+# v5: busca textual do catálogo (FTS5 com conteúdo externo em `parts`, sincronizado por triggers).
+# Só nome, SKU e descrição são indexados: a baixa de estoque (UPDATE de qty) não toca o índice.
+SCHEMA_V5 = [
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS parts_fts USING fts5(
+        name, sku, description,
+        content='parts', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    ''',
+    "INSERT INTO parts_fts(parts_fts) VALUES ('rebuild')",
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_parts_fts_insert
+    AFTER INSERT ON parts
+    BEGIN
+        INSERT INTO parts_fts(rowid, name, sku, description) VALUES (NEW.id, NEW.name, NEW.sku, NEW.description);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_parts_fts_delete
+    AFTER DELETE ON parts
+    BEGIN
+        INSERT INTO parts_fts(parts_fts, rowid, name, sku, description)
+        VALUES ('delete', OLD.id, OLD.name, OLD.sku, OLD.description);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_parts_fts_update
+    AFTER UPDATE OF name, sku, description ON parts
+    BEGIN
+        INSERT INTO parts_fts(parts_fts, rowid, name, sku, description)
+        VALUES ('delete', OLD.id, OLD.name, OLD.sku, OLD.description);
+        INSERT INTO parts_fts(rowid, name, sku, description) VALUES (NEW.id, NEW.name, NEW.sku, NEW.description);
+    END
+    ''',
+]
+
+# v6: índice único de placas (carros e motos) mantido por triggers; cars/motorcycles continuam
+# sendo a fonte dos dados. A placa é a chave também entre os dois tipos de veículo.
+VEHICLE_TABLES = {"cars": "car", "motorcycles": "motorcycle"}
+
+SCHEMA_V6 = [
+    '''
+    CREATE TABLE IF NOT EXISTS vehicle_index
+    (
+        license_plate TEXT PRIMARY KEY,
+        vehicle_type  TEXT    NOT NULL, -- 'car' ou 'motorcycle'
+        vehicle_id    INTEGER NOT NULL,
+        client_id     INTEGER
+    ) WITHOUT ROWID
+    ''',
+] + [
+    # Placas repetidas entre carros e motos (dados antigos) ficam com o primeiro registro
+    f"""
+    INSERT OR IGNORE INTO vehicle_index(license_plate, vehicle_type, vehicle_id, client_id)
+    SELECT license_plate, '{kind}', id, client_id FROM {table} WHERE license_plate IS NOT NULL
+    """
+    for table, kind in VEHICLE_TABLES.items()
+] + [
+    statement
+    for table, kind in VEHICLE_TABLES.items()
+    for statement in (
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_plate_insert
+        AFTER INSERT ON {table}
+        WHEN NEW.license_plate IS NOT NULL
+        BEGIN
+            INSERT INTO vehicle_index(license_plate, vehicle_type, vehicle_id, client_id)
+            VALUES (NEW.license_plate, '{kind}', NEW.id, NEW.client_id);
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_plate_delete
+        AFTER DELETE ON {table}
+        BEGIN
+            DELETE FROM vehicle_index WHERE license_plate = OLD.license_plate AND vehicle_type = '{kind}';
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_plate_update
+        AFTER UPDATE OF license_plate, client_id ON {table}
+        BEGIN
+            DELETE FROM vehicle_index WHERE license_plate = OLD.license_plate AND vehicle_type = '{kind}';
+            INSERT INTO vehicle_index(license_plate, vehicle_type, vehicle_id, client_id)
+            SELECT NEW.license_plate, '{kind}', NEW.id, NEW.client_id WHERE NEW.license_plate IS NOT NULL;
+        END
+        """,
+    )
+]
+
+# v7: triggers de OS abertas recriados com `IS` (bancos na v4-v6 tinham `=`, que falhava com status NULL)
+SCHEMA_V7 = [
+    "DROP TRIGGER IF EXISTS trg_services_stats_insert",
+    "DROP TRIGGER IF EXISTS trg_services_stats_delete",
+    "DROP TRIGGER IF EXISTS trg_services_stats_status",
+] + SERVICES_STATS_TRIGGERS
+
+# Lista ordenada: (versão, descrição, comandos SQL)
+MIGRATIONS = [
+    (1, "Tabelas base", SCHEMA_V1),
+    (2, "Índices secundários", SCHEMA_V2),
+    (3, "Registro de alterações (change_log)", SCHEMA_V3),
+    (4, "Contadores do Dashboard (stats)", SCHEMA_V4),
+    (5, "Busca textual de peças (FTS5)", SCHEMA_V5),
+    (6, "Índice de placas de veículos", SCHEMA_V6),
+    (7, "Contador de OS abertas aceita status NULL", SCHEMA_V7),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def _apply_migrations(conn):
+    """Aplica as migrações pendentes na transação já aberta. Retorna as versões aplicadas."""
+    # Relê a versão dentro da transação: outra estação pode ter migrado antes de nós
+    current = get_schema_version(conn)
+    applied = []
+    for version, _description, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        for sql in statements:
+            conn.execute(sql)
+        # PRAGMA não aceita parâmetros; version é um inteiro da própria lista
+        conn.execute(f"PRAGMA user_version = {int(version)}")
+        applied.append(version)
+    return applied
+
+
+def migrate(conn):
+    """Aplica todas as migrações pendentes em uma única transação.
+
+    Retorna a lista de versões aplicadas (vazia se o banco já estiver atualizado)."""
+    if get_schema_version(conn) >= SCHEMA_VERSION:
+        return []
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        applied = _apply_migrations(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    if applied:
+        # Atualiza as estatísticas do planejador para os novos índices
+        conn.execute("PRAGMA optimize")
+    return applied
+
+
+def connect(db_path=DB_NAME, factory=sqlite3.Connection):
+    """Abre uma conexão com busy timeout; em modo multiestação (WAL) usa synchronous=NORMAL.
+
+    `factory` é a classe da conexão (ex.: tracing.TracedConnection, que mede cada comando)."""
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_MS / 1000, factory=factory)
+    if is_multi_user(conn):
+        # Com WAL, NORMAL continua à prova de corrupção e só sincroniza o disco no checkpoint
+        conn.execute("PRAGMA synchronous = NORMAL")
+    return conn
+
+
+# ---------- Modo multiestação ----------
+def is_multi_user(conn):
+    return conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def set_multi_user(conn, enabled):
+    """Liga (journal WAL) ou desliga (journal DELETE) o modo multiestação.
+
+    O modo fica gravado no próprio arquivo do banco e vale para todas as estações.
+    Em WAL leitores (relatórios, dashboard, exportação) não bloqueiam quem grava,
+    e quem grava não bloqueia os leitores. Todas as estações precisam abrir o banco
+    na mesma máquina (WAL não funciona em pasta compartilhada pela rede)."""
+    mode = "wal" if enabled else "delete"
+    if conn.in_transaction:
+        conn.commit()
+    # PRAGMA não aceita parâmetros; mode vem da lista acima
+    current = conn.execute(f"PRAGMA journal_mode = {mode}").fetchone()[0]
+    if current != mode:
+        raise sqlite3.OperationalError(f"Não foi possível mudar o journal para {mode} (atual: {current}).")
+    conn.execute("PRAGMA synchronous = NORMAL" if enabled else "PRAGMA synchronous = FULL")
+
+
+def is_busy(error):
+    """True se o erro é SQLITE_BUSY/SQLITE_LOCKED (outra conexão segura o banco)."""
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    code = getattr(error, "sqlite_errorcode", None)
+    if code is not None:
+        return code & 0xFF in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    message = str(error)
+    return "locked" in message or "busy" in message
+
+
+def retry_on_busy(conn, work, retries=BUSY_RETRIES, backoff=BUSY_BACKOFF):
+    """Executa `work()` (uma transação de escrita completa) e retorna o seu resultado.
+
+    Se o banco estiver ocupado mesmo depois do busy timeout, desfaz a tentativa e repete
+    até `retries` vezes, com espera crescente (e aleatória, para duas estações não
+    colidirem de novo no mesmo instante). Dentro de uma transação já aberta não
+    repete: só quem abriu a transação externa pode refazê-la por inteiro."""
+    if conn.in_transaction:
+        return work()
+    delay = backoff
+    for _attempt in range(retries):
+        try:
+            return work()
+        except sqlite3.OperationalError as e:
+            if not is_busy(e):
+                raise
+            if conn.in_transaction:
+                conn.rollback()
+        time.sleep(delay * random.uniform(0.5, 1.5))
+        delay *= 2
+    return work()
+
+
+@contextmanager
+def transaction(conn, immediate=True):
+    """Executa o bloco em uma transação: COMMIT no fim, ROLLBACK se houver exceção.
+
+    Com `immediate=True` usa BEGIN IMMEDIATE, reservando a escrita logo no início
+    (outra estação não consegue intercalar uma escrita entre a leitura e a baixa).
+    Se já houver transação aberta, o bloco vira um SAVEPOINT dentro dela."""
+    if conn.in_transaction:
+        conn.execute("SAVEPOINT nested_tx")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK TO nested_tx")
+            conn.execute("RELEASE nested_tx")
+            raise
+        conn.execute("RELEASE nested_tx")
+        return
+
+    conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+# ---------- Dados Iniciais ----------
+# Conta padrão criada apenas em bancos novos, para que o sistema seja acessível
+DEFAULT_ADMIN = ("admin", "admin123", "Mestre Tunning", "admin@mmtunning.com", "11999990000", "admin", "")
+
+DEMO_USERS = [
+    DEFAULT_ADMIN,
+    ("corredor_r", "cli456", "Rafael Rossi", "rafael.rossi@mail.com", "11981234567", "client", ""),
+    ("piloto_j", "cli789", "Juliana Santos", "ju.santos@mail.com", "11989876543", "client", ""),
+    ("turbo_m", "cli101", "Márcio Oliveira", "marcio.oli@mail.com", "11977771111", "client", "")
+]
+
+DEMO_PARTS = [
+    ("Vela Iridium Performance", "P-IGN-005", 30, 95.0, "Velas de ignição para alto desempenho."),
+    ("Filtro Ar Esportivo K&N", "P-FIL-010", 15, 450.0, "Filtro cônico lavável, alto fluxo."),
+    ("Óleo Sintético 5W40", "P-OIL-050", 40, 65.0, "Óleo totalmente sintético para motores turbo.")
+]
+
+DEMO_TOOLS = [
+    ("Scanner de Diagnóstico OBD-II", "T-SCA-001", 1, "Leitura e calibração de ECU."),
+    ("Medidor de Pressão Turbo", "T-BOO-002", 3, "Para ajuste fino de turbinas."),
+    ("Torquímetro Digital 1/2", "T-TOR-003", 2, "Chave de torque de alta precisão.")
+]
+
+DEMO_SERVICE_DESCRIPTION = "Serviço Completo de Troca de Óleo e Filtros - Demonstração"
+
+
+def seed_demo(conn):
+    """Insere os dados de demonstração. Idempotente: pode ser executado várias vezes
+    sem duplicar registros nem baixar o estoque de novo. Não faz commit."""
+    c = conn.cursor()
+
+    # 1. Usuários (Admin e Clientes)
+    c.executemany(
+        "INSERT OR IGNORE INTO users(username,password,fullname,email,phone,role,photo) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        DEMO_USERS)
+
+    # Busca IDs dos clientes para FK
+    ids = dict(c.execute("SELECT username, id FROM users WHERE username IN ('corredor_r', 'piloto_j', 'turbo_m')"))
+    id_corredor_r, id_piloto_j, id_turbo_m = ids["corredor_r"], ids["piloto_j"], ids["turbo_m"]
+
+    # 2. Veículos de exemplo
+    c.executemany(
+        "INSERT OR IGNORE INTO cars(client_id, license_plate, brand, model, year, color, engine) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            (id_corredor_r, "ABC-1234", "Subaru", "WRX STI", 2019, "Azul", "2.5L Turbo"),
+            (id_piloto_j, "DEF-5678", "Honda", "Civic SI", 2022, "Vermelha", "1.5L VTEC"),
+            (id_turbo_m, "GHI-9012", "VW", "Golf GTI", 2023, "Branco", "2.0L TSI")
+        ])
+    c.executemany(
+        "INSERT OR IGNORE INTO motorcycles(client_id, license_plate, brand, model, year, engine_cc) VALUES (?, ?, ?, ?, ?, ?)",
+        [
+            (id_corredor_r, "MNO-3456", "Yamaha", "R3", 2021, 321),
+            (id_piloto_j, "PQR-7890", "Kawasaki", "Ninja 400", 2023, 400),
+            (id_turbo_m, "STU-1234", "Triumph", "Street Triple", 2024, 765)
+        ])
+
+    # 3. Peças e 4. Ferramentas
+    c.executemany("INSERT OR IGNORE INTO parts(name,sku,qty,price,description) VALUES (?, ?, ?, ?, ?)", DEMO_PARTS)
+    c.executemany("INSERT OR IGNORE INTO tools(name,code,available,description) VALUES (?, ?, ?, ?)", DEMO_TOOLS)
+
+    # 5. OS + Fatura de demonstração: apenas uma vez, e só então dá baixa no estoque
+    c.execute("SELECT 1 FROM services WHERE description=? LIMIT 1", (DEMO_SERVICE_DESCRIPTION,))
+    if c.fetchone():
+        return
+
+    c.execute("SELECT id, price FROM parts WHERE sku='P-FIL-010'")
+    part1_id, part1_price = c.fetchone()
+    c.execute("SELECT id, price FROM parts WHERE sku='P-OIL-050'")
+    part2_id, part2_price = c.fetchone()
+
+    mo_price = 150.00
+    qty1 = 1
+    qty2 = 5
+    final_total = mo_price + (qty1 * part1_price) + (qty2 * part2_price)
+    current_date = datetime.date.today().isoformat()
+
+    c.execute(
+        "INSERT INTO services(client_id, vehicle_plate, description, labor_price, final_total, date, status, seller_name) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (id_corredor_r, "ABC-1234", DEMO_SERVICE_DESCRIPTION, mo_price, final_total, current_date, "Fechado",
+         "Mestre Tunning"))
+    service_id_demo = c.lastrowid
+    c.executemany("INSERT INTO service_parts (service_id, part_id, qty_used, price_unit) VALUES (?, ?, ?, ?)",
+                  [(service_id_demo, part1_id, qty1, part1_price), (service_id_demo, part2_id, qty2, part2_price)])
+    c.execute("INSERT INTO invoices(service_id, total, date, paid) VALUES (?, ?, ?, ?)",
+              (service_id_demo, final_total, current_date, 1))  # 1 = Pago
+    c.executemany("UPDATE parts SET qty = qty - ? WHERE id=?", [(qty1, part1_id), (qty2, part2_id)])
+
+
+# ---------- Inicialização ----------
+def init_db(db_path=DB_NAME, seed=False, multi_user=None):
+    """Prepara o banco para uso e retorna a versão do esquema.
+
+    Caminho rápido: se o esquema já está na versão atual e não há seed pedido, faz
+    apenas a leitura de `PRAGMA user_version`. Caso contrário, migrações, conta
+    admin padrão (só em banco novo) e dados de demonstração rodam em UMA transação.
+    `multi_user` True/False liga/desliga o modo multiestação (None mantém o atual)."""
+    conn = connect(db_path)
+    try:
+        if multi_user is not None and multi_user != is_multi_user(conn):
+            set_multi_user(conn, multi_user)
+        if get_schema_version(conn) >= SCHEMA_VERSION and not seed:
+            return SCHEMA_VERSION
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            is_new = not conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='users'").fetchone()
+            _apply_migrations(conn)
+            if is_new:
+                conn.execute(
+                    "INSERT OR IGNORE INTO users(username,password,fullname,email,phone,role,photo) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    DEFAULT_ADMIN)
+            if seed:
+                seed_demo(conn)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        conn.execute("PRAGMA optimize")
+        return get_schema_version(conn)
+    finally:
+        conn.close()
@@ -0,0 +1,298 @@
+"""
+M&M Tunning - Gerador de dados sintéticos para testes de volume.
+
+Preenche o banco com volumes de uma oficina grande (padrão: 100 mil peças,
+50 mil clientes com seus carros/motos, 1 milhão de OS e ~3 milhões de itens de
+OS, com as faturas das OS fechadas). A geração é determinística: a mesma
+semente (e a mesma data final) produz exatamente os mesmos dados.
+
+As linhas são gravadas em blocos (`GEN_CHUNK_SIZE`) com `executemany`, uma
+transação por bloco, pelas mesmas tabelas e triggers usadas pelo sistema
+(change_log, stats, FTS do catálogo e índice de placas).
+
+Uso sem interface:
+    python datagen.py [--db mmtunning.db] [--seed 42] [--scale 0.01]
+    python datagen.py --db volume.db --parts 100000 --clients 50000 --services 1000000 --items 3
+"""
+
+import argparse
+import datetime
+import random
+import sys
+
+from database import DB_NAME, connect, init_db, transaction
+from repository import ChangeLogRepository
+
+# Linhas gravadas por transação
+GEN_CHUNK_SIZE = 20000
+
+# Volumes padrão
+DEFAULT_SEED = 42
+DEFAULT_PARTS = 100_000
+DEFAULT_TOOLS = 2_000
+DEFAULT_CLIENTS = 50_000
+DEFAULT_SERVICES = 1_000_000
+DEFAULT_ITEMS = 3  # Média de peças por OS
+DEFAULT_YEARS = 3  # Período coberto pelas OS, até a data final
+
+# Prefixos que identificam os registros gerados (e evitam colisão com os reais)
+USER_PREFIX = "sint_"
+SKU_PREFIX = "SIN"
+TOOL_PREFIX = "FSIN"
+SELLER_NAMES = ("Mestre Tunning", "Balcão 1", "Balcão 2", "Oficina", "Gerência")
+
+# OS dos últimos OPEN_DAYS dias ficam em aberto com esta probabilidade; as demais são faturadas
+OPEN_DAYS = 10
+OPEN_RATE = 0.6
+PAID_RATE = 0.9
+
+PART_CATEGORIES = {
+    "FIL": ("Filtro de Óleo", "Filtro de Ar", "Filtro de Combustível", "Filtro de Cabine"),
+    "OIL": ("Óleo 5W30 Sintético", "Óleo 10W40", "Fluido de Freio DOT4", "Aditivo de Radiador"),
+    "FRE": ("Pastilha de Freio", "Disco de Freio", "Sapata de Freio", "Cilindro Mestre"),
+    "SUS": ("Amortecedor", "Mola Esportiva", "Bandeja", "Pivô de Suspensão", "Bucha"),
+    "IGN": ("Vela de Ignição", "Bobina", "Cabo de Vela", "Sensor de Rotação"),
+    "TRB": ("Turbina", "Intercooler", "Válvula Wastegate", "Blow-off", "Mangueira de Silicone"),
+    "ESC": ("Downpipe", "Ponteira", "Abafador", "Coletor de Escape"),
+    "ELE": ("Bateria 60Ah", "Alternador", "Motor de Partida", "Módulo de Injeção"),
+}
+PART_BRANDS = ("Bosch", "NGK", "Mahle", "Cofap", "Monroe", "Garrett", "Fras-le", "Mobil", "Castrol", "Denso")
+PART_SPECS = ("Linha Leve", "Linha Pesada", "Performance", "Racing", "Original", "Reforçado")
+
+TOOL_NAMES = ("Chave de Impacto", "Torquímetro", "Scanner OBD2", "Elevador", "Macaco Hidráulico",
+              "Multímetro", "Compressor", "Alinhador", "Balanceadora", "Prensa Hidráulica")
+
+FIRST_NAMES = ("Ana", "Bruno", "Carla", "Diego", "Eduarda", "Felipe", "Gabriela", "Henrique", "Isabela",
+               "João", "Larissa", "Marcos", "Natália", "Otávio", "Paula", "Rafael", "Sofia", "Thiago",
+               "Vanessa", "William")
+LAST_NAMES = ("Silva", "Santos", "Oliveira", "Souza", "Lima", "Pereira", "Costa", "Rodrigues", "Almeida",
+              "Nascimento", "Ferreira", "Araújo", "Ribeiro", "Carvalho", "Gomes")
+
+CAR_MODELS = (("Subaru", "WRX STI", "2.5L Turbo"), ("Honda", "Civic SI", "1.5L VTEC"),
+              ("VW", "Golf GTI", "2.0L TSI"), ("VW", "Gol", "1.0L"), ("Fiat", "Uno", "1.0L Fire"),
+              ("Chevrolet", "Onix", "1.0L Turbo"), ("Toyota", "Corolla", "2.0L"), ("Ford", "Mustang", "5.0L V8"),
+              ("Hyundai", "HB20", "1.6L"), ("Mitsubishi", "Lancer Evo", "2.0L Turbo"))
+MOTO_MODELS = (("Yamaha", "R3", 321), ("Kawasaki", "Ninja 400", 400), ("Triumph", "Street Triple", 765),
+               ("Honda", "CB 500F", 471), ("Honda", "CG 160", 162), ("BMW", "S 1000 RR", 999))
+COLORS = ("Preto", "Branco", "Prata", "Vermelho", "Azul", "Cinza")
+SERVICE_DESCRIPTIONS = ("Revisão completa", "Troca de óleo e filtros", "Revisão de freios",
+                        "Alinhamento e balanceamento", "Instalação de kit turbo", "Remap de injeção",
+                        "Troca de suspensão", "Diagnóstico elétrico", "Troca de escapamento", "Revisão de ignição")
+
+# Placas no padrão Mercosul (LLL9L99): não colidem com as placas antigas (LLL-9999) já cadastradas
+PLATE_SPACE = 26 ** 4 * 1000
+PLATE_STRIDE = 104_729  # Primo: espalha as placas geradas pelo espaço inteiro sem repetir
+
+
+class GenerationReport:
+    """Quantidade de linhas geradas por tabela."""
+
+    def __init__(self):
+        self.counts = {}
+
+    def add(self, table, count):
+        self.counts[table] = self.counts.get(table, 0) + count
+
+    def summary(self):
+        return "\n".join(f"{table}: {count}" for table, count in self.counts.items())
+
+
+def mercosul_plate(index):
+    n = (index * PLATE_STRIDE) % PLATE_SPACE
+    digits, n = n % 1000, n // 1000
+    letters = []
+    for _ in range(4):
+        n, r = divmod(n, 26)
+        letters.append(chr(ord("A") + r))
+    return f"{letters[0]}{letters[1]}{letters[2]}{digits // 100}{letters[3]}{digits % 100:02d}"
+
+
+def _next_id(conn, table):
+    return conn.execute(f"SELECT IFNULL(MAX(id), 0) + 1 FROM {table}").fetchone()[0]
+
+
+def _write(conn, sql, rows, report, table, progress):
+    """Grava `rows` (iterável) em blocos de GEN_CHUNK_SIZE, uma transação por bloco."""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= GEN_CHUNK_SIZE:
+            _flush(conn, sql, batch, report, table, progress)
+    _flush(conn, sql, batch, report, table, progress)
+
+
+def _flush(conn, sql, batch, report, table, progress):
+    if not batch:
+        return
+    with transaction(conn):
+        conn.executemany(sql, batch)
+    report.add(table, len(batch))
+    batch.clear()
+    if progress:
+        progress(table, report.counts[table])
+
+
+def generate(conn, seed=DEFAULT_SEED, parts=DEFAULT_PARTS, tools=DEFAULT_TOOLS, clients=DEFAULT_CLIENTS,
+             services=DEFAULT_SERVICES, items=DEFAULT_ITEMS, until=None, years=DEFAULT_YEARS, progress=None):
+    """Gera os dados sintéticos no banco aberto em `conn`. Retorna o GenerationReport.
+
+    `until` é a data da OS mais recente (padrão: hoje). Levanta ValueError se o
+    banco já tiver dados gerados (os IDs e placas gerados se repetiriam)."""
+    if conn.execute("SELECT 1 FROM users WHERE username = ?", (f"{USER_PREFIX}{1:06d}",)).fetchone():
+        raise ValueError("Este banco já tem dados sintéticos. Use outro arquivo (--db).")
+    rng = random.Random(seed)
+    until = until or datetime.date.today()
+    report = GenerationReport()
+
+    # 1. Peças: (id, preço) guardados para compor os itens das OS
+    first_part = _next_id(conn, "parts")
+    part_prices = []
+    categories = list(PART_CATEGORIES.items())
+
+    def part_rows():
+        for i in range(parts):
+            code, names = categories[i % len(categories)]
+            name = f"{rng.choice(names)} {rng.choice(PART_BRANDS)} {rng.choice(PART_SPECS)}"
+            price = round(rng.uniform(15, 2500) if code in ("TRB", "ELE") else rng.uniform(8, 600), 2)
+            # ~5% com estoque baixo (alertas do Dashboard e faltas no faturamento)
+            qty = rng.randint(0, 3) if rng.random() < 0.05 else rng.randint(20, 500)
+            part_prices.append(price)
+            yield (first_part + i, name, f"{SKU_PREFIX}-{code}-{i:06d}", qty, price,
+                   f"{name} - {rng.choice(('importado', 'nacional', 'genuíno'))}")
+
+    _write(conn, "INSERT INTO parts(id, name, sku, qty, price, description) VALUES (?, ?, ?, ?, ?, ?)",
+           part_rows(), report, "parts", progress)
+
+    def tool_rows():
+        for i in range(tools):
+            yield (f"{rng.choice(TOOL_NAMES)} #{i + 1}", f"{TOOL_PREFIX}-{i:05d}", rng.randint(0, 1), "")
+
+    _write(conn, "INSERT INTO tools(name, code, available, description) VALUES (?, ?, ?, ?)",
+           tool_rows(), report, "tools", progress)
+
+    # 2. Clientes e veículos: (client_id, placa) guardados para as OS
+    first_client = _next_id(conn, "users")
+
+    def client_rows():
+        for i in range(clients):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            username = f"{USER_PREFIX}{i + 1:06d}"
+            yield (first_client + i, username, "sint123", f"{first} {last}", f"{username}@exemplo.com",
+                   f"(11) 9{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}", "client", "")
+
+    _write(conn, "INSERT INTO users(id, username, password, fullname, email, phone, role, photo) "
+                 "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", client_rows(), report, "users", progress)
+
+    vehicles = []
+    cars, motorcycles = [], []
+    for i in range(clients):
+        client_id = first_client + i
+        # Todo cliente tem um carro; ~10% um segundo carro e ~25% uma moto
+        for _ in range(2 if rng.random() < 0.1 else 1):
+            brand, model, engine = rng.choice(CAR_MODELS)
+            plate = mercosul_plate(len(vehicles) + 1)
+            cars.append((client_id, plate, brand, model, rng.randint(2005, until.year), rng.choice(COLORS), engine))
+            vehicles.append((client_id, plate))
+        if rng.random() < 0.25:
+            brand, model, cc = rng.choice(MOTO_MODELS)
+            plate = mercosul_plate(len(vehicles) + 1)
+            motorcycles.append((client_id, plate, brand, model, rng.randint(2010, until.year), cc))
+            vehicles.append((client_id, plate))
+    _write(conn, "INSERT INTO cars(client_id, license_plate, brand, model, year, color, engine) "
+                 "VALUES (?, ?, ?, ?, ?, ?, ?)", cars, report, "cars", progress)
+    _write(conn, "INSERT INTO motorcycles(client_id, license_plate, brand, model, year, engine_cc) "
+                 "VALUES (?, ?, ?, ?, ?, ?)", motorcycles, report, "motorcycles", progress)
+    del cars, motorcycles
+
+    # 3. OS (em ordem de data, como seriam abertas), itens e faturas das fechadas.
+    # Cada bloco de OS é gravado junto com seus itens e faturas, na mesma transação.
+    if not vehicles or not part_prices:
+        return report
+    days = years * 365
+    offsets = sorted(rng.randrange(days) for _ in range(services))
+    first_service = _next_id(conn, "services")
+    max_items = max(1, 2 * items - 1)  # Uniforme em 1..max_items: média `items`
+    for start in range(0, services, GEN_CHUNK_SIZE):
+        service_rows, item_rows, invoice_rows = [], [], []
+        for i in range(start, min(start + GEN_CHUNK_SIZE, services)):
+            service_id = first_service + i
+            client_id, plate = rng.choice(vehicles)
+            date = until - datetime.timedelta(days=days - 1 - offsets[i])
+            labor = float(rng.randrange(80, 1500, 10))
+            chosen = set()
+            for _ in range(rng.randint(1, max_items)):
+                # Quadrado do sorteio: as primeiras peças do catálogo são as mais usadas
+                chosen.add(int(len(part_prices) * rng.random() ** 2))
+            parts_total = 0.0
+            for index in sorted(chosen):
+                qty = rng.randint(1, 4)
+                price = part_prices[index]
+                parts_total += qty * price
+                item_rows.append((service_id, first_part + index, qty, price))
+            is_open = (until - date).days < OPEN_DAYS and rng.random() < OPEN_RATE
+            total = round(labor + parts_total, 2)
+            if not is_open:
+                invoice_date = min(date + datetime.timedelta(days=rng.randint(0, 2)), until)
+                invoice_rows.append((service_id, total, invoice_date.isoformat(),
+                                     1 if rng.random() < PAID_RATE else 0))
+            service_rows.append((service_id, client_id, plate, rng.choice(SERVICE_DESCRIPTIONS), labor,
+                                 0.0 if is_open else total, date.isoformat(), "Aberto" if is_open else "Fechado",
+                                 rng.choice(SELLER_NAMES)))
+        with transaction(conn):
+            conn.executemany("INSERT INTO services(id, client_id, vehicle_plate, description, labor_price, "
+                             "final_total, date, status, seller_name) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                             service_rows)
+            conn.executemany("INSERT INTO service_parts(service_id, part_id, qty_used, price_unit) "
+                             "VALUES (?, ?, ?, ?)", item_rows)
+            conn.executemany("INSERT INTO invoices(service_id, total, date, paid) VALUES (?, ?, ?, ?)",
+                             invoice_rows)
+        report.add("services", len(service_rows))
+        report.add("service_parts", len(item_rows))
+        report.add("invoices", len(invoice_rows))
+        if progress:
+            progress("services", report.counts["services"])
+
+    # Milhões de entradas no change_log não servem a nenhuma lista aberta: as telas recarregam
+    ChangeLogRepository(conn).prune()
+    conn.execute("ANALYZE")
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Gerador de dados sintéticos - M&M Tunning")
+    parser.add_argument("--db", default=DB_NAME, help="arquivo do banco SQLite")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="semente (mesma semente, mesmos dados)")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplica todos os volumes (ex.: 0.01)")
+    parser.add_argument("--parts", type=int, default=DEFAULT_PARTS)
+    parser.add_argument("--tools", type=int, default=DEFAULT_TOOLS)
+    parser.add_argument("--clients", type=int, default=DEFAULT_CLIENTS)
+    parser.add_argument("--services", type=int, default=DEFAULT_SERVICES)
+    parser.add_argument("--items", type=int, default=DEFAULT_ITEMS, help="média de peças por OS")
+    parser.add_argument("--years", type=int, default=DEFAULT_YEARS, help="anos cobertos pelas OS")
+    parser.add_argument("--until", default=None, help="data da OS mais recente (AAAA-MM-DD; padrão: hoje)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    until = datetime.date.fromisoformat(args.until) if args.until else None
+    init_db(args.db)
+    conn = connect(args.db)
+    try:
+        report = generate(conn, args.seed, int(args.parts * args.scale), int(args.tools * args.scale),
+                          max(1, int(args.clients * args.scale)), int(args.services * args.scale), args.items,
+                          until, args.years,
+                          lambda table, n: print(f"\r{table}: {n} linhas".ljust(40), end="", file=sys.stderr,
+                                                 flush=True))
+    except ValueError as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 1
+    finally:
+        conn.close()
+    print(file=sys.stderr)
+    print(report.summary())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
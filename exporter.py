@@ -0,0 +1,184 @@
+"""
+M&M Tunning - Exportação de serviços, peças usadas e faturas (CSV ou JSON Lines).
+
+As linhas saem do cursor em blocos de `EXPORT_BATCH_SIZE` (`fetchmany`) por um
+gerador e são gravadas no arquivo conforme chegam; nada é carregado inteiro na
+memória, então exportar um ano de faturas com os itens usa memória constante.
+
+Uso sem interface:
+    python exporter.py invoices faturas_2024.csv --from 2024-01-01 --to 2024-12-31
+    python exporter.py service_parts itens.jsonl --status Fechado
+"""
+
+import argparse
+import csv
+import datetime
+import json
+import sys
+
+from database import DB_NAME, connect, init_db
+
+# Linhas lidas do cursor por vez
+EXPORT_BATCH_SIZE = 1000
+
+# Status possíveis de uma OS (filtro --status)
+SERVICE_STATUSES = ("Aberto", "Fechado")
+
+# Conjunto de dados: (colunas, SELECT ... FROM ..., coluna de data, coluna de status, ORDER BY).
+# As faturas e os itens também são filtrados pelo status da OS correspondente.
+DATASETS = {
+    "services": (
+        ["id", "client", "plate", "description", "labor_price", "final_total", "date", "status", "seller_name"],
+        "SELECT s.id, u.username, s.vehicle_plate, s.description, s.labor_price, s.final_total, s.date, "
+        "s.status, s.seller_name "
+        "FROM services s LEFT JOIN users u ON s.client_id = u.id",
+        "s.date", "s.status", "s.date, s.id",
+    ),
+    "service_parts": (
+        ["service_id", "service_date", "status", "invoice_id", "sku", "part_name", "qty_used", "price_unit",
+         "line_total"],
+        "SELECT sp.service_id, s.date, s.status, i.id, p.sku, p.name, sp.qty_used, sp.price_unit, "
+        "sp.qty_used * sp.price_unit "
+        "FROM service_parts sp JOIN services s ON s.id = sp.service_id "
+        "LEFT JOIN parts p ON p.id = sp.part_id "
+        "LEFT JOIN invoices i ON i.service_id = sp.service_id",
+        "s.date", "s.status", "s.date, sp.service_id, sp.part_id",
+    ),
+    "invoices": (
+        ["id", "service_id", "client", "plate", "total", "date", "paid"],
+        "SELECT i.id, i.service_id, u.username, s.vehicle_plate, i.total, i.date, i.paid "
+        "FROM invoices i LEFT JOIN services s ON s.id = i.service_id "
+        "LEFT JOIN users u ON s.client_id = u.id",
+        "i.date", "s.status", "i.date, i.id",
+    ),
+}
+
+FORMATS = ("csv", "jsonl")
+
+
+def parse_date(text):
+    """Aceita 'AAAA-MM-DD' ou 'DD/MM/AAAA'; devolve a data ISO (como gravada no banco) ou None."""
+    text = (text or "").strip()
+    if not text:
+        return None
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y"):
+        try:
+            return datetime.datetime.strptime(text, fmt).date().isoformat()
+        except ValueError:
+            pass
+    raise ValueError(f"Data inválida: '{text}' (use DD/MM/AAAA)")
+
+
+def build_query(dataset, date_from=None, date_to=None, status=None):
+    """(colunas, sql, parâmetros) do conjunto de dados com os filtros informados."""
+    if dataset not in DATASETS:
+        raise ValueError(f"Conjunto de dados desconhecido: {dataset}")
+    columns, select, date_col, status_col, order_by = DATASETS[dataset]
+    where, params = [], []
+    if date_from:
+        where.append(f"{date_col} >= ?")
+        params.append(date_from)
+    if date_to:
+        where.append(f"{date_col} <= ?")
+        params.append(date_to)
+    if status:
+        where.append(f"{status_col} = ?")
+        params.append(status)
+    sql = select
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return columns, sql + f" ORDER BY {order_by}", params
+
+
+def iter_rows(conn, sql, params=(), batch_size=EXPORT_BATCH_SIZE):
+    """Gera as linhas da consulta lendo `batch_size` por vez do cursor (nunca fetchall)."""
+    cur = conn.execute(sql, params)
+    try:
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                return
+            yield from rows
+    finally:
+        cur.close()
+
+
+def write_csv(f, columns, rows):
+    writer = csv.writer(f)
+    writer.writerow(columns)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def write_jsonl(f, columns, rows):
+    count = 0
+    for row in rows:
+        f.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False))
+        f.write("\n")
+        count += 1
+    return count
+
+
+WRITERS = {"csv": write_csv, "jsonl": write_jsonl}
+
+
+def format_for(path):
+    """Formato pelo nome do arquivo (.jsonl / .json -> jsonl, resto -> csv)."""
+    return "jsonl" if path.lower().endswith((".jsonl", ".json")) else "csv"
+
+
+def export(conn, dataset, path, fmt=None, date_from=None, date_to=None, status=None, progress=None,
+           batch_size=EXPORT_BATCH_SIZE):
+    """Exporta o conjunto de dados para `path` e retorna a quantidade de linhas gravadas.
+
+    `progress(linhas_gravadas)` é chamado a cada `batch_size` linhas."""
+    fmt = fmt or format_for(path)
+    columns, sql, params = build_query(dataset, date_from, date_to, status)
+    rows = iter_rows(conn, sql, params, batch_size)
+    if progress:
+        rows = _reporting(rows, progress, batch_size)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        return WRITERS[fmt](f, columns, rows)
+
+
+def _reporting(rows, progress, every):
+    count = 0
+    for row in rows:
+        yield row
+        count += 1
+        if count % every == 0:
+            progress(count)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Exportação de dados - M&M Tunning")
+    parser.add_argument("dataset", choices=sorted(DATASETS))
+    parser.add_argument("path", help="arquivo de saída (.csv ou .jsonl)")
+    parser.add_argument("--format", choices=FORMATS, default=None, help="padrão: pela extensão do arquivo")
+    parser.add_argument("--from", dest="date_from", default=None, help="data inicial (AAAA-MM-DD ou DD/MM/AAAA)")
+    parser.add_argument("--to", dest="date_to", default=None, help="data final (inclusive)")
+    parser.add_argument("--status", choices=SERVICE_STATUSES, default=None, help="status da OS")
+    parser.add_argument("--db", default=DB_NAME, help="arquivo do banco SQLite")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    init_db(args.db)
+    conn = connect(args.db)
+    try:
+        count = export(conn, args.dataset, args.path, args.format, parse_date(args.date_from),
+                       parse_date(args.date_to), args.status,
+                       lambda n: print(f"\r{n} linhas", end="", file=sys.stderr, flush=True))
+        print(file=sys.stderr)
+        print(f"{count} linhas exportadas para {args.path}")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""
+M&M Tunning - Cache de imagens (logo e placeholders).
+
+Cada arquivo é decodificado uma única vez; as versões redimensionadas ficam em
+cache por (caminho, tamanho, mtime do arquivo). Se o arquivo for substituído
+(ex.: nova logo em Configurações) o mtime muda e a próxima leitura gera as
+versões novas; `refresh(path)` atualiza na hora as imagens já exibidas.
+
+Decodificar e redimensionar (PIL) pode rodar em segundo plano (`prewarm`);
+o `ImageTk.PhotoImage` só é criado na thread do Tk. O PIL é importado só no
+primeiro uso, fora do caminho de abertura da janela.
+"""
+
+import os
+import threading
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class ImageCache:
+    def __init__(self, placeholder):
+        # placeholder(w, h) -> PIL.Image usado quando o arquivo não existe ou não abre
+        self.placeholder = placeholder
+        self._lock = threading.Lock()
+        self._sources = {}  # path -> (mtime, imagem decodificada)
+        self._renditions = {}  # (path, (w, h), mtime) -> imagem redimensionada
+        self._photos = {}  # (path, (w, h)) -> (mtime, PhotoImage)
+
+    def ready(self, path, size):
+        """True se `rendition(path, size)` já está pronta (não bloqueia)."""
+        return (path, size, _mtime(path)) in self._renditions
+
+    def rendition(self, path, size):
+        """Imagem PIL de `path` no tamanho `size`; pode ser chamada de qualquer thread."""
+        from PIL import Image
+        mtime = _mtime(path)
+        key = (path, size, mtime)
+        with self._lock:
+            image = self._renditions.get(key)
+            if image is not None:
+                return image
+            source = self._source(path, mtime)
+            if source is None:
+                image = self.placeholder(*size)
+            else:
+                image = source.resize(size, Image.LANCZOS)
+            # Descarta versões de um arquivo que já foi substituído
+            for old in [k for k in self._renditions if k[0] == path and k[2] != mtime]:
+                del self._renditions[old]
+            self._renditions[key] = image
+            return image
+
+    def _source(self, path, mtime):
+        cached = self._sources.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        from PIL import Image
+        source = None
+        if mtime is not None:
+            try:
+                # copy() lê o arquivo todo e o fecha (no Windows um arquivo aberto não pode ser sobrescrito)
+                with Image.open(path) as f:
+                    source = f.convert("RGBA") if f.mode not in ("RGB", "RGBA") else f.copy()
+            except Exception:
+                source = None
+        self._sources[path] = (mtime, source)
+        return source
+
+    def photo(self, path, size):
+        """`ImageTk.PhotoImage` de `path` em `size` (somente na thread do Tk).
+
+        O mesmo objeto é devolvido para o mesmo (path, size): quando o arquivo muda,
+        o conteúdo é trocado com `paste`, e todos os Labels que o exibem se atualizam."""
+        from PIL import ImageTk
+        mtime = _mtime(path)
+        cached = self._photos.get((path, size))
+        if cached is not None:
+            if cached[0] == mtime:
+                return cached[1]
+            photo = cached[1]
+            photo.paste(self.rendition(path, size))
+        else:
+            photo = ImageTk.PhotoImage(self.rendition(path, size))
+        self._photos[(path, size)] = (mtime, photo)
+        return photo
+
+    def refresh(self, path):
+        """Recarrega as imagens já exibidas de `path` (após substituir o arquivo)."""
+        for cached_path, size in list(self._photos):
+            if cached_path == path:
+                self.photo(path, size)
+
+    def prewarm(self, path, sizes):
+        """Decodifica e redimensiona `sizes` numa thread em segundo plano."""
+
+        def work():
+            for size in sizes:
+                self.rendition(path, size)
+
+        thread = threading.Thread(target=work, name="ImagePrewarm", daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,559 @@
+"""
+M&M Tunning - Importação em massa de arquivos CSV.
+
+O arquivo é lido em blocos (`IMPORT_CHUNK_SIZE` linhas) e cada bloco é gravado
+com um único `executemany` numa transação, então a memória usada não depende do
+tamanho do arquivo. Linhas inválidas não interrompem a importação: vão para o
+relatório de rejeitadas (e, opcionalmente, para um CSV de rejeitadas).
+
+Uso sem interface:
+    python importer.py parts catalogo.csv [--db mmtunning.db] [--rejects rejeitadas.csv]
+    python importer.py clients clientes_veiculos.csv
+    python importer.py orders frota.csv [--seller "Contrato Frota X"]
+"""
+
+import argparse
+import csv
+import os
+import sys
+from itertools import islice
+
+from database import DB_NAME, connect, init_db, retry_on_busy, transaction
+from repository import ORDER_CHUNK_SIZE, Repository
+
+# Linhas gravadas por transação
+IMPORT_CHUNK_SIZE = 5000
+
+# Quantas linhas rejeitadas ficam na memória para exibir (o total é sempre contado)
+MAX_REJECTS_KEPT = 200
+
+# Cabeçalhos aceitos para cada coluna de peças (minúsculos, com e sem acento)
+PART_COLUMNS = {
+    "name": ("name", "nome"),
+    "sku": ("sku", "código", "codigo"),
+    "qty": ("qty", "quantidade", "qtd", "estoque"),
+    "price": ("price", "preço", "preco", "valor"),
+    "description": ("description", "descrição", "descricao"),
+}
+PART_REQUIRED = ("name", "sku", "price")
+
+# Clientes e veículos: uma linha por veículo (os dados do cliente se repetem)
+CLIENT_COLUMNS = {
+    "username": ("username", "usuário", "usuario", "cliente"),
+    "password": ("password", "senha"),
+    "fullname": ("fullname", "nome completo", "nome"),
+    "email": ("email", "e-mail"),
+    "phone": ("phone", "telefone"),
+    "type": ("type", "tipo"),
+    "plate": ("plate", "placa"),
+    "brand": ("brand", "marca"),
+    "model": ("model", "modelo"),
+    "year": ("year", "ano"),
+    "color": ("color", "cor"),
+    "engine": ("engine", "motor"),
+    "engine_cc": ("engine_cc", "cilindrada", "cc"),
+}
+CLIENT_REQUIRED = ("username",)
+VEHICLE_TYPES = {
+    "car": ("carro", "car"),
+    "motorcycle": ("moto", "motocicleta", "motorcycle"),
+}
+
+# OS de contratos de frota: uma linha por peça; as linhas com o mesmo número de OS
+# (ou, sem essa coluna, o mesmo cliente e placa) formam uma OS
+ORDER_COLUMNS = {
+    "order": ("os", "pedido", "ordem", "order"),
+    "username": ("username", "usuário", "usuario", "cliente"),
+    "plate": ("plate", "placa"),
+    "description": ("description", "descrição", "descricao", "serviço", "servico"),
+    "labor_price": ("labor_price", "mão de obra", "mao de obra", "mao_de_obra"),
+    "sku": ("sku", "código", "codigo"),
+    "qty": ("qty", "quantidade", "qtd"),
+    "price": ("price", "preço", "preco", "valor"),
+}
+ORDER_REQUIRED = ("username", "plate")
+FLEET_SELLER = "Contrato de Frota"
+
+
+class ImportReport:
+    """Resultado de uma importação: linhas lidas, gravadas e rejeitadas."""
+
+    def __init__(self):
+        self.read = 0
+        self.imported = 0
+        self.rejected = 0
+        # [(linha_do_arquivo, motivo)] das primeiras MAX_REJECTS_KEPT rejeitadas
+        self.rejects = []
+
+    def reject(self, line_no, reason):
+        self.rejected += 1
+        if len(self.rejects) < MAX_REJECTS_KEPT:
+            self.rejects.append((line_no, reason))
+
+    def summary(self):
+        text = f"Linhas lidas: {self.read}\nImportadas/atualizadas: {self.imported}\nRejeitadas: {self.rejected}"
+        if self.rejects:
+            text += "\n\n" + "\n".join(f"Linha {line_no}: {reason}" for line_no, reason in self.rejects)
+            if self.rejected > len(self.rejects):
+                text += f"\n... e mais {self.rejected - len(self.rejects)}"
+        return text
+
+
+class OrdersReport(ImportReport):
+    """ImportReport da abertura de OS em lote; `imported` conta as linhas das OS abertas."""
+
+    def __init__(self):
+        super().__init__()
+        self.service_ids = []
+
+    def summary(self):
+        text = super().summary()
+        if self.service_ids:
+            text = f"OS abertas: {len(self.service_ids)} (#OS-{self.service_ids[0]} a #OS-{self.service_ids[-1]})\n" + text
+        return text
+
+
+class _RejectsWriter:
+    """CSV de rejeitadas criado só se houver alguma rejeição."""
+
+    def __init__(self, path, header):
+        self.path = path
+        self.header = header
+        self._file = None
+        self._writer = None
+
+    def write(self, line_no, reason, row):
+        if self.path is None:
+            return
+        if self._writer is None:
+            self._file = open(self.path, "w", newline="", encoding="utf-8")
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(["linha", "motivo"] + self.header)
+        self._writer.writerow([line_no, reason] + row)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+class _ProgressFile:
+    """Repassa as linhas do arquivo contando os caracteres lidos (para o percentual)."""
+
+    def __init__(self, f):
+        self.f = f
+        self.chars = 0
+
+    def __iter__(self):
+        for line in self.f:
+            self.chars += len(line)
+            yield line
+
+
+class _CsvSource:
+    """Arquivo CSV aberto para leitura em blocos, com o cabeçalho já mapeado.
+
+    Usado como `with _CsvSource(...) as source:`; `source.chunks(n)` devolve listas de
+    (linha_do_arquivo, {coluna: texto}) e `source.reject(...)` registra uma rejeição."""
+
+    def __init__(self, path, columns, required, report, rejects_path=None):
+        self.path = path
+        self.columns = columns
+        self.required = required
+        self.report = report
+        self.rejects_path = rejects_path
+
+    def __enter__(self):
+        self._file = open(self.path, newline="", encoding="utf-8-sig")
+        try:
+            self._size = max(os.path.getsize(self.path), 1)
+            delimiter = _detect_delimiter(self._file.readline())
+            self._file.seek(0)
+            self._counter = _ProgressFile(self._file)
+            self._reader = csv.reader(self._counter, delimiter=delimiter)
+            self._header = next(self._reader, None)
+            if self._header is None:
+                raise ValueError("Arquivo CSV vazio.")
+            self.positions = _map_header(self._header, self.columns, self.required)
+        except Exception:
+            self._file.close()
+            raise
+        self._rejects = _RejectsWriter(self.rejects_path, self._header)
+        self._rows = {}
+        return self
+
+    def __exit__(self, *exc):
+        self._rejects.close()
+        self._file.close()
+
+    def chunks(self, size):
+        while True:
+            chunk = list(islice(self._reader, size))
+            if not chunk:
+                return
+            self._rows = {}
+            records = []
+            for row in chunk:
+                self.report.read += 1
+                if not any(cell.strip() for cell in row):
+                    continue
+                line_no = self.report.read + 1  # +1 pelo cabeçalho
+                self._rows[line_no] = row
+                records.append((line_no, {column: row[i].strip() if i < len(row) else ""
+                                          for column, i in self.positions.items()}))
+            yield records
+
+    def reject(self, line_no, reason, row=None):
+        """Sem `row`, só vale para linhas do bloco atual (o texto original vai para o CSV de rejeitadas)."""
+        self.report.reject(line_no, reason)
+        self._rejects.write(line_no, reason, self._rows.get(line_no, []) if row is None else row)
+
+    def row(self, line_no):
+        """Texto original de uma linha do bloco atual (para rejeitá-la depois com `reject(..., row)`)."""
+        return self._rows.get(line_no, [])
+
+    def fraction(self):
+        return min(self._counter.chars / self._size, 1.0)
+
+
+def _detect_delimiter(first_line):
+    # Planilhas em português costumam exportar com ';'
+    return ";" if first_line.count(";") > first_line.count(",") else ","
+
+
+def _map_header(header, columns, required):
+    """{coluna_interna: índice} a partir do cabeçalho do arquivo; ValueError se faltar obrigatória."""
+    normalized = [h.strip().lower() for h in header]
+    positions = {}
+    for column, aliases in columns.items():
+        for alias in aliases:
+            if alias in normalized:
+                positions[column] = normalized.index(alias)
+                break
+    missing = [c for c in required if c not in positions]
+    if missing:
+        raise ValueError(f"Colunas obrigatórias ausentes no CSV: {', '.join(missing)}")
+    return positions
+
+
+def parse_number(value, kind):
+    """Converte texto de planilha ('1.234,56' ou '1234.56') em int/float."""
+    value = value.strip()
+    if "," in value:
+        value = value.replace(".", "").replace(",", ".")
+    return kind(value)
+
+
+# ---------- Peças ----------
+def _parse_part(fields):
+    """Tupla (name, sku, qty, price, description) ou ValueError com o motivo."""
+    name, sku = fields["name"], fields["sku"]
+    if not name or not sku:
+        raise ValueError("Nome e SKU obrigatórios.")
+    try:
+        price = parse_number(fields["price"], float)
+    except ValueError:
+        raise ValueError(f"Preço inválido: '{fields['price']}'")
+    try:
+        qty = parse_number(fields.get("qty") or "0", int)
+    except ValueError:
+        raise ValueError(f"Quantidade inválida: '{fields['qty']}'")
+    if qty < 0 or price < 0:
+        raise ValueError("Quantidade e preço não podem ser negativos.")
+    return name, sku, qty, price, fields.get("description", "")
+
+
+def _parts_upsert_sql(positions):
+    # Colunas ausentes no arquivo não sobrescrevem o que já está cadastrado
+    updated = [c for c in ("name", "qty", "price", "description") if c in positions]
+    assignments = ", ".join(f"{c} = excluded.{c}" for c in updated)
+    return ("INSERT INTO parts(name, sku, qty, price, description) VALUES (?, ?, ?, ?, ?) "
+            f"ON CONFLICT(sku) DO UPDATE SET {assignments}")
+
+
+def _write_chunk(conn, sql, batch):
+    with transaction(conn):
+        conn.executemany(sql, batch)
+
+
+def import_parts_csv(conn, path, chunk_size=IMPORT_CHUNK_SIZE, progress=None, rejects_path=None, cache=None):
+    """Importa/atualiza peças de um CSV (upsert pelo SKU). Retorna um ImportReport.
+
+    Cada bloco é gravado na sua própria transação. `progress(linhas_lidas, fração)` é
+    chamado a cada bloco gravado. Se `rejects_path` for informado, as linhas rejeitadas
+    são gravadas lá com o motivo. `cache` é o LookupCache do Repository da mesma conexão
+    (se houver), limpo a cada commit."""
+    report = ImportReport()
+    with _CsvSource(path, PART_COLUMNS, PART_REQUIRED, report, rejects_path) as source:
+        sql = _parts_upsert_sql(source.positions)
+        for records in source.chunks(chunk_size):
+            batch = []
+            for line_no, fields in records:
+                try:
+                    batch.append(_parse_part(fields))
+                except ValueError as e:
+                    source.reject(line_no, str(e))
+            retry_on_busy(conn, lambda: _write_chunk(conn, sql, batch))
+            if cache is not None:
+                cache.clear()
+            report.imported += len(batch)
+            if progress:
+                progress(report.read, source.fraction())
+    if progress:
+        progress(report.read, 1.0)
+    return report
+
+
+# ---------- Clientes e veículos ----------
+def _parse_client_vehicle(fields):
+    """((username, password, fullname, email, phone), veículo ou None); ValueError com o motivo.
+
+    O veículo é ("car", placa, marca, modelo, ano, cor, motor) ou
+    ("motorcycle", placa, marca, modelo, ano, cilindrada)."""
+    username = fields["username"]
+    if not username:
+        raise ValueError("Usuário obrigatório.")
+    client = (username, fields.get("password", ""), fields.get("fullname", ""),
+              fields.get("email", ""), fields.get("phone", ""))
+
+    plate = fields.get("plate", "").upper()
+    if not plate:
+        return client, None
+    try:
+        year = parse_number(fields["year"], int) if fields.get("year") else None
+    except ValueError:
+        raise ValueError(f"Ano inválido: '{fields['year']}'")
+
+    kind = fields.get("type", "").lower()
+    if not kind:
+        # Sem coluna de tipo: cilindrada preenchida indica moto
+        kind = "moto" if fields.get("engine_cc") else "carro"
+    if kind in VEHICLE_TYPES["car"]:
+        return client, ("car", plate, fields.get("brand", ""), fields.get("model", ""), year,
+                        fields.get("color", ""), fields.get("engine", ""))
+    if kind in VEHICLE_TYPES["motorcycle"]:
+        try:
+            engine_cc = parse_number(fields["engine_cc"], int) if fields.get("engine_cc") else None
+        except ValueError:
+            raise ValueError(f"Cilindrada inválida: '{fields['engine_cc']}'")
+        return client, ("motorcycle", plate, fields.get("brand", ""), fields.get("model", ""), year, engine_cc)
+    raise ValueError(f"Tipo de veículo inválido: '{fields['type']}' (use carro ou moto)")
+
+
+def import_clients_csv(conn, path, chunk_size=IMPORT_CHUNK_SIZE, progress=None, rejects_path=None, cache=None):
+    """Importa clientes e seus carros/motos de um CSV (uma linha por veículo). Retorna um ImportReport.
+
+    Todo o arquivo é gravado numa única transação. Os usuários já cadastrados e as placas
+    existentes ficam num mapa em memória, então cada bloco é resolvido sem um SELECT por
+    linha e gravado com `executemany`. Clientes novos precisam de senha; clientes
+    existentes não são alterados. Placas repetidas (no banco ou no próprio arquivo) são
+    rejeitadas sem interromper a importação. `cache` como em import_parts_csv."""
+    report = ImportReport()
+    with _CsvSource(path, CLIENT_COLUMNS, CLIENT_REQUIRED, report, rejects_path) as source:
+        with transaction(conn):
+            client_ids = dict(conn.execute("SELECT username, id FROM users"))
+            plates = {row[0].upper() for row in conn.execute(
+                "SELECT license_plate FROM cars WHERE license_plate IS NOT NULL "
+                "UNION ALL SELECT license_plate FROM motorcycles WHERE license_plate IS NOT NULL")}
+
+            for records in source.chunks(chunk_size):
+                parsed = []
+                new_clients = {}
+                for line_no, fields in records:
+                    try:
+                        client, vehicle = _parse_client_vehicle(fields)
+                    except ValueError as e:
+                        source.reject(line_no, str(e))
+                        continue
+                    username = client[0]
+                    if username not in client_ids and username not in new_clients:
+                        if not client[1]:
+                            source.reject(line_no, f"Cliente novo '{username}' sem senha.")
+                            continue
+                        new_clients[username] = client
+                    parsed.append((line_no, username, vehicle))
+
+                # 1. Clientes novos do bloco, e seus ids em uma única consulta
+                if new_clients:
+                    last_id = conn.execute("SELECT IFNULL(MAX(id), 0) FROM users").fetchone()[0]
+                    conn.executemany(
+                        "INSERT INTO users(username,password,fullname,email,phone,role,photo) "
+                        "VALUES (?, ?, ?, ?, ?, 'client', '')", new_clients.values())
+                    client_ids.update(conn.execute("SELECT username, id FROM users WHERE id > ?", (last_id,)))
+                    report.imported += len(new_clients)
+
+                # 2. Veículos, com a placa conferida no mapa em memória
+                cars, motorcycles = [], []
+                for line_no, username, vehicle in parsed:
+                    if vehicle is None:
+                        continue
+                    kind, plate = vehicle[0], vehicle[1]
+                    if plate in plates:
+                        source.reject(line_no, f"Placa {plate} já cadastrada.")
+                        continue
+                    plates.add(plate)
+                    target = cars if kind == "car" else motorcycles
+                    target.append((client_ids[username],) + vehicle[1:])
+                conn.executemany(
+                    "INSERT INTO cars(client_id, license_plate, brand, model, year, color, engine) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)", cars)
+                conn.executemany(
+                    "INSERT INTO motorcycles(client_id, license_plate, brand, model, year, engine_cc) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", motorcycles)
+                report.imported += len(cars) + len(motorcycles)
+                if progress:
+                    progress(report.read, source.fraction())
+        if cache is not None:
+            cache.clear()  # Usuários e placas novos: validações "não encontrado" guardadas deixam de valer
+    if progress:
+        progress(report.read, 1.0)
+    return report
+
+
+# ---------- OS de contratos de frota ----------
+def _parse_order_line(fields):
+    """(chave_da_OS, username, placa, descrição, mão_de_obra ou None, (sku, qtd, preço ou None) ou None).
+
+    ValueError com o motivo se a linha for inválida."""
+    username, plate = fields["username"], fields["plate"].upper()
+    if not username or not plate:
+        raise ValueError("Cliente e placa obrigatórios.")
+    key = fields.get("order") or (username, plate)
+    try:
+        labor_price = parse_number(fields["labor_price"], float) if fields.get("labor_price") else None
+    except ValueError:
+        raise ValueError(f"Mão de obra inválida: '{fields['labor_price']}'")
+    item = None
+    if fields.get("sku"):
+        try:
+            qty = parse_number(fields.get("qty") or "1", int)
+        except ValueError:
+            raise ValueError(f"Quantidade inválida: '{fields['qty']}'")
+        try:
+            price = parse_number(fields["price"], float) if fields.get("price") else None
+        except ValueError:
+            raise ValueError(f"Preço inválido: '{fields['price']}'")
+        if qty <= 0 or (price is not None and price < 0) or (labor_price is not None and labor_price < 0):
+            raise ValueError("Quantidade deve ser > 0; preço e mão de obra não podem ser negativos.")
+        item = (fields["sku"], qty, price)
+    elif labor_price is not None and labor_price < 0:
+        raise ValueError("Mão de obra não pode ser negativa.")
+    return key, username, plate, fields.get("description", ""), labor_price, item
+
+
+def import_service_orders_csv(repo, path, chunk_size=IMPORT_CHUNK_SIZE, progress=None, rejects_path=None,
+                              seller_name=FLEET_SELLER):
+    """Abre as OS de uma planilha de contrato de frota (uma linha por peça). Retorna um OrdersReport.
+
+    As linhas são agrupadas por OS (coluna de número da OS ou, sem ela, cliente + placa);
+    a mão de obra e a descrição vêm da primeira linha do grupo que as tiver. Peças são
+    localizadas pelo SKU numa consulta por lote, com o preço do catálogo se a planilha
+    não trouxer preço. As OS são gravadas por ServicesRepository.open_service_orders
+    (várias OS por transação) do `repo` recebido, o mesmo Repository (e cache) de quem
+    chama, que também soma SKUs repetidos na mesma OS e recusa OS vazias. Uma linha
+    inválida recusa a OS inteira (nenhuma OS aberta pela metade); as demais OS seguem."""
+    report = OrdersReport()
+    groups = {}  # chave -> {"lines": [(linha, texto)], "username", "plate", "description", "labor", "items", "error"}
+
+    def group_for(key, username, plate):
+        return groups.setdefault(key, {"lines": [], "items": [], "username": username, "plate": plate,
+                                       "description": "", "labor": None, "error": None})
+
+    with _CsvSource(path, ORDER_COLUMNS, ORDER_REQUIRED, report, rejects_path) as source:
+        for records in source.chunks(chunk_size):
+            for line_no, fields in records:
+                try:
+                    key, username, plate, description, labor_price, item = _parse_order_line(fields)
+                except ValueError as e:
+                    source.reject(line_no, str(e))
+                    # A OS da linha não pode ser aberta sem ela
+                    username, plate = fields["username"], fields["plate"].upper()
+                    group = group_for(fields.get("order") or (username, plate), username, plate)
+                    group["error"] = group["error"] or f"OS recusada: linha {line_no} inválida ({e})."
+                    continue
+                group = group_for(key, username, plate)
+                group["lines"].append((line_no, source.row(line_no)))
+                if (username, plate) != (group["username"], group["plate"]):
+                    group["error"] = f"OS recusada: cliente/placa da linha {line_no} diferente das outras linhas."
+                if description and not group["description"]:
+                    group["description"] = description
+                if labor_price is not None and group["labor"] is None:
+                    group["labor"] = labor_price
+                if item is not None:
+                    group["items"].append((line_no, item))
+            if progress:
+                progress(report.read, source.fraction())
+
+        # Peças pelo SKU, todas de uma vez
+        catalog = repo.parts.find_by_skus(sku for group in groups.values() for _, (sku, _, _) in group["items"])
+        orders, opened = [], []
+        for group in groups.values():
+            items = []
+            for line_no, (sku, qty, price) in group["items"]:
+                part = catalog.get(sku)
+                if part is None:
+                    group["error"] = group["error"] or f"OS recusada: SKU '{sku}' da linha {line_no} não cadastrado."
+                    break
+                items.append((part[0], qty, part[3] if price is None else price))
+            if group["error"]:
+                for line_no, row in group["lines"]:
+                    source.reject(line_no, group["error"], row)
+                continue
+            orders.append((group["username"], group["plate"], group["description"], group["labor"] or 0.0, items))
+            opened.append(group)
+
+        for group, (ok, result) in zip(opened, repo.services.open_service_orders(orders, seller_name,
+                                                                                 ORDER_CHUNK_SIZE)):
+            if ok:
+                report.service_ids.append(result)
+                report.imported += len(group["lines"])
+            else:
+                for line_no, row in group["lines"]:
+                    source.reject(line_no, result, row)
+    if progress:
+        progress(report.read, 1.0)
+    return report
+
+
+IMPORTERS = {
+    "parts": import_parts_csv,
+    "clients": import_clients_csv,
+    "orders": import_service_orders_csv,  # Recebe o Repository em vez da conexão
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Importação em massa de CSV - M&M Tunning")
+    parser.add_argument("kind", choices=sorted(IMPORTERS),
+                        help="o que importar (parts = catálogo de peças, clients = clientes e veículos, "
+                             "orders = OS de contrato de frota)")
+    parser.add_argument("path", help="arquivo CSV (separado por ',' ou ';', com cabeçalho)")
+    parser.add_argument("--db", default=DB_NAME, help="arquivo do banco SQLite")
+    parser.add_argument("--rejects", default=None, help="grava as linhas rejeitadas neste CSV")
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+    parser.add_argument("--seller", default=FLEET_SELLER, help="vendedor registrado nas OS (orders)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    init_db(args.db)
+    conn = connect(args.db)
+    try:
+        def show_progress(done, fraction):
+            print(f"\r{done} linhas ({fraction:.0%})", end="", file=sys.stderr, flush=True)
+
+        if args.kind == "orders":
+            # As OS são gravadas pelo Repository (validação de cliente, placa e peças)
+            report = import_service_orders_csv(Repository(conn), args.path, args.chunk_size, show_progress,
+                                               args.rejects, seller_name=args.seller)
+        else:
+            report = IMPORTERS[args.kind](conn, args.path, args.chunk_size, show_progress, args.rejects)
+        print(file=sys.stderr)
+        print(report.summary())
+    finally:
+        conn.close()
+    return 0 if report.rejected == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
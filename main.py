@@ -29,393 +29,69 @@ Modificações de Interface Gráfica para o tema M&M Tunning:
 - **LOGO (NOVO):** Inserção do logo em todos os cantos superiores (esquerdo e direito) das telas modais.
 - **MANUAL (ATUALIZADO):** Revisão completa do Manual Rápido para refletir o fluxo de OS, Veículos e Faturamento.
 - **DADOS DE DEMONSTRAÇÃO (NOVO):** Incluída uma OS completa e uma fatura para demonstração na inicialização.
+- **CAMADA DE DADOS (NOVO):** SQL movido para `repository.py`; a UI apenas chama `self.repo`.
+- **MIGRAÇÕES (NOVO):** Esquema versionado por `PRAGMA user_version` em `database.py`, com índices secundários.
+- **INICIALIZAÇÃO (NOVO):** `init_db` idempotente; dados de demonstração só com `--seed-demo`.
+- **LISTAS PAGINADAS (NOVO):** Tabelas carregam por páginas (keyset) durante a rolagem; ordenação por coluna no SQL.
+- **ATUALIZAÇÃO INCREMENTAL (NOVO):** Listas sincronizam só as linhas alteradas (tabela `change_log` mantida por triggers).
+- **WORKER DE BANCO (NOVO):** Dashboard, Relatórios e Faturamento consultam o SQLite numa thread própria (`worker.py`).
+- **CONTADORES (NOVO):** Cards do Dashboard leem a tabela `stats` mantida por triggers (conferência em Configurações).
+- **FATURAMENTO ATÔMICO (NOVO):** Baixa de estoque condicional em conjunto, numa transação BEGIN IMMEDIATE; lista todas as peças em falta.
+- **FATURAMENTO EM LOTE (NOVO):** Várias OS selecionadas são faturadas de uma vez, com resumo por OS e uma única atualização das telas.
+- **IMPORTAÇÃO DE PEÇAS (NOVO):** Catálogo do fornecedor importado de CSV em blocos (upsert pelo SKU), com progresso e relatório de rejeitadas (`importer.py`).
+- **IMPORTAÇÃO DE CLIENTES (NOVO):** Clientes e seus carros/motos importados de CSV numa única transação; placas repetidas são listadas sem abortar.
+- **EXPORTAÇÃO (NOVO):** Serviços, peças usadas e faturas exportados em CSV ou JSON Lines, com filtro de data e status, em blocos e fora do loop do Tk (`exporter.py`).
+- **BUSCA NO CATÁLOGO (NOVO):** Campo de busca na tela de Serviços (nome, SKU ou descrição), com índice FTS5 mantido por triggers e resultados por relevância.
+- **ÍNDICE DE PLACAS (NOVO):** Tabela `vehicle_index` (carros e motos) mantida por triggers; a validação cliente + placa da OS é uma única consulta indexada.
+- **CACHE DE CONSULTAS (NOVO):** Usuário e validação cliente/placa em cache LRU (`cache.py`), invalidado pelas próprias escritas e pelo `PRAGMA data_version`; estatísticas em Configurações.
+- **CACHE DE IMAGENS (NOVO):** Logo decodificada uma vez e redimensionada (LANCZOS) por tamanho (`images.py`); trocar a logo atualiza as telas sem reiniciar.
+- **INICIALIZAÇÃO RÁPIDA (NOVO):** PIL e diálogos de arquivo carregados só no uso; a tela de boas-vindas aparece antes do preparo do banco (em segundo plano). Tempos por etapa com `--profile-startup`.
+- **TELAS REUTILIZADAS (NOVO):** Cada tela é montada uma única vez (`screens.py`); fechar apenas esconde a janela e reabrir só atualiza os dados. O Dashboard não é mais reconstruído ao voltar.
+- **MODO MULTIESTAÇÃO (NOVO):** `--multi-user` liga o journal WAL (leitores não bloqueiam quem grava), com busy timeout, synchronous=NORMAL e novas tentativas com espera crescente nas gravações.
+- **SERVIDOR LOCAL (NOVO):** `server.py` (asyncio, HTTP/JSON) abre o banco num único processo: leituras num pool de conexões e gravações em lote por uma única conexão de escrita. `--server URL` faz a interface usar o servidor (`remote.py`).
+- **VOLUME E BENCHMARK (NOVO):** `datagen.py` gera dados sintéticos determinísticos (semente) em volume de oficina grande; `benchmark.py` mede Dashboard, listas, validação de placa, abertura e faturamento de OS e grava o resultado em JSON (com `--compare` entre versões).
+- **RASTREAMENTO SQL (NOVO):** Cada comando das conexões locais é medido (tempo, linhas e origem no código) num buffer em memória (`tracing.py`); os lentos vão para `consultas_lentas.log`, inclusive os que ainda estão rodando (progress handler). Tela 12 (Admin) mostra as consultas de maior tempo total e p95.
+- **MONITOR DO LOOP DO TK (NOVO):** `--watchdog` agenda batimentos (`after`) e mede o atraso de cada um (histograma), mede cada callback do Tk (`CallWrapper`) pelo nome e grava travamentos acima de 100 ms em `travamentos.log`, com o callback responsável (`watchdog.py`).
+- **CARRINHO DA OS (NOVO):** o carrinho guarda as linhas do catálogo já tipadas por ID (`cart.py`): adicionar não relê o preço do texto da Treeview nem consulta o nome no banco, o total é incremental, só a linha alterada é atualizada e a falta de estoque é avisada na hora (com confirmação ao abrir a OS).
+- **OS EM LOTE (NOVO):** a OS e seus itens são gravados numa única transação, com um `executemany` para as peças; `services.open_service_orders` abre várias OS por transação (contratos de frota, também pelo servidor) e `python importer.py orders frota.csv` abre as OS de uma planilha, recusando inteira a OS com linha inválida.
 """
 
+import time
+
+_START = time.perf_counter()  # Referência do --profile-startup
+
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
-from PIL import Image, ImageTk, ImageDraw, ImageFont
+from tkinter import ttk, messagebox
 import sqlite3
 import os
+import sys
+import argparse
 import datetime
+import threading
+
+from database import DB_NAME, connect, init_db, is_multi_user
+from repository import Repository
+from widgets import VirtualTreeview
+from worker import DBWorker
+from images import ImageCache
+from screens import ScreenManager
+from cart import Cart
 
 # --- CONFIGURAÇÕES DO PROJETO ---
 PROJECT_NAME = "M&M Tunning"
-DB_NAME = "mmtunning.db"
 LOGO_PATH = "logo.png"
+# Tamanhos da logo usados nas telas (boas-vindas, dashboard, cabeçalho das janelas)
+LOGO_SIZES = [(247, 186), (120, 50), (80, 30)]
+LOGO_POLL_MS = 30  # Intervalo para exibir a logo da tela inicial quando estiver pronta
+DB_SETUP_POLL_MS = 20  # Intervalo para verificar se a preparação do banco terminou
+SEARCH_DEBOUNCE_MS = 200  # Espera após a última tecla antes de buscar no catálogo
 
 # --- CONSTANTES DE ESTILO ---
 PRIMARY_COLOR = "#00FFFF"  # Azul Neon/Ciano (Destaque)
 BG_COLOR = "#29313A"  # Cinza Escuro (Fundo Principal)
 HEADER_COLOR = "#1E2A3A"  # Cinza Quase Preto (Header/Menu)
 TEXT_COLOR = "#FFFFFF"  # Branco (Texto Principal)
-
-
-# ---------- Banco de Dados ----------
-def init_db():
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    # Tabelas base
-    c.execute('''
-              CREATE TABLE IF NOT EXISTS users
-              (
-                  id
-                  INTEGER
-                  PRIMARY
-                  KEY
-                  AUTOINCREMENT,
-                  username
-                  TEXT
-                  UNIQUE,
-                  password
-                  TEXT,
-                  fullname
-                  TEXT,
-                  email
-                  TEXT,
-                  phone
-                  TEXT,
-                  role
-                  TEXT, -- 'admin' ou 'client'
-                  photo
-                  TEXT
-              )
-              ''')
-    c.execute('''
-              CREATE TABLE IF NOT EXISTS parts
-              (
-                  id
-                  INTEGER
-                  PRIMARY
-                  KEY
-                  AUTOINCREMENT,
-                  name
-                  TEXT,
-                  sku
-                  TEXT
-                  UNIQUE,
-                  qty
-                  INTEGER,
-                  price
-                  REAL,
-                  description
-                  TEXT
-              )
-              ''')
-    c.execute('''
-              CREATE TABLE IF NOT EXISTS tools
-              (
-                  id
-                  INTEGER
-                  PRIMARY
-                  KEY
-                  AUTOINCREMENT,
-                  name
-                  TEXT,
-                  code
-                  TEXT
-                  UNIQUE,
-                  available
-                  INTEGER,
-                  description
-                  TEXT
-              )
-              ''')
-
-    # NOVAS TABELAS PARA VEÍCULOS
-    c.execute('''
-              CREATE TABLE IF NOT EXISTS cars
-              (
-                  id
-                  INTEGER
-                  PRIMARY
-                  KEY
-                  AUTOINCREMENT,
-                  client_id
-                  INTEGER,
-                  license_plate
-                  TEXT
-                  UNIQUE,
-                  brand
-                  TEXT,
-                  model
-                  TEXT,
-                  year
-                  INTEGER,
-                  color
-                  TEXT,
-                  engine
-                  TEXT,
-                  FOREIGN
-                  KEY
-              (
-                  client_id
-              ) REFERENCES users
-              (
-                  id
-              )
-                  )
-              ''')
-    c.execute('''
-              CREATE TABLE IF NOT EXISTS motorcycles
-              (
-                  id
-                  INTEGER
-                  PRIMARY
-                  KEY
-                  AUTOINCREMENT,
-                  client_id
-                  INTEGER,
-                  license_plate
-                  TEXT
-                  UNIQUE,
-                  brand
-                  TEXT,
-                  model
-                  TEXT,
-                  year
-                  INTEGER,
-                  engine_cc
-                  INTEGER,
-                  FOREIGN
-                  KEY
-              (
-                  client_id
-              ) REFERENCES users
-              (
-                  id
-              )
-                  )
-              ''')
-
-    # Tabela de Serviços/Financeiro - REFATORADA PARA NOVOS CAMPOS
-    c.execute('''
-              CREATE TABLE IF NOT EXISTS services
-              (
-                  id
-                  INTEGER
-                  PRIMARY
-                  KEY
-                  AUTOINCREMENT,
-                  client_id
-                  INTEGER,
-                  vehicle_plate
-                  TEXT, -- NOVO: Placa do veículo em serviço
-                  description
-                  TEXT,
-                  labor_price
-                  REAL, -- NOVO: Preço da Mão de Obra
-                  final_total
-                  REAL, -- NOVO: Total final após faturamento (inclui labor_price + peças)
-                  date
-                  TEXT,
-                  status
-                  TEXT,
-                  seller_name
-                  TEXT, -- Vendedor/Atendente que abriu a OS
-                  FOREIGN
-                  KEY
-              (
-                  client_id
-              ) REFERENCES users
-              (
-                  id
-              )
-                  )
-              ''')
-
-    # NOVAS TABELAS DE RELACIONAMENTO OS <-> ESTOQUE
-    c.execute('''
-              CREATE TABLE IF NOT EXISTS service_parts
-              (
-                  service_id
-                  INTEGER,
-                  part_id
-                  INTEGER,
-                  qty_used
-                  INTEGER,
-                  price_unit
-                  REAL,
-                  FOREIGN
-                  KEY
-              (
-                  service_id
-              ) REFERENCES services
-              (
-                  id
-              ),
-                  FOREIGN KEY
-              (
-                  part_id
-              ) REFERENCES parts
-              (
-                  id
-              ),
-                  PRIMARY KEY
-              (
-                  service_id,
-                  part_id
-              )
-                  )
-              ''')
-
-    # ATENÇÃO: A tabela service_tools foi removida para simplificar o fluxo.
-
-    c.execute('''
-              CREATE TABLE IF NOT EXISTS invoices
-              (
-                  id
-                  INTEGER
-                  PRIMARY
-                  KEY
-                  AUTOINCREMENT,
-                  service_id
-                  INTEGER,
-                  total
-                  REAL,
-                  date
-                  TEXT,
-                  paid
-                  INTEGER,
-                  FOREIGN
-                  KEY
-              (
-                  service_id
-              ) REFERENCES services
-              (
-                  id
-              )
-                  )
-              ''')
-
-    # --- DADOS INICIAIS ---
-
-    # 1. Usuários (Admin e Clientes)
-    users_data = [
-        ("admin", "admin123", "Mestre Tunning", "admin@mmtunning.com", "11999990000", "admin", ""),
-        ("corredor_r", "cli456", "Rafael Rossi", "rafael.rossi@mail.com", "11981234567", "client", ""),
-        ("piloto_j", "cli789", "Juliana Santos", "ju.santos@mail.com", "11989876543", "client", ""),
-        ("turbo_m", "cli101", "Márcio Oliveira", "marcio.oli@mail.com", "11977771111", "client", "")
-    ]
-    for data in users_data:
-        try:
-            c.execute(
-                "INSERT INTO users(username,password,fullname,email,phone,role,photo) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                data)
-        except sqlite3.IntegrityError:
-            pass
-
-    # --- INSERÇÃO DE VEÍCULOS DE EXEMPLO ---
-
-    # Busca IDs dos clientes para FK
-
-    c.execute("SELECT id FROM users WHERE username='corredor_r'")
-    row_r = c.fetchone()
-    id_corredor_r = row_r[0] if row_r else 2
-
-    c.execute("SELECT id FROM users WHERE username='piloto_j'")
-    row_j = c.fetchone()
-    id_piloto_j = row_j[0] if row_j else 3
-
-    c.execute("SELECT id FROM users WHERE username='turbo_m'")
-    row_m = c.fetchone()
-    id_turbo_m = row_m[0] if row_m else 4
-
-    # Carros
-    cars_data = [
-        (id_corredor_r, "ABC-1234", "Subaru", "WRX STI", 2019, "Azul", "2.5L Turbo"),
-        (id_piloto_j, "DEF-5678", "Honda", "Civic SI", 2022, "Vermelha", "1.5L VTEC"),
-        (id_turbo_m, "GHI-9012", "VW", "Golf GTI", 2023, "Branco", "2.0L TSI")
-    ]
-    for data in cars_data:
-        try:
-            c.execute(
-                "INSERT INTO cars(client_id, license_plate, brand, model, year, color, engine) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                data)
-        except sqlite3.IntegrityError:
-            pass
-
-    # Motos
-    motorcycles_data = [
-        (id_corredor_r, "MNO-3456", "Yamaha", "R3", 2021, 321),
-        (id_piloto_j, "PQR-7890", "Kawasaki", "Ninja 400", 2023, 400),
-        (id_turbo_m, "STU-1234", "Triumph", "Street Triple", 2024, 765)
-    ]
-    for data in motorcycles_data:
-        try:
-            c.execute(
-                "INSERT INTO motorcycles(client_id, license_plate, brand, model, year, engine_cc) VALUES (?, ?, ?, ?, ?, ?)",
-                data)
-        except sqlite3.IntegrityError:
-            pass
-
-    # 3. Peças (Mais focadas em Performance)
-    parts_data = [
-        ("Vela Iridium Performance", "P-IGN-005", 30, 95.0, "Velas de ignição para alto desempenho."),
-        ("Filtro Ar Esportivo K&N", "P-FIL-010", 15, 450.0, "Filtro cônico lavável, alto fluxo."),
-        ("Óleo Sintético 5W40", "P-OIL-050", 40, 65.0, "Óleo totalmente sintético para motores turbo.")
-    ]
-    for data in parts_data:
-        try:
-            c.execute("INSERT INTO parts(name,sku,qty,price,description) VALUES (?, ?, ?, ?, ?)", data)
-        except sqlite3.IntegrityError:
-            pass
-
-    # 4. Ferramentas
-    tools_data = [
-        ("Scanner de Diagnóstico OBD-II", "T-SCA-001", 1, "Leitura e calibração de ECU."),
-        ("Medidor de Pressão Turbo", "T-BOO-002", 3, "Para ajuste fino de turbinas."),
-        ("Torquímetro Digital 1/2", "T-TOR-003", 2, "Chave de torque de alta precisão.")
-    ]
-    for data in tools_data:
-        try:
-            c.execute("INSERT INTO tools(name,code,available,description) VALUES (?, ?, ?, ?)", data)
-        except sqlite3.IntegrityError:
-            pass
-
-    # --- DADOS DE DEMONSTRAÇÃO DO FLUXO COMPLETO (OS + FATURA) ---
-    try:
-        # Busca IDs de peças (P-FIL-010 e P-OIL-050)
-        c.execute("SELECT id, price FROM parts WHERE sku='P-FIL-010'")
-        part1_id, part1_price = c.fetchone()
-        c.execute("SELECT id, price FROM parts WHERE sku='P-OIL-050'")
-        part2_id, part2_price = c.fetchone()
-
-        # Calcula o total da OS para preencher o final_total
-        mo_price = 150.00
-        qty1 = 1
-        qty2 = 5
-        parts_total = (qty1 * part1_price) + (qty2 * part2_price)
-        final_total = mo_price + parts_total
-
-        current_date = datetime.date.today().isoformat()
-
-        # 1. Insere a OS (Status Fechado, Total Final Calculado)
-        c.execute(
-            "INSERT INTO services(client_id, vehicle_plate, description, labor_price, final_total, date, status, seller_name) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-            (id_corredor_r, "ABC-1234", "Serviço Completo de Troca de Óleo e Filtros - Demonstração", mo_price,
-             final_total, current_date, "Fechado", "Mestre Tunning"))
-        service_id_demo = c.lastrowid
-
-        # 2. Insere as Peças Usadas (service_parts)
-        c.execute("INSERT INTO service_parts (service_id, part_id, qty_used, price_unit) VALUES (?, ?, ?, ?)",
-                  (service_id_demo, part1_id, qty1, part1_price))
-        c.execute("INSERT INTO service_parts (service_id, part_id, qty_used, price_unit) VALUES (?, ?, ?, ?)",
-                  (service_id_demo, part2_id, qty2, part2_price))
-
-        # 3. Insere a Fatura (Invoices)
-        c.execute("INSERT INTO invoices(service_id, total, date, paid) VALUES (?, ?, ?, ?)",
-                  (service_id_demo, final_total, current_date, 1))  # 1 = Pago
-
-        # 4. Dá Baixa no Estoque para as Peças Usadas na Demonstração
-        c.execute("UPDATE parts SET qty = qty - ? WHERE id=?", (qty1, part1_id))
-        c.execute("UPDATE parts SET qty = qty - ? WHERE id=?", (qty2, part2_id))
-
-    except Exception as e:
-        # Ignora erros de integridade se o dado já existir ou se as peças/clientes não forem encontrados
-        print(f"Erro ao inserir dados de demonstração (pode ser ignorado se o BD já existir): {e}")
-
-    conn.commit()
-    conn.close()
+LOADING_TEXT = "..."  # Placeholder enquanto o worker de banco responde
 
 
 # ---------- Utilitários ----------
@@ -425,23 +101,43 @@ def format_currency(v):
 
 # ---------- App UI ----------
 class MM_Tunning_App:
-    def __init__(self, root):
+    def __init__(self, root, seed_demo=False, timer=None, multi_user=None, server_url=None, slow_ms=None,
+                 watchdog=None):
         self.root = root
+        self.multi_user = multi_user  # True/False liga/desliga o modo multiestação (WAL); None mantém
+        # Com server_url os dados vêm do servidor HTTP (server.py) em vez do arquivo SQLite
+        self.server_url = server_url
+        self.timer = timer or StartupTimer(False)
+        # Tempo, linhas e origem de cada comando SQL das conexões locais (tela de Desempenho);
+        # slow_ms None = limite padrão de tracing.py, 0 desliga (e o módulo nem é carregado)
+        self.tracer = None
+        if slow_ms != 0 and not server_url:
+            from tracing import SLOW_QUERY_MS, QueryTracer
+            self.tracer = QueryTracer(SLOW_QUERY_MS if slow_ms is None else slow_ms)
+        # Monitor do loop do Tk (--watchdog): atrasos e callbacks lentos, ver watchdog.py
+        self.watchdog = watchdog
         root.title(f"{PROJECT_NAME} - Sistema Gerenciador de Mecânica")
         # CONFIGURAÇÃO PARA TELA CHEIA (FULL SCREEN)
         root.attributes('-fullscreen', True)
         root.bind('<Escape>', lambda e: root.attributes('-fullscreen', False))  # Adiciona ESC para sair do full screen
 
-        self.conn = sqlite3.connect(DB_NAME)
+        # Banco preparado em segundo plano (ver start_db_setup); até lá só a tela de boas-vindas funciona
+        self.conn = None
+        self.repo = None
+        self.db = None
+        self.db_buttons = []
+        self.db_status_lbl = None
         self.user = None
-        self.logo_img = None
 
-        # O cache de imagem DEVE estar na instância da aplicação para funcionar
-        self.logo_img_cache = {}
+        # Telas montadas uma vez e reexibidas (withdraw/deiconify), ver screens.py
+        self.screens = ScreenManager(root)
 
-        # Estrutura temporária para o "carrinho" de Peças
-        # Formato: {part_id: {'name': name, 'sku': sku, 'qty': qty, 'price': price}}
-        self.os_cart = {}
+        # Cache de imagens por (arquivo, tamanho, mtime); as versões da logo são preparadas em segundo plano
+        self.images = ImageCache(self.logo_placeholder)
+        self.images.prewarm(LOGO_PATH, LOGO_SIZES)
+
+        # "Carrinho" de Peças da OS em montagem, com as linhas do catálogo já tipadas (ver cart.py)
+        self.cart = Cart()
 
         # --- NOVA CONFIGURAÇÃO DE ESTILO E TEMA ---
         self.style = ttk.Style(self.root)
@@ -451,27 +147,6 @@ class MM_Tunning_App:
         self.style.configure('.', font=("Inter", 10), background=BG_COLOR, foreground=TEXT_COLOR)
         self.style.configure('TFrame', background=BG_COLOR)
         self.style.configure('TLabel', background=BG_COLOR, foreground=TEXT_COLOR)
-        self.style.configure('TCheckbutton', background=BG_COLOR, foreground=TEXT_COLOR)
-        self.style.configure('TLabelframe', background=BG_COLOR, foreground=TEXT_COLOR)
-        self.style.configure('TLabelframe.Label', background=BG_COLOR, foreground=PRIMARY_COLOR)
-
-        # Estilo para Treeview (Tabela) - fundo escuro
-        self.style.configure("Treeview",
-                             background="#3C4855",
-                             foreground=TEXT_COLOR,
-                             fieldbackground="#3C4855",
-                             font=("Inter", 10))
-        self.style.map("Treeview",
-                       background=[('selected', PRIMARY_COLOR)],
-                       foreground=[('selected', '#000000')])
-
-        # Ajuste de Treeview Header
-        self.style.configure("Treeview.Heading",
-                             font=("Inter", 10, 'bold'),
-                             background=HEADER_COLOR,
-                             foreground=PRIMARY_COLOR)
-        self.style.map("Treeview.Heading",
-                       background=[('active', '#444444')])
 
         # Estilo para Botões Primários (Ação) - Usado nos botões de formulários
         self.style.configure('Primary.TButton',
@@ -502,47 +177,160 @@ class MM_Tunning_App:
                              font=("Inter", 14),
                              foreground=TEXT_COLOR,
                              background=BG_COLOR)
+        self.timer.mark("estilos básicos")
+
+        # Tela principal: Welcome -> Login
+        self.build_welcome_screen()
+        self.timer.mark("tela de boas-vindas montada")
+
+        # Depois do primeiro quadro: estilos das demais telas e preparação do banco
+        self.root.after_idle(self.after_first_frame, seed_demo)
+
+    def after_first_frame(self, seed_demo):
+        self.timer.mark("primeiro quadro")
+        self.configure_screen_styles()
+        self.timer.mark("estilos das demais telas")
+        self.start_db_setup(seed_demo)
+
+    def configure_screen_styles(self):
+        """Estilos usados só depois da tela de boas-vindas (tabelas, cabeçalhos, formulários)."""
+        self.style.configure('TCheckbutton', background=BG_COLOR, foreground=TEXT_COLOR)
+        self.style.configure('TLabelframe', background=BG_COLOR, foreground=TEXT_COLOR)
+        self.style.configure('TLabelframe.Label', background=BG_COLOR, foreground=PRIMARY_COLOR)
+
+        # Estilo para Treeview (Tabela) - fundo escuro
+        self.style.configure("Treeview",
+                             background="#3C4855",
+                             foreground=TEXT_COLOR,
+                             fieldbackground="#3C4855",
+                             font=("Inter", 10))
+        self.style.map("Treeview",
+                       background=[('selected', PRIMARY_COLOR)],
+                       foreground=[('selected', '#000000')])
+
+        # Ajuste de Treeview Header
+        self.style.configure("Treeview.Heading",
+                             font=("Inter", 10, 'bold'),
+                             background=HEADER_COLOR,
+                             foreground=PRIMARY_COLOR)
+        self.style.map("Treeview.Heading",
+                       background=[('active', '#444444')])
 
         # Estilo para o Menu/Header
         self.style.configure('Menu.TFrame', background=HEADER_COLOR)
 
-        # Tela principal: Welcome -> Login
-        self.build_welcome_screen()
+    # --- preparação do banco em segundo plano ---
+    def start_db_setup(self, seed_demo):
+        """Roda init_db (migrações/dados de demonstração) numa thread enquanto a tela de boas-vindas aparece."""
+        result = {}
 
-    # --- helpers para imagens (logo/placeholder) ---
-    def load_logo(self, w=247, h=186):
-        # Tenta carregar a imagem real
-        if os.path.exists(LOGO_PATH):
+        def work():
+            started = time.perf_counter()
             try:
-                img = Image.open(LOGO_PATH)
-            except Exception:
-                img = Image.new("RGB", (w, h), (50, 50, 50))
+                if self.server_url:
+                    from remote import RemoteRepository  # Só no modo servidor (carrega o cliente HTTP)
+                    remote = RemoteRepository(self.server_url)
+                    remote.health()  # Só confere se o servidor responde
+                    remote.close()
+                else:
+                    init_db(DB_NAME, seed=seed_demo, multi_user=self.multi_user)
+            except Exception as e:
+                result["error"] = e
+            result["seconds"] = time.perf_counter() - started
+
+        thread = threading.Thread(target=work, name="DBSetup", daemon=True)
+        thread.start()
+        self.root.after(DB_SETUP_POLL_MS, self.wait_db_setup, thread, result)
+
+    def wait_db_setup(self, thread, result):
+        if thread.is_alive():
+            self.root.after(DB_SETUP_POLL_MS, self.wait_db_setup, thread, result)
+            return
+        self.timer.add("init_db (thread)", result["seconds"])
+        if "error" in result:
+            target = f"conectar ao servidor {self.server_url}" if self.server_url else "preparar o banco de dados"
+            messagebox.showerror("Erro", f"Falha ao {target}:\n{result['error']}")
+            return
+
+        if self.server_url:
+            from remote import RemoteRepository
+            # Mesma interface do Repository; cada thread usa a sua conexão HTTP
+            self.repo = RemoteRepository(self.server_url)
+            self.db = DBWorker(self.root, DB_NAME, lambda: RemoteRepository(self.server_url))
         else:
-            # Placeholder se não encontrar a imagem
-            img = Image.new("RGB", (w, h), (41, 53, 65))
-            draw = ImageDraw.Draw(img)
-            try:
-                font = ImageFont.truetype("arial.ttf", 20)
-            except IOError:
-                font = ImageFont.load_default()
-            draw.text((w / 2, h / 2), "M&M LOGO", font=font, fill=PRIMARY_COLOR, anchor="mm")
+            self.conn = self.open_connection()
+            # Toda a lógica de dados fica no Repository (headless); a UI apenas o consome
+            self.repo = Repository(self.conn)
+            # Mantém o change_log curto; listas abertas há muito tempo apenas recarregam
+            self.repo.changes.prune()
+            # Consultas pesadas rodam no worker, com conexão própria, sem travar o loop do Tk
+            self.db = DBWorker(self.root, DB_NAME, lambda: Repository(self.open_connection()))
+        self.timer.mark("banco pronto")
+        self.timer.report()
+
+        for btn in self.db_buttons:
+            if btn.winfo_exists():
+                btn.config(state=tk.NORMAL)
+        self.db_buttons = []
+        if self.db_status_lbl is not None and self.db_status_lbl.winfo_exists():
+            self.db_status_lbl.config(text="")
+
+    def open_connection(self):
+        """Conexão local; com o rastreamento ligado, cada comando é medido (ver tracing.py)."""
+        if self.tracer is None:
+            return connect(DB_NAME)
+        from tracing import TracedConnection
+        return self.tracer.attach(connect(DB_NAME, factory=TracedConnection))
+
+    def db_button(self, btn):
+        """Botão que depende do banco: fica desabilitado até a preparação terminar."""
+        if self.repo is None:
+            btn.config(state=tk.DISABLED)
+            self.db_buttons.append(btn)
+        return btn
+
+    # --- helpers para imagens (logo/placeholder) ---
+    def load_logo(self, w=247, h=186):
+        # Decodifica o arquivo uma vez; cada tamanho é redimensionado (LANCZOS) uma vez
+        return self.images.photo(LOGO_PATH, (w, h))
+
+    def show_logo_when_ready(self, label, size):
+        """Exibe a logo assim que a thread de preparo terminar, sem esperar por ela no primeiro quadro."""
+        if not label.winfo_exists():
+            return
+        if not self.images.ready(LOGO_PATH, size):
+            self.root.after(LOGO_POLL_MS, self.show_logo_when_ready, label, size)
+            return
+        logo = self.load_logo(*size)
+        label.config(image=logo)
+        label.image = logo
+
+    @staticmethod
+    def logo_placeholder(w, h):
+        # Placeholder se não encontrar (ou não conseguir abrir) a imagem
+        from PIL import Image, ImageDraw, ImageFont
+        img = Image.new("RGB", (w, h), (41, 53, 65))
+        draw = ImageDraw.Draw(img)
+        try:
+            font = ImageFont.truetype("arial.ttf", 20)
+        except IOError:
+            font = ImageFont.load_default()
+        draw.text((w / 2, h / 2), "M&M LOGO", font=font, fill=PRIMARY_COLOR, anchor="mm")
+        return img
 
-        img = img.resize((w, h))
-        self.logo_img = ImageTk.PhotoImage(img)
-        return self.logo_img
+    def setup_modal_window(self, win, title, name, on_show=None):
+        """Configura uma janela Toplevel para ser modal e em Full Screen.
 
-    def setup_modal_window(self, win, title, geometry=None):
-        """Configura uma janela Toplevel para ser modal e em Full Screen."""
+        A janela fica registrada como `name`: fechar apenas a esconde e a próxima abertura
+        a reexibe chamando `on_show` (atualização dos dados) em vez de montá-la de novo."""
         win.title(title)
 
         # JANELA MODAL EM FULL SCREEN
-        win.attributes('-fullscreen', True)
         win.bind('<Escape>', lambda e: win.attributes('-fullscreen', False))  # Permite sair do full screen com ESC
 
         win.configure(bg=self.root.cget('bg'))
         win.transient(self.root)  # Faz a janela depender da principal
-        win.grab_set()  # Impede interação com outras janelas
-        self.root.wait_window(win)  # Espera a janela fechar
+        self.screens.add_modal(name, win, on_show)
 
     def insert_header_logo(self, parent_frame):
         """Insere o logo reduzido no topo esquerdo e direito de um frame, com o título no centro.
@@ -552,12 +340,8 @@ class MM_Tunning_App:
         header_container = ttk.Frame(parent_frame, style='Menu.TFrame', padding="10 10 10 10")
         header_container.pack(fill=tk.X, anchor=tk.N)
 
-        logo_key = "header_logo_80x30"
-
-        # 1. Carrega/Obtém a imagem (80x30)
-        if logo_key not in self.logo_img_cache:
-            self.logo_img_cache[logo_key] = self.load_logo(80, 30)
-        img_ref = self.logo_img_cache[logo_key]
+        # 1. Carrega/Obtém a imagem (80x30) do cache de imagens
+        img_ref = self.load_logo(80, 30)
 
         # --- LADO ESQUERDO: LOGO + NOME ---
 
@@ -589,16 +373,16 @@ class MM_Tunning_App:
         # 1) Tela de Boas-vindas (Welcome)
 
     def build_welcome_screen(self):
-        self.clear_root()
+        if self.screens.show_page("welcome"):
+            return
         frame = ttk.Frame(self.root, padding="40 80 40 40")
-        frame.pack(fill=tk.BOTH, expand=True)
 
-        logo = self.load_logo()
-        logo_frame = ttk.Frame(frame);
+        logo_frame = ttk.Frame(frame, width=LOGO_SIZES[0][0], height=LOGO_SIZES[0][1]);
         logo_frame.pack(pady=20)
-        lbl_logo = ttk.Label(logo_frame, image=logo)
-        lbl_logo.image = logo
+        logo_frame.pack_propagate(False)  # Reserva o espaço da logo enquanto ela é preparada
+        lbl_logo = ttk.Label(logo_frame)
         lbl_logo.pack()
+        self.show_logo_when_ready(lbl_logo, LOGO_SIZES[0])
 
         title = ttk.Label(frame, text=f"Bem-vindo(a) ao {PROJECT_NAME}", style='Title.TLabel')
         title.pack(pady=10)
@@ -607,9 +391,10 @@ class MM_Tunning_App:
                          style='Subtitle.TLabel', wraplength=700)
         desc.pack(pady=10)
 
-        btn_login = ttk.Button(frame, text="Entrar (Login)", style='Primary.TButton', command=self.build_login_screen)
+        btn_login = self.db_button(
+            ttk.Button(frame, text="Entrar (Login)", style='Primary.TButton', command=self.build_login_screen))
         btn_login.pack(pady=15)
-        btn_register = ttk.Button(frame, text="Registrar Cliente", command=self.build_register_screen)
+        btn_register = self.db_button(ttk.Button(frame, text="Registrar Cliente", command=self.build_register_screen))
         btn_register.pack(pady=5)
 
         # Quick sample buttons (Nav Frame) - Atualizado para refletir a nova ordem
@@ -619,21 +404,32 @@ class MM_Tunning_App:
                                                                                                                   column=0,
                                                                                                                   columnspan=4,
                                                                                                                   pady=8)
-        ttk.Button(nav_frame, text="Dashboard", command=self.build_dashboard).grid(row=1, column=0, padx=6)
-        ttk.Button(nav_frame, text="Cadastrar Peças", command=self.build_parts_screen).grid(row=1, column=1, padx=6)
-        ttk.Button(nav_frame, text="Cadastrar Ferramentas", command=self.build_tools_screen).grid(row=1, column=2,
-                                                                                                  padx=6)
-        ttk.Button(nav_frame, text="Serviços", command=self.build_services_screen).grid(row=1, column=3, padx=6)
+        self.db_button(ttk.Button(nav_frame, text="Dashboard", command=self.build_dashboard)).grid(row=1, column=0,
+                                                                                                    padx=6)
+        self.db_button(ttk.Button(nav_frame, text="Cadastrar Peças", command=self.build_parts_screen)).grid(row=1,
+                                                                                                             column=1,
+                                                                                                             padx=6)
+        self.db_button(ttk.Button(nav_frame, text="Cadastrar Ferramentas", command=self.build_tools_screen)).grid(
+            row=1, column=2, padx=6)
+        self.db_button(ttk.Button(nav_frame, text="Serviços", command=self.build_services_screen)).grid(row=1,
+                                                                                                         column=3,
+                                                                                                         padx=6)
+        self.db_status_lbl = ttk.Label(frame, text="" if self.repo else "Preparando banco de dados...",
+                                       foreground='#AAAAAA')
+        self.db_status_lbl.pack(pady=5)
 
         footer = ttk.Label(frame, text=f"{PROJECT_NAME} • Simulação educacional • Dados fictícios", font=("Inter", 8),
                            foreground='#AAAAAA')
         footer.pack(side=tk.BOTTOM, pady=8)
 
+        self.screens.add_page("welcome", frame)
+        self.screens.show_page("welcome")
+
     # 2) Tela de Login
     def build_login_screen(self):
-        self.clear_root()
+        if self.screens.show_page("login"):
+            return
         frame = ttk.Frame(self.root, padding="40 80 40 40")
-        frame.pack(fill=tk.BOTH, expand=True)
 
         ttk.Label(frame, text="Acesso ao Sistema", style='Title.TLabel').pack(pady=10)
         ttk.Label(frame, text="Entre com suas credenciais de usuário.", style='Subtitle.TLabel').pack(pady=10)
@@ -658,16 +454,11 @@ class MM_Tunning_App:
         def attempt_login():
             username = user_entry.get().strip()
             password = pass_entry.get().strip()
-            c = self.conn.cursor()
-            c.execute("SELECT id,username,fullname,email,phone,role,photo FROM users WHERE username=? AND password=?",
-                      (username, password))
-            row = c.fetchone()
-            if row:
-                self.user = {
-                    "id": row[0], "username": row[1], "fullname": row[2],
-                    "email": row[3], "phone": row[4], "role": row[5], "photo": row[6]
-                }
+            user = self.repo.users.authenticate(username, password)
+            if user:
+                self.user = user
                 messagebox.showinfo("Login", f"Bem-vindo(a), {self.user['fullname']} ({self.user['role']})")
+                self.reset_user_screens()
                 self.build_dashboard()
             else:
                 messagebox.showerror("Login", "Usuário ou senha inválidos.")
@@ -675,8 +466,18 @@ class MM_Tunning_App:
         ttk.Button(frame, text="Entrar", style='Primary.TButton', command=attempt_login).pack(pady=15)
         ttk.Button(frame, text="Voltar", command=self.build_welcome_screen).pack()
 
+        def clear_form():
+            user_entry.delete(0, tk.END)
+            pass_entry.delete(0, tk.END)
+            user_entry.focus_set()
+
+        self.screens.add_page("login", frame, on_show=clear_form)
+        self.screens.show_page("login")
+
     # 3) Tela de Registro de Cliente
     def build_register_screen(self):
+        if self.screens.show_modal("register"):
+            return
         win = tk.Toplevel(self.root)
 
         frame = ttk.Frame(win, padding=20)  # Aumentar padding para full screen
@@ -706,6 +507,7 @@ class MM_Tunning_App:
             entries.append(e)
 
         def browse_photo():
+            from tkinter import filedialog  # Carregado só quando o diálogo é aberto
             path = filedialog.askopenfilename(filetypes=[("Imagens", "*.png;*.jpg;*.jpeg;*.gif"), ("Todos", "*.*")])
             if path:
                 entries[5].delete(0, tk.END)
@@ -719,28 +521,30 @@ class MM_Tunning_App:
                 messagebox.showwarning("Atenção", "Preencha todos os campos obrigatórios.")
                 return
             try:
-                c = self.conn.cursor()
-                c.execute(
-                    "INSERT INTO users(username,password,fullname,email,phone,role,photo) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                    (vals[0], vals[1], vals[2], vals[3], vals[4], "client", vals[5]))
-                self.conn.commit()
+                self.repo.users.register_client(vals[0], vals[1], vals[2], vals[3], vals[4], vals[5])
                 messagebox.showinfo("Sucesso", "Cliente registrado com sucesso.")
-                win.destroy()
+                self.screens.hide(win)
                 self.build_login_screen()
             except sqlite3.IntegrityError:
                 messagebox.showerror("Erro", "Usuário já existe.")
 
         ttk.Button(content_frame, text="Registrar", style='Primary.TButton', command=register_client).pack(pady=8)
-        ttk.Button(content_frame, text="Fechar", command=win.destroy).pack()
+        ttk.Button(content_frame, text="Fechar", command=lambda: self.screens.hide(win)).pack()
+
+        def clear_form():
+            for e in entries: e.delete(0, tk.END)
 
-        self.setup_modal_window(win, f"Registrar Cliente - {PROJECT_NAME}")
+        self.setup_modal_window(win, f"Registrar Cliente - {PROJECT_NAME}", "register", clear_form)
 
     # 4) Dashboard (após login)
     def build_dashboard(self):
-        self.clear_root()
+        # Já montado: só exibe e recarrega os números
+        if self.screens.show_page("dashboard"):
+            return
+        page = ttk.Frame(self.root)
 
         # Header/Top Bar (Já tem logo)
-        header = ttk.Frame(self.root, style='Menu.TFrame', padding="10 10 10 10")
+        header = ttk.Frame(page, style='Menu.TFrame', padding="10 10 10 10")
         header.pack(fill=tk.X)
 
         logo = self.load_logo(120, 50)
@@ -755,7 +559,7 @@ class MM_Tunning_App:
         ttk.Button(header, text="Sair", command=self.logout, width=10).pack(side=tk.RIGHT, padx=10)
 
         # Main Content Frame
-        main_content = ttk.Frame(self.root, padding=20)
+        main_content = ttk.Frame(page, padding=20)
         main_content.pack(fill=tk.BOTH, expand=True)
 
         ttk.Label(main_content, text="Visão Geral do Sistema", style='Title.TLabel').pack(pady=10, anchor=tk.W)
@@ -763,63 +567,63 @@ class MM_Tunning_App:
         # Stats Cards
         stats_frame = ttk.Frame(main_content)
         stats_frame.pack(fill=tk.X, pady=15)
-        c = self.conn.cursor()
-
-        # Consultas de dados
-        c.execute("SELECT COUNT(*) FROM parts")
-        parts_n = c.fetchone()[0]
-        c.execute("SELECT COUNT(*) FROM tools")
-        tools_n = c.fetchone()[0]
-        c.execute("SELECT COUNT(*) FROM users")
-        users_n = c.fetchone()[0]
-        c.execute("SELECT COUNT(*) FROM services WHERE status='Aberto'")
-        services_open_n = c.fetchone()[0]
-        # NOVAS CONSULTAS PARA CARROS E MOTOS
-        c.execute("SELECT COUNT(*) FROM cars")
-        cars_n = c.fetchone()[0]
-        c.execute("SELECT COUNT(*) FROM motorcycles")
-        motorcycles_n = c.fetchone()[0]
-
-        def create_stat_card(parent, title, value, row, col):
+
+        # Os valores chegam do worker; até lá os cards mostram "..."
+        value_labels = {}
+
+        def create_stat_card(parent, title, key, row, col):
             card = ttk.Frame(parent, relief=tk.RAISED, borderwidth=1, padding=10, style='StatCard.TFrame')
             card.grid(row=row, column=col, padx=10, pady=10, sticky="nsew")  # Ajustado padx para 10
             parent.grid_columnconfigure(col, weight=1)
             ttk.Label(card, text=title, font=("Inter", 10), background='#3C4855', foreground='#AAAAAA').pack(
                 anchor=tk.W)
-            ttk.Label(card, text=str(value), font=("Inter", 20, "bold"), foreground=PRIMARY_COLOR,
-                      background='#3C4855').pack(anchor=tk.W)
+            value_labels[key] = ttk.Label(card, text=LOADING_TEXT, font=("Inter", 20, "bold"),
+                                          foreground=PRIMARY_COLOR, background='#3C4855')
+            value_labels[key].pack(anchor=tk.W)
 
         self.style.configure('StatCard.TFrame', background='#3C4855', borderwidth=0, relief=tk.FLAT)
 
         # Layout com 6 Cards em 2 Linhas
         # Linha 1
-        create_stat_card(stats_frame, "Peças Cadastradas", parts_n, 0, 0)
-        create_stat_card(stats_frame, "Ferramentas em Estoque", tools_n, 0, 1)
-        create_stat_card(stats_frame, "Usuários Totais", users_n, 0, 2)
+        create_stat_card(stats_frame, "Peças Cadastradas", "parts", 0, 0)
+        create_stat_card(stats_frame, "Ferramentas em Estoque", "tools", 0, 1)
+        create_stat_card(stats_frame, "Usuários Totais", "users", 0, 2)
 
         # Linha 2
-        create_stat_card(stats_frame, "Carros Cadastrados", cars_n, 1, 0)  # NOVO
-        create_stat_card(stats_frame, "Motos Cadastradas", motorcycles_n, 1, 1)  # NOVO
-        create_stat_card(stats_frame, "Serviços Abertos", services_open_n, 1, 2)
+        create_stat_card(stats_frame, "Carros Cadastrados", "cars", 1, 0)  # NOVO
+        create_stat_card(stats_frame, "Motos Cadastradas", "motorcycles", 1, 1)  # NOVO
+        create_stat_card(stats_frame, "Serviços Abertos", "services_open", 1, 2)
 
         # Garante que a frame de estatísticas ocupe a largura total
         stats_frame.columnconfigure((0, 1, 2), weight=1)
 
         # Alerts
-        c.execute("SELECT name, qty FROM parts ORDER BY qty ASC LIMIT 5")
-        low = c.fetchall()
         sugg_frame = ttk.LabelFrame(main_content, text="⚠️ Alertas de Estoque Baixo", padding=15)
         sugg_frame.pack(fill=tk.X, padx=5, pady=20)
-        lines = []
-        for name, qty in low:
-            if qty <= 5:
-                lines.append(f"• Repor peça '{name}' (estoque: {qty} unidades)")
-        if lines:
-            ttk.Label(sugg_frame, text="\n".join(lines), foreground='#FF5555', font=("Inter", 10, 'bold'),
-                      wraplength=700, justify=tk.LEFT).pack(padx=6, pady=6, anchor=tk.W)
-        else:
-            ttk.Label(sugg_frame, text="Estoque saudável no momento. Nenhum alerta pendente.",
-                      foreground='#00FF00').pack(padx=6, pady=6, anchor=tk.W)
+        alerts_lbl = ttk.Label(sugg_frame, text="Carregando alertas...", foreground='#AAAAAA',
+                               wraplength=700, justify=tk.LEFT)
+        alerts_lbl.pack(padx=6, pady=6, anchor=tk.W)
+
+        def show_dashboard_data(data):
+            if not stats_frame.winfo_exists():
+                return  # O dashboard foi fechado antes da resposta do worker
+            counts, low = data
+            for key, lbl in value_labels.items():
+                lbl.config(text=str(counts[key]))
+            lines = []
+            for name, qty in low:
+                if qty <= 5:
+                    lines.append(f"• Repor peça '{name}' (estoque: {qty} unidades)")
+            if lines:
+                alerts_lbl.config(text="\n".join(lines), foreground='#FF5555', font=("Inter", 10, 'bold'))
+            else:
+                alerts_lbl.config(text="Estoque saudável no momento. Nenhum alerta pendente.", foreground='#00FF00')
+
+        def load_dashboard_data():
+            # Consultas de dados (fora da thread do Tk); a cada exibição do dashboard
+            self.db.submit(lambda repo: (repo.dashboard_counts(), repo.parts.low_stock(5)), show_dashboard_data,
+                           lambda e: alerts_lbl.winfo_exists() and alerts_lbl.config(
+                               text=f"Erro ao carregar dados: {e}", foreground='#FF5555'))
 
         # Navigation grid - LAYOUT ORIGINAL MANTIDO
         ttk.Label(main_content, text="Acessar Módulos", font=("Inter", 14, "bold"), foreground=TEXT_COLOR).pack(pady=10,
@@ -841,6 +645,7 @@ class MM_Tunning_App:
             ("9. Sobre / Contato", self.build_about_screen),
             ("10. Configurações", self.build_settings_screen),
             ("11. Ajuda / FAQ", self.build_help_screen),
+            ("12. Desempenho (SQL)", self.build_performance_screen),
         ]
 
         # Criando botões em 3 colunas
@@ -854,8 +659,13 @@ class MM_Tunning_App:
                            foreground='#AAAAAA')
         footer.pack(side=tk.BOTTOM, pady=10)
 
+        self.screens.add_page("dashboard", page, on_show=load_dashboard_data)
+        self.screens.show_page("dashboard")
+
     # 5) Tela de cadastro de peças
     def build_parts_screen(self):
+        if self.screens.show_modal("parts"):
+            return
         win = tk.Toplevel(self.root)
 
         frame = ttk.Frame(win, padding=20)
@@ -873,13 +683,12 @@ class MM_Tunning_App:
         right = ttk.Frame(content_frame, padding=10)
         right.pack(side=tk.RIGHT, fill=tk.Y, padx=10, pady=10)
 
-        tree = ttk.Treeview(left, columns=("sku", "qty", "price"), show="headings")
-        tree.heading("sku", text="SKU")
-        tree.column("sku", width=120, anchor=tk.CENTER)
-        tree.heading("qty", text="Qtd")
-        tree.column("qty", width=80, anchor=tk.CENTER)
-        tree.heading("price", text="Preço")
-        tree.column("price", width=100, anchor=tk.E)
+        # Lista paginada: carrega mais linhas conforme a rolagem (catálogos grandes)
+        tree = VirtualTreeview(left, [("sku", "SKU", 120, tk.CENTER, True),
+                                      ("qty", "Qtd", 80, tk.CENTER, True),
+                                      ("price", "Preço", 100, tk.E, True)],
+                               self.repo.parts.listing,
+                               lambda r: (str(r[0]), r[1], (r[2], r[3], format_currency(r[4]))))
         tree.pack(fill=tk.BOTH, expand=True)
         self.refresh_parts_tree(tree)
 
@@ -910,10 +719,7 @@ class MM_Tunning_App:
                 desc = f_entries["descrição"].get().strip()
                 if not name or not sku:
                     raise ValueError("Nome e SKU obrigatórios.")
-                c = self.conn.cursor()
-                c.execute("INSERT INTO parts(name,sku,qty,price,description) VALUES (?, ?, ?, ?, ?)",
-                          (name, sku, qty, price, desc))
-                self.conn.commit()
+                self.repo.parts.add(name, sku, qty, price, desc)
                 messagebox.showinfo("Sucesso", "Peça adicionada.")
                 self.refresh_parts_tree(tree)
                 for entry in f_entries.values(): entry.delete(0, tk.END)
@@ -921,20 +727,81 @@ class MM_Tunning_App:
                 messagebox.showerror("Erro", str(e))
 
         ttk.Button(right, text="Adicionar Peça", style='Primary.TButton', command=add_part).pack(pady=15, fill=tk.X)
-        ttk.Button(right, text="Fechar Janela", command=win.destroy).pack(pady=5, fill=tk.X)
+        # Muitas linhas alteradas: recarrega a lista em vez de sincronizar uma a uma
+        self.build_import_controls(right, "Importar Catálogo (CSV)", "Importação de Peças",
+                                   "parts", tree.reload)
+        ttk.Button(right, text="Fechar Janela", command=lambda: self.screens.hide(win)).pack(pady=5, fill=tk.X)
 
-        self.setup_modal_window(win, f"Cadastro de Peças - {PROJECT_NAME}")
+        self.setup_modal_window(win, f"Cadastro de Peças - {PROJECT_NAME}", "parts",
+                                lambda: self.refresh_parts_tree(tree))
 
     def refresh_parts_tree(self, tree):
-        for r in tree.get_children():
-            tree.delete(r)
-        c = self.conn.cursor()
-        c.execute("SELECT name,sku,qty,price FROM parts")
-        for row in c.fetchall():
-            tree.insert("", tk.END, values=(row[1], row[2], format_currency(row[3])), text=row[0])
+        tree.sync()
+
+    def build_import_controls(self, parent, button_text, title, kind, on_finished):
+        """Botão + barra de progresso para importar um CSV do tipo `kind` (importer.IMPORTERS) no worker."""
+        import_btn = ttk.Button(parent, text=button_text)
+        import_btn.pack(pady=5, fill=tk.X)
+        import_progress = ttk.Progressbar(parent, maximum=100)
+        import_progress.pack(pady=2, fill=tk.X)
+        import_lbl = ttk.Label(parent, text="", foreground='#AAAAAA')
+        import_lbl.pack()
+        if self.server_url:
+            # O importador grava direto no arquivo do banco: roda na máquina do servidor
+            import_btn.config(state=tk.DISABLED)
+            import_lbl.config(text="No modo servidor, importe na máquina do servidor (importer.py).")
+            return
+
+        def start_import():
+            from tkinter import filedialog  # Carregado só quando o diálogo é aberto
+            from importer import IMPORTERS  # Idem: só na primeira importação
+            path = filedialog.askopenfilename(filetypes=[("CSV", "*.csv"), ("Todos", "*.*")])
+            if not path:
+                return
+            import_func = IMPORTERS[kind]
+            rejects_path = os.path.splitext(path)[0] + "_rejeitadas.csv"
+            import_btn.config(state=tk.DISABLED)
+            import_progress.config(value=0)
+            import_lbl.config(text="Importando...")
+
+            # Leitura e gravação no worker; o progresso volta por `notify` a cada bloco
+            self.db.submit(lambda repo: import_func(
+                               repo.conn, path, rejects_path=rejects_path, cache=repo.cache,
+                               progress=lambda done, fraction: self.db.notify(show_progress, (done, fraction))),
+                           lambda report: import_done(report, rejects_path),
+                           import_failed)
+
+        def show_progress(data):
+            if import_lbl.winfo_exists():
+                done, fraction = data
+                import_progress.config(value=fraction * 100)
+                import_lbl.config(text=f"{done} linhas lidas ({fraction:.0%})")
+
+        def import_done(report, rejects_path):
+            if not import_btn.winfo_exists():
+                return
+            import_btn.config(state=tk.NORMAL)
+            import_lbl.config(text="")
+            on_finished()
+            summary = report.summary()
+            if report.rejected:
+                summary += f"\n\nLinhas rejeitadas salvas em:\n{rejects_path}"
+                messagebox.showwarning(title, summary)
+            else:
+                messagebox.showinfo(title, summary)
+
+        def import_failed(e):
+            if import_btn.winfo_exists():
+                import_btn.config(state=tk.NORMAL)
+                import_lbl.config(text="")
+                messagebox.showerror("Erro", f"Falha na importação:\n{e}")
+
+        import_btn.config(command=start_import)
 
     # 6) Tela de cadastro de ferramentas
     def build_tools_screen(self):
+        if self.screens.show_modal("tools"):
+            return
         win = tk.Toplevel(self.root)
 
         frame = ttk.Frame(win, padding=20)
@@ -944,11 +811,10 @@ class MM_Tunning_App:
 
         ttk.Label(frame, text="Gestão de Ferramentas", style='Subtitle.TLabel').pack(pady=10, anchor=tk.W)
 
-        tree = ttk.Treeview(frame, columns=("code", "available"), show="headings")
-        tree.heading("code", text="Código")
-        tree.column("code", width=120, anchor=tk.CENTER)
-        tree.heading("available", text="Disponível")
-        tree.column("available", width=100, anchor=tk.CENTER)
+        tree = VirtualTreeview(frame, [("code", "Código", 120, tk.CENTER, True),
+                                       ("available", "Disponível", 100, tk.CENTER, True)],
+                               self.repo.tools.listing,
+                               lambda r: (str(r[0]), r[1], (r[2], r[3])))
         tree.pack(fill=tk.BOTH, expand=True, pady=10)
 
         # form
@@ -980,10 +846,7 @@ class MM_Tunning_App:
                 qty = int(qty_e.get())
                 if not name or not code:
                     raise ValueError("Nome e código obrigatórios.")
-                c = self.conn.cursor()
-                c.execute("INSERT INTO tools(name,code,available,description) VALUES (?, ?, ?, ?)",
-                          (name, code, qty, ""))
-                self.conn.commit()
+                self.repo.tools.add(name, code, qty, "")
                 messagebox.showinfo("Sucesso", "Ferramenta adicionada.")
                 self.refresh_tools_tree(tree)
                 name_e.delete(0, tk.END);
@@ -995,21 +858,20 @@ class MM_Tunning_App:
         ttk.Button(form, text="Adicionar Ferramenta", style='Primary.TButton', command=add_tool).grid(row=3, column=0,
                                                                                                       columnspan=2,
                                                                                                       pady=10)
-        ttk.Button(form, text="Fechar", command=win.destroy).grid(row=4, column=0, columnspan=2, pady=4)
+        ttk.Button(form, text="Fechar", command=lambda: self.screens.hide(win)).grid(row=4, column=0, columnspan=2,
+                                                                                     pady=4)
         self.refresh_tools_tree(tree)
 
-        self.setup_modal_window(win, f"Cadastro de Ferramentas - {PROJECT_NAME}")
+        self.setup_modal_window(win, f"Cadastro de Ferramentas - {PROJECT_NAME}", "tools",
+                                lambda: self.refresh_tools_tree(tree))
 
     def refresh_tools_tree(self, tree):
-        for r in tree.get_children():
-            tree.delete(r)
-        c = self.conn.cursor()
-        c.execute("SELECT name,code,available FROM tools")
-        for row in c.fetchall():
-            tree.insert("", tk.END, values=(row[1], row[2]), text=row[0])
+        tree.sync()
 
     # 7) Tela de Cadastro de Carros (NOVA)
     def build_car_screen(self):
+        if self.screens.show_modal("cars"):
+            return
         win = tk.Toplevel(self.root)
 
         frame = ttk.Frame(win, padding=20);
@@ -1022,20 +884,13 @@ class MM_Tunning_App:
                   font=("Inter", 10)).pack(pady=5, anchor=tk.W)  # Informação para o usuário
 
         # Treeview para exibir carros
-        tree = ttk.Treeview(frame, columns=("client", "plate", "model", "year", "color", "engine"),
-                            show="headings")  # NOVAS COLUNAS
-        tree.heading("client", text="Dono (Usuário)")
-        tree.column("client", width=120, anchor=tk.CENTER)
-        tree.heading("plate", text="Placa (Chave Única)")
-        tree.column("plate", width=100, anchor=tk.CENTER)
-        tree.heading("model", text="Marca/Modelo")
-        tree.column("model", width=180)  # Ajustado largura
-        tree.heading("year", text="Ano")  # NOVO
-        tree.column("year", width=60, anchor=tk.CENTER)  # NOVO
-        tree.heading("color", text="Cor")  # NOVO
-        tree.column("color", width=100, anchor=tk.CENTER)  # NOVO
-        tree.heading("engine", text="Motor (L)")  # NOVO
-        tree.column("engine", width=100, anchor=tk.CENTER)  # NOVO
+        tree = VirtualTreeview(frame, [("client", "Dono (Usuário)", 120, tk.CENTER, True),
+                                       ("plate", "Placa (Chave Única)", 100, tk.CENTER, True),
+                                       ("model", "Marca/Modelo", 180, tk.W, True),
+                                       ("year", "Ano", 60, tk.CENTER, True),
+                                       ("color", "Cor", 100, tk.CENTER, True),
+                                       ("engine", "Motor (L)", 100, tk.CENTER, True)],
+                               self.repo.vehicles.cars_listing, self._format_car_row, sort="model")
         tree.pack(fill=tk.BOTH, expand=True, pady=10)
         self.refresh_cars_tree(tree)
 
@@ -1066,59 +921,39 @@ class MM_Tunning_App:
                 messagebox.showwarning("Atenção", "Usuário do Dono e Placa são obrigatórios para o cadastro.")
                 return
 
-            c = self.conn.cursor()
             try:
-                # 1. Busca o client_id usando o username
-                c.execute("SELECT id FROM users WHERE username=?", (vals['dono_usuario'],))
-                client_row = c.fetchone()
-                if not client_row:
-                    messagebox.showerror("Erro", "Cliente (usuário) não encontrado. Cadastre o cliente primeiro.")
-                    return
-                client_id = client_row[0]  # Este é o ID (a Chave Estrangeira)
-
-                # 2. Insere o carro usando o client_id (Chave Estrangeira)
-                c.execute(
-                    "INSERT INTO cars(client_id, license_plate, brand, model, year, color, engine) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                    (client_id, vals['placa'], vals['marca'], vals['modelo'], vals['ano'] or None, vals['cor'],
-                     vals['motor_l']))
-                self.conn.commit()
+                # O Repository resolve o client_id (Chave Estrangeira) a partir do username
+                self.repo.vehicles.add_car(vals['dono_usuario'], vals['placa'], vals['marca'], vals['modelo'],
+                                           vals['ano'], vals['cor'], vals['motor_l'])
                 messagebox.showinfo("Sucesso", "Carro cadastrado com sucesso e atrelado ao cliente.")
                 self.refresh_cars_tree(tree)
                 for entry in entries.values(): entry.delete(0, tk.END)
+            except LookupError as e:
+                messagebox.showerror("Erro", str(e))
             except sqlite3.IntegrityError:
                 messagebox.showerror("Erro", "Placa já cadastrada.")
             except Exception as e:
                 messagebox.showerror("Erro", f"Erro ao cadastrar: {str(e)}")
 
         ttk.Button(frame, text="Cadastrar Carro", style='Primary.TButton', command=add_car).pack(pady=10)
-        ttk.Button(frame, text="Fechar", command=win.destroy).pack()
+        ttk.Button(frame, text="Fechar", command=lambda: self.screens.hide(win)).pack()
+
+        self.setup_modal_window(win, f"Cadastro de Carros - {PROJECT_NAME}", "cars",
+                                lambda: self.refresh_cars_tree(tree))
 
-        self.setup_modal_window(win, f"Cadastro de Carros - {PROJECT_NAME}")
+    @staticmethod
+    def _format_car_row(row):
+        car_id, username, plate, brand, model, year, color, engine = row
+        # Insere todos os dados nas colunas correspondentes
+        return str(car_id), "", (username, plate, f"{brand} {model}", year, color, engine)
 
     def refresh_cars_tree(self, tree):
-        for r in tree.get_children():
-            tree.delete(r)
-        c = self.conn.cursor()
-        # Consulta que agora inclui todos os campos relevantes
-        c.execute('''
-                  SELECT c.license_plate,
-                         c.brand,
-                         c.model,
-                         c.year,
-                         c.color,
-                         c.engine,
-                         u.username
-                  FROM cars c
-                           LEFT JOIN users u ON c.client_id = u.id
-                  ORDER BY c.brand, c.model
-                  ''')
-        for row in c.fetchall():
-            plate, brand, model, year, color, engine, username = row
-            # Insere todos os dados nas colunas correspondentes
-            tree.insert("", tk.END, values=(username, plate, f"{brand} {model}", year, color, engine))
+        tree.sync()
 
     # 8) Tela de Cadastro de Motos (NOVA)
     def build_motorcycle_screen(self):
+        if self.screens.show_modal("motorcycles"):
+            return
         win = tk.Toplevel(self.root)
 
         frame = ttk.Frame(win, padding=20);
@@ -1131,17 +966,12 @@ class MM_Tunning_App:
                   font=("Inter", 10)).pack(pady=5, anchor=tk.W)  # Informação para o usuário
 
         # Treeview para exibir motos
-        tree = ttk.Treeview(frame, columns=("client", "plate", "model", "year", "cc"), show="headings")  # NOVAS COLUNAS
-        tree.heading("client", text="Dono (Usuário)")
-        tree.column("client", width=120, anchor=tk.CENTER)
-        tree.heading("plate", text="Placa (Chave Única)")
-        tree.column("plate", width=100, anchor=tk.CENTER)
-        tree.heading("model", text="Marca/Modelo")
-        tree.column("model", width=150)
-        tree.heading("year", text="Ano")  # NOVO
-        tree.column("year", width=80, anchor=tk.CENTER)  # NOVO
-        tree.heading("cc", text="Cilindrada (CC)")
-        tree.column("cc", width=100, anchor=tk.CENTER)
+        tree = VirtualTreeview(frame, [("client", "Dono (Usuário)", 120, tk.CENTER, True),
+                                       ("plate", "Placa (Chave Única)", 100, tk.CENTER, True),
+                                       ("model", "Marca/Modelo", 150, tk.W, True),
+                                       ("year", "Ano", 80, tk.CENTER, True),
+                                       ("cc", "Cilindrada (CC)", 100, tk.CENTER, True)],
+                               self.repo.vehicles.motorcycles_listing, self._format_motorcycle_row, sort="model")
         tree.pack(fill=tk.BOTH, expand=True, pady=10)
         self.refresh_motorcycles_tree(tree)
 
@@ -1171,25 +1001,17 @@ class MM_Tunning_App:
                 messagebox.showwarning("Atenção", "Usuário do Dono e Placa são obrigatórios para o cadastro.")
                 return
 
-            c = self.conn.cursor()
             try:
-                # 1. Busca o client_id usando o username
-                c.execute("SELECT id FROM users WHERE username=?", (vals['dono_usuario'],))
-                client_row = c.fetchone()
-                if not client_row:
-                    messagebox.showerror("Erro", "Cliente (usuário) não encontrado. Cadastre o cliente primeiro.")
-                    return
-                client_id = client_row[0]  # Este é o ID (a Chave Estrangeira)
                 engine_cc = int(vals['cilindrada_cc']) if vals.get('cilindrada_cc') else None
 
-                # 2. Insere a moto usando o client_id (Chave Estrangeira)
-                c.execute(
-                    "INSERT INTO motorcycles(client_id, license_plate, brand, model, year, engine_cc) VALUES (?, ?, ?, ?, ?, ?)",
-                    (client_id, vals['placa'], vals['marca'], vals['modelo'], vals['ano'] or None, engine_cc))
-                self.conn.commit()
+                # O Repository resolve o client_id (Chave Estrangeira) a partir do username
+                self.repo.vehicles.add_motorcycle(vals['dono_usuario'], vals['placa'], vals['marca'], vals['modelo'],
+                                                  vals['ano'], engine_cc)
                 messagebox.showinfo("Sucesso", "Moto cadastrada com sucesso e atrelada ao cliente.")
                 self.refresh_motorcycles_tree(tree)
                 for entry in entries.values(): entry.delete(0, tk.END)
+            except LookupError as e:
+                messagebox.showerror("Erro", str(e))
             except sqlite3.IntegrityError:
                 messagebox.showerror("Erro", "Placa já cadastrada.")
             except ValueError:
@@ -1198,36 +1020,26 @@ class MM_Tunning_App:
                 messagebox.showerror("Erro", f"Erro ao cadastrar: {str(e)}")
 
         ttk.Button(frame, text="Cadastrar Moto", style='Primary.TButton', command=add_motorcycle).pack(pady=10)
-        ttk.Button(frame, text="Fechar", command=win.destroy).pack()
+        ttk.Button(frame, text="Fechar", command=lambda: self.screens.hide(win)).pack()
+
+        self.setup_modal_window(win, f"Cadastro de Motos - {PROJECT_NAME}", "motorcycles",
+                                lambda: self.refresh_motorcycles_tree(tree))
 
-        self.setup_modal_window(win, f"Cadastro de Motos - {PROJECT_NAME}")
+    @staticmethod
+    def _format_motorcycle_row(row):
+        moto_id, username, plate, brand, model, year, cc = row
+        return str(moto_id), "", (username, plate, f"{brand} {model}", year, cc)
 
     def refresh_motorcycles_tree(self, tree):
-        for r in tree.get_children():
-            tree.delete(r)
-        c = self.conn.cursor()
-        # Consulta que agora inclui todos os campos relevantes
-        c.execute('''
-                  SELECT m.license_plate,
-                         m.brand,
-                         m.model,
-                         m.year,
-                         m.engine_cc,
-                         u.username
-                  FROM motorcycles m
-                           LEFT JOIN users u ON m.client_id = u.id
-                  ORDER BY m.brand, m.model
-                  ''')
-        for row in c.fetchall():
-            plate, brand, model, year, cc, username = row
-            # Insere todos os dados nas colunas correspondentes
-            tree.insert("", tk.END, values=(username, plate, f"{brand} {model}", year, cc))
+        tree.sync()
 
     # 9) Tela de Gerenciamento de Usuários (agora é a 5)
     def build_user_management(self):
         if not self.user or self.user["role"] != "admin":
             messagebox.showwarning("Acesso", "Apenas administradores podem acessar o gerenciamento de usuários.")
             return
+        if self.screens.show_modal("users"):
+            return
         win = tk.Toplevel(self.root)
 
         frame = ttk.Frame(win, padding=20);
@@ -1237,12 +1049,12 @@ class MM_Tunning_App:
 
         ttk.Label(frame, text="Gestão de Usuários (Apenas Admin)", style='Subtitle.TLabel').pack(pady=10, anchor=tk.W)
 
-        tree = ttk.Treeview(frame, columns=("username", "email", "phone", "role"), show="headings")
-        tree.heading("username", text="Usuário")
-        tree.heading("email", text="Email")
-        tree.heading("phone", text="Telefone")
-        tree.heading("role", text="Função")
-        tree.column("username", width=120, anchor=tk.CENTER)
+        tree = VirtualTreeview(frame, [("username", "Usuário", 120, tk.CENTER, True),
+                                       ("email", "Email", 200, tk.W, True),
+                                       ("phone", "Telefone", 200, tk.W, True),
+                                       ("role", "Função", 200, tk.W, True)],
+                               self.repo.users.listing,
+                               lambda r: (str(r[0]), r[1], (r[1], r[2], r[3], r[4])))
         tree.pack(fill=tk.BOTH, expand=True)
         self.refresh_users_tree(tree)
 
@@ -1260,31 +1072,30 @@ class MM_Tunning_App:
 
             # Usando custom modal (messagebox.askyesno) para evitar o uso de tk.confirm()
             if messagebox.askyesno("Confirmação", f"Tem certeza que deseja remover o usuário {username}?"):
-                c = self.conn.cursor()
-                c.execute("DELETE FROM users WHERE username=?", (username,))
-                self.conn.commit()
+                self.repo.users.delete(username)
                 self.refresh_users_tree(tree)
                 messagebox.showinfo("OK", "Usuário removido.")
 
         ttk.Button(frame, text="Remover Usuário Selecionado", command=remove_user).pack(pady=10)
-        ttk.Button(frame, text="Fechar", command=win.destroy).pack()
+        # Cadastro em massa (clientes de frota / migração): uma linha por veículo, veja importer.py
+        self.build_import_controls(frame, "Importar Clientes e Veículos (CSV)", "Importação de Clientes",
+                                   "clients", tree.reload)
+        ttk.Button(frame, text="Fechar", command=lambda: self.screens.hide(win)).pack()
 
-        self.setup_modal_window(win, f"Gerenciamento de Usuários - {PROJECT_NAME}")
+        self.setup_modal_window(win, f"Gerenciamento de Usuários - {PROJECT_NAME}", "users",
+                                lambda: self.refresh_users_tree(tree))
 
     def refresh_users_tree(self, tree):
-        for r in tree.get_children():
-            tree.delete(r)
-        c = self.conn.cursor()
-        c.execute("SELECT username,email,phone,role FROM users")
-        for row in c.fetchall():
-            tree.insert("", tk.END, values=(row[0], row[1], row[2], row[3]), text=row[0])
+        tree.sync()
 
     # ATENÇÃO: A função build_os_tools_screen foi removida para simplificar o fluxo.
 
     # 10) Tela de Serviços (Ordens - agora é a 6) - FLUXO CARRINHO
     def build_services_screen(self):
-        # Limpa o carrinho temporário toda vez que a tela principal de serviços é aberta
-        self.os_cart = {}
+        # Cada abertura da tela começa uma OS nova: carrinho e formulário limpos (ver new_order)
+        if self.screens.show_modal("services"):
+            return
+        self.cart.clear()
 
         win = tk.Toplevel(self.root)
 
@@ -1346,15 +1157,23 @@ class MM_Tunning_App:
         ttk.Label(left_frame, text="2. Peças para Ordem de Serviço:", font=('Inter', 11, 'bold')).pack(pady=10,
                                                                                                        anchor=tk.W)
 
-        cart_tree = ttk.Treeview(left_frame, columns=("qty", "unit_price", "subtotal"), show="headings")
+        # iid = ID da peça: cada alteração atualiza só a linha afetada (ver show_line)
+        cart_tree = ttk.Treeview(left_frame, columns=("name", "qty", "unit_price", "subtotal"), show="headings")
+        cart_tree.heading("name", text="Peça")
+        cart_tree.column("name", width=180, anchor=tk.W)
         cart_tree.heading("qty", text="Qtd")
         cart_tree.column("qty", width=80, anchor=tk.CENTER)
         cart_tree.heading("unit_price", text="Preço Unitário")
         cart_tree.column("unit_price", width=120, anchor=tk.E)
         cart_tree.heading("subtotal", text="Subtotal")
         cart_tree.column("subtotal", width=120, anchor=tk.E)
+        cart_tree.tag_configure("shortfall", foreground='#FF5555')
         cart_tree.pack(fill=tk.BOTH, expand=True)
 
+        # Aviso de falta de estoque, atualizado a cada alteração do carrinho ou do catálogo
+        shortfall_lbl = ttk.Label(left_frame, text="", foreground='#FF5555', wraplength=500, justify=tk.LEFT)
+        shortfall_lbl.pack(fill=tk.X, anchor=tk.W)
+
         # --- Footer do Carrinho (Total) ---
         footer_frame = ttk.Frame(left_frame);
         footer_frame.pack(fill=tk.X, pady=10)
@@ -1363,6 +1182,25 @@ class MM_Tunning_App:
                                     foreground=PRIMARY_COLOR)
         total_items_lbl.pack(side=tk.LEFT, padx=5)
 
+        def show_line(line):
+            """Insere ou atualiza no carrinho a linha da peça, e o total e o aviso de estoque."""
+            iid = str(line.item.id)
+            values = (line.item.name, line.qty, format_currency(line.price), format_currency(line.subtotal))
+            tags = ("shortfall",) if line.shortfall else ()
+            if cart_tree.exists(iid):
+                cart_tree.item(iid, values=values, tags=tags)
+            else:
+                cart_tree.insert("", tk.END, iid=iid, values=values, tags=tags)
+            update_cart_summary()
+
+        def update_cart_summary():
+            """Atualiza o total das peças (mantido pelo Cart) e o aviso de falta de estoque."""
+            total_items_lbl.config(text=format_currency(self.cart.total))
+            shortages = self.cart.shortages()
+            shortfall_lbl.config(text="Estoque insuficiente: " + "; ".join(
+                f"{line.item.name} (faltam {line.shortfall}, estoque {line.item.stock})" for line in shortages)
+                                 if shortages else "")
+
         # --- Botão de Remoção ---
         def remove_from_cart():
             sel = cart_tree.selection()
@@ -1370,38 +1208,13 @@ class MM_Tunning_App:
                 messagebox.showwarning("Atenção", "Selecione um item no carrinho para remover.")
                 return
 
-            # O texto (text) do item da Treeview armazena o SKU/Nome da Peça
-            part_id = cart_tree.item(sel[0], 'text')
-
-            # Remove do dicionário e da Treeview
-            if part_id in self.os_cart:
-                del self.os_cart[part_id]
+            # O iid da linha é o ID da peça
+            self.cart.remove(int(sel[0]))
             cart_tree.delete(sel[0])
             update_cart_summary()
 
         ttk.Button(footer_frame, text="Remover Item Selecionado", command=remove_from_cart).pack(side=tk.RIGHT, padx=5)
 
-        def update_cart_summary():
-            """Recalcula e atualiza o Treeview do carrinho e o total das peças."""
-            # Limpa o Treeview primeiro
-            for item in cart_tree.get_children():
-                cart_tree.delete(item)
-
-            total = 0.0
-
-            for part_id, data in self.os_cart.items():
-                subtotal = data['qty'] * data['price']
-                total += subtotal
-
-                # O text é o ID da peça para fácil manipulação interna
-                cart_tree.insert("", tk.END, text=part_id,
-                                 values=(data['qty'], format_currency(data['price']), format_currency(subtotal)))
-
-            total_items_lbl.config(text=format_currency(total))
-
-            # Retorna o total das peças para a função de abertura da OS
-            return total
-
         # --- 3. Botão de Abertura da OS ---
         def open_service_order():
             cl_user = client_e.get().strip()
@@ -1414,7 +1227,7 @@ class MM_Tunning_App:
                 messagebox.showerror("Erro", "Valor de Mão de Obra inválido.")
                 return
 
-            if not self.os_cart and mo_price == 0.0:
+            if not self.cart and mo_price == 0.0:
                 messagebox.showwarning("Atenção", "A OS está vazia. Adicione peças ou o valor da Mão de Obra.")
                 return
 
@@ -1423,29 +1236,25 @@ class MM_Tunning_App:
                 messagebox.showerror("Erro de Cadastro", error)
                 return
 
-            date = datetime.date.today().isoformat()
+            # A baixa é no Faturamento: a falta de estoque só pede confirmação aqui
+            shortages = self.cart.shortages()
+            if shortages and not messagebox.askyesno(
+                    "Estoque Insuficiente",
+                    "Estas peças não têm estoque suficiente para o faturamento:\n" +
+                    "\n".join(f"- {line.item.name}: pedido {line.qty}, estoque {line.item.stock}"
+                              for line in shortages) +
+                    "\n\nAbrir a OS mesmo assim?"):
+                return
 
             try:
-                c = self.conn.cursor()
-
-                # 1. Abre a OS no Banco
-                c.execute(
-                    "INSERT INTO services(client_id, vehicle_plate, description, labor_price, final_total, date, status, seller_name) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                    (client_id, plate, desc, mo_price, 0.0, date, "Aberto", seller_name))
-                self.conn.commit()
-                new_service_id = c.lastrowid
-
-                # 2. Insere todos os itens do carrinho (peças)
-                for part_id, data in self.os_cart.items():
-                    c.execute(
-                        "INSERT INTO service_parts (service_id, part_id, qty_used, price_unit) VALUES (?, ?, ?, ?)",
-                        (new_service_id, part_id, data['qty'], data['price']))
-                self.conn.commit()
+                # Abre a OS e registra todos os itens do carrinho (peças)
+                new_service_id = self.repo.services.open_service_order(client_id, plate, desc, mo_price,
+                                                                       self.cart.items(), seller_name)
 
                 messagebox.showinfo("Sucesso",
-                                    f"Ordem de Serviço #OS-{new_service_id} criada e peças registradas. Total (aprox.): {format_currency(mo_price + update_cart_summary())}")
+                                    f"Ordem de Serviço #OS-{new_service_id} criada e peças registradas. Total (aprox.): {format_currency(mo_price + self.cart.total)}")
 
-                win.destroy()  # Fecha a janela após sucesso
+                self.screens.hide(win)  # Fecha a janela após sucesso
                 self.build_dashboard()  # Atualiza o Dashboard ou abre a tela de OS principal
 
             except Exception as e:
@@ -1455,7 +1264,7 @@ class MM_Tunning_App:
                    command=open_service_order).pack(pady=15, fill=tk.X)
 
         # O botão "Registrar Uso de Ferramentas (Interno)" foi removido.
-        ttk.Button(left_frame, text="Fechar Janela", command=win.destroy).pack(pady=5, fill=tk.X)
+        ttk.Button(left_frame, text="Fechar Janela", command=lambda: self.screens.hide(win)).pack(pady=5, fill=tk.X)
 
         # ----------------------------------------------------
         # --- COLUNA DA DIREITA: CATÁLOGO DE PEÇAS ---
@@ -1464,25 +1273,74 @@ class MM_Tunning_App:
         ttk.Label(right_frame, text="3. Catálogo de Peças (Adicionar ao Carrinho)", style='Subtitle.TLabel').pack(
             pady=10, anchor=tk.W)
 
-        # Treeview do Catálogo
-        catalog_tree = ttk.Treeview(right_frame, columns=("sku", "qty", "price"), show="headings")
-        catalog_tree.heading("sku", text="SKU")
-        catalog_tree.column("sku", width=100, anchor=tk.CENTER)
-        catalog_tree.heading("qty", text="Qtd Estoque")
-        catalog_tree.column("qty", width=100, anchor=tk.CENTER)
-        catalog_tree.heading("price", text="Preço Unitário")
-        catalog_tree.column("price", width=120, anchor=tk.E)
-        catalog_tree.pack(fill=tk.BOTH, expand=True)
+        # Busca no catálogo (nome, SKU ou descrição), disparada ao parar de digitar
+        search_frame = ttk.Frame(right_frame)
+        search_frame.pack(fill=tk.X, pady=5)
+        ttk.Label(search_frame, text="Buscar (nome, SKU ou descrição):").pack(side=tk.LEFT, padx=5)
+        search_var = tk.StringVar()
+        search_e = tk.Entry(search_frame, textvariable=search_var, width=30, **entry_style)
+        search_e.pack(side=tk.LEFT, padx=5, fill=tk.X, expand=True)
+
+        catalog_area = ttk.Frame(right_frame)
+        catalog_area.pack(fill=tk.BOTH, expand=True)
 
-        def refresh_catalog_tree(tree):
-            for r in tree.get_children(): tree.delete(r)
-            c = self.conn.cursor()
-            c.execute("SELECT id, name, sku, qty, price FROM parts ORDER BY name")
-            for id, name, sku, qty, price in c.fetchall():
-                # text guarda o ID da peça
-                tree.insert("", tk.END, text=id, values=(sku, qty, format_currency(price)))
+        def catalog_row(r):
+            # Guarda a linha tipada para o carrinho; estoque novo de uma peça do carrinho atualiza o aviso
+            line = self.cart.remember(r)
+            if line is not None:
+                show_line(line)
+            return str(r[0]), r[0], (r[2], r[3], format_currency(r[4]))
 
-        refresh_catalog_tree(catalog_tree)
+        # Treeview do Catálogo
+        # iid/text guardam o ID da peça; ordenado por nome como antes, paginado
+        catalog_tree = VirtualTreeview(catalog_area, [("sku", "SKU", 100, tk.CENTER, True),
+                                                      ("qty", "Qtd Estoque", 100, tk.CENTER, True),
+                                                      ("price", "Preço Unitário", 120, tk.E, True)],
+                                       self.repo.parts.listing, catalog_row, sort="name")
+        catalog_tree.pack(fill=tk.BOTH, expand=True)
+        catalog_tree.sync()
+
+        # Resultados da busca, mais relevantes primeiro (substitui o catálogo enquanto há texto)
+        results_tree = ttk.Treeview(catalog_area, columns=("name", "sku", "qty", "price"), show="headings")
+        results_tree.heading("name", text="Peça")
+        results_tree.column("name", width=180, anchor=tk.W)
+        results_tree.heading("sku", text="SKU")
+        results_tree.column("sku", width=100, anchor=tk.CENTER)
+        results_tree.heading("qty", text="Qtd Estoque")
+        results_tree.column("qty", width=100, anchor=tk.CENTER)
+        results_tree.heading("price", text="Preço Unitário")
+        results_tree.column("price", width=120, anchor=tk.E)
+        catalog_view = [catalog_tree]  # Lista exibida no momento (catálogo ou resultados)
+
+        search_job = [None]
+
+        def schedule_search(*_):
+            if search_job[0] is not None:
+                win.after_cancel(search_job[0])
+            search_job[0] = win.after(SEARCH_DEBOUNCE_MS, run_search)
+
+        def run_search():
+            search_job[0] = None
+            text = search_var.get().strip()
+            if not text:
+                if catalog_view[0] is not catalog_tree:
+                    results_tree.pack_forget()
+                    catalog_tree.pack(fill=tk.BOTH, expand=True)
+                    catalog_view[0] = catalog_tree
+                    catalog_tree.sync()
+                return
+            results_tree.delete(*results_tree.get_children())
+            for row in self.repo.parts.search(text):
+                iid, part_id, values = catalog_row(row)
+                results_tree.insert("", tk.END, iid=iid, text=part_id, values=(row[1],) + values)
+            # O catálogo do carrinho guarda só as linhas exibidas (resultados atuais e páginas carregadas)
+            self.cart.retain({int(iid) for iid in results_tree.get_children() + catalog_tree.tree.get_children()})
+            if catalog_view[0] is not results_tree:
+                catalog_tree.pack_forget()
+                results_tree.pack(fill=tk.BOTH, expand=True)
+                catalog_view[0] = results_tree
+
+        search_var.trace_add("write", schedule_search)
 
         # --- Formulário de Adição ao Carrinho ---
         add_form = ttk.Frame(right_frame, padding=10);
@@ -1493,17 +1351,13 @@ class MM_Tunning_App:
         add_qty_e.grid(row=0, column=1, padx=5)
 
         def add_item_to_os():
-            sel = catalog_tree.selection()
+            view = catalog_view[0]
+            sel = view.selection()
             if not sel:
                 messagebox.showwarning("Atenção", "Selecione uma peça no catálogo à direita.")
                 return
 
-            item = catalog_tree.item(sel[0])
-            part_id = int(item['text'])  # ID real da peça no banco
-            part_sku = item['values'][0]  # SKU
-            qty_available = int(item['values'][1])
-            part_price_str = item['values'][2].replace('R$ ', '').replace('.', '').replace(',', '.')  # Preço formatado
-            part_price = float(part_price_str)
+            part_id = int(sel[0])  # iid = ID real da peça no banco (linha já guardada em self.cart.catalog)
 
             try:
                 qty_to_add = int(add_qty_e.get().strip())
@@ -1512,116 +1366,46 @@ class MM_Tunning_App:
                 messagebox.showerror("Erro", "Quantidade inválida (deve ser um número inteiro > 0).")
                 return
 
-            # Lógica de "carrinho" (não checa estoque aqui, a baixa é no Faturamento)
-
-            # Busca o nome da peça no carrinho para fácil remoção
-            c = self.conn.cursor()
-            c.execute("SELECT name FROM parts WHERE id=?", (part_id,))
-            name = c.fetchone()[0]
-
-            if part_id in self.os_cart:
-                # Se já existe, aumenta a quantidade
-                self.os_cart[part_id]['qty'] += qty_to_add
-            else:
-                # Se não existe, adiciona
-                self.os_cart[part_id] = {'name': name, 'sku': part_sku, 'qty': qty_to_add, 'price': part_price}
+            # Soma ao carrinho com o preço do catálogo; a falta de estoque só gera aviso (a baixa é no Faturamento)
+            show_line(self.cart.add(part_id, qty_to_add))
 
             add_qty_e.delete(0, tk.END)
             add_qty_e.insert(0, "1")
 
-            update_cart_summary()
-
         ttk.Button(add_form, text="Adicionar ao Carrinho", style='Primary.TButton', command=add_item_to_os).grid(row=0,
                                                                                                                  column=2,
                                                                                                                  padx=10)
 
         add_qty_e.insert(0, "1")  # Valor inicial 1
 
-        self.setup_modal_window(win, f"Serviços - Abertura de OS - {PROJECT_NAME}")
+        def new_order():
+            # Limpa o carrinho temporário toda vez que a tela de serviços é reaberta
+            self.cart.clear()
+            cart_tree.delete(*cart_tree.get_children())
+            update_cart_summary()
+            for entry in (client_e, plate_e, desc_e):
+                entry.delete(0, tk.END)
+            mo_e.delete(0, tk.END)
+            mo_e.insert(0, "0.00")
+            add_qty_e.delete(0, tk.END)
+            add_qty_e.insert(0, "1")
+            search_var.set("")
+            run_search()  # Volta ao catálogo, se a busca estava ativa
+            catalog_tree.reload()  # Estoque e preços atualizados; as linhas voltam ao catálogo do carrinho
+
+        self.setup_modal_window(win, f"Serviços - Abertura de OS - {PROJECT_NAME}", "services", new_order)
 
     def check_vehicle_and_client(self, username, plate):
-        c = self.conn.cursor()
-        c.execute("SELECT id FROM users WHERE username=?", (username,))
-        user_row = c.fetchone()
-        if not user_row:
-            return None, "Cliente (usuário) não encontrado."
-        client_id = user_row[0]
-
-        # Verifica se a placa pertence a um carro OU moto
-        c.execute(
-            "SELECT client_id FROM cars WHERE license_plate=? UNION SELECT client_id FROM motorcycles WHERE license_plate=?",
-            (plate, plate))
-        vehicle_row = c.fetchone()
-        if not vehicle_row:
-            return None, "Veículo com a placa informada não está cadastrado."
-
-        if vehicle_row[0] != client_id:
-            return None, "O veículo não pertence ao cliente (usuário) informado."
-
-        return client_id, None
-
-    def refresh_services_tree(self, tree):
-        for r in tree.get_children():
-            tree.delete(r)
-        c = self.conn.cursor()
-        c.execute('''
-                  SELECT s.id, u.username, s.vehicle_plate, s.labor_price, s.final_total, s.date, s.status
-                  FROM services s
-                           LEFT JOIN users u ON s.client_id = u.id
-                  ORDER BY s.date DESC
-                  ''')
-        for row in c.fetchall():
-            # ID, Username, Placa, Labor_Price, Final_Total, Date, Status
-            tree.insert("", tk.END,
-                        values=(row[1], row[2], format_currency(row[3]), format_currency(row[4]), row[5], row[6]),
-                        text=str(row[0]))
+        return self.repo.vehicles.check_vehicle_and_client(username, plate)
 
     # --- NOVO FLUXO PARA ATUALIZAR ESTOQUE E GERAR FATURA ---
     def update_stock_and_invoice(self, service_id, is_paid):
-        c = self.conn.cursor()
-
-        # 1. CALCULA O TOTAL DA OS (Mão de Obra + Peças)
-        c.execute("SELECT labor_price FROM services WHERE id=?", (service_id,))
-        mo_price = c.fetchone()[0] or 0.0
-
-        c.execute("SELECT part_id, qty_used, price_unit FROM service_parts WHERE service_id=?", (service_id,))
-        parts_used = c.fetchall()
-
-        parts_total = sum(qty * price for _, qty, price in parts_used)
-        final_total = mo_price + parts_total
-
-        # 2. VALIDA E DÁ BAIXA NO ESTOQUE
-        # Verifica se há estoque suficiente antes de fazer qualquer baixa
-        for part_id, qty_used, _ in parts_used:
-            c.execute("SELECT qty FROM parts WHERE id=?", (part_id,))
-            qty_available = c.fetchone()
-            if not qty_available or qty_used > qty_available[0]:
-                c.execute("SELECT sku FROM parts WHERE id=?", (part_id,))
-                sku = c.fetchone()[0]
-                return False, f"Estoque insuficiente para a peça SKU {sku}. Necessário: {qty_used}, Disponível: {qty_available[0] if qty_available else 0}"
-
-        try:
-            # Baixa no estoque
-            for part_id, qty_used, _ in parts_used:
-                c.execute("UPDATE parts SET qty = qty - ? WHERE id=?", (qty_used, part_id))
-
-            # 3. ATUALIZA O TOTAL DA OS E STATUS PARA FECHADO
-            c.execute("UPDATE services SET final_total = ?, status = 'Fechado' WHERE id=?", (final_total, service_id))
-
-            # 4. GERA A FATURA
-            date = datetime.date.today().isoformat()
-            c.execute("INSERT INTO invoices(service_id, total, date, paid) VALUES (?, ?, ?, ?)",
-                      (service_id, final_total, date, 1 if is_paid else 0))
-
-            self.conn.commit()
-            return True, final_total
-
-        except Exception as e:
-            self.conn.rollback()
-            return False, f"Erro ao processar estoque/fatura: {str(e)}"
+        return self.repo.invoices.update_stock_and_invoice(service_id, is_paid)
 
     # 11) Tela de Faturamento / Invoices (agora é a 7)
     def build_invoices_screen(self):
+        if self.screens.show_modal("invoices"):
+            return
         win = tk.Toplevel(self.root)
 
         frame = ttk.Frame(win, padding=20);
@@ -1635,37 +1419,18 @@ class MM_Tunning_App:
         ttk.Label(frame, text="Serviços Abertos Prontos para Faturar:", font=("Inter", 10, 'bold')).pack(pady=5,
                                                                                                          anchor=tk.W)
 
-        # Tabela de Serviços Abertos
-        open_services_tree = ttk.Treeview(frame, columns=("client", "plate", "date", "mo_price"), show="headings")
-        open_services_tree.heading("client", text="Cliente (Usuário)")
-        open_services_tree.column("client", width=100, anchor=tk.CENTER)
-        open_services_tree.heading("plate", text="Placa")
-        open_services_tree.column("plate", width=100, anchor=tk.CENTER)
-        open_services_tree.heading("date", text="Data Abertura")
-        open_services_tree.column("date", width=100, anchor=tk.CENTER)
-        open_services_tree.heading("mo_price", text="M.O. (R$)")
-        open_services_tree.column("mo_price", width=100, anchor=tk.E)
+        # Tabela de Serviços Abertos (Ctrl/Shift + clique seleciona várias OS para faturar em lote);
+        # o iid é o ID da OS e o change_log tira da lista as faturadas (ver refresh_invoice_lists)
+        open_services_tree = VirtualTreeview(frame, [("client", "Cliente (Usuário)", 100, tk.CENTER, True),
+                                                     ("plate", "Placa", 100, tk.CENTER, True),
+                                                     ("date", "Data Abertura", 100, tk.CENTER, True),
+                                                     ("mo_price", "M.O. (R$)", 100, tk.E, True)],
+                                             self.repo.services.open_listing,
+                                             # o campo labor_price é o preço inicial da mão de obra
+                                             lambda r: (str(r[0]), str(r[0]), (r[1], r[2], r[4], format_currency(r[3]))),
+                                             sort="date", desc=True, height=8, selectmode="extended")
         open_services_tree.pack(fill=tk.X, pady=5, padx=5)
 
-        def refresh_open_services_tree(tree):
-            for r in tree.get_children(): tree.delete(r)
-            c = self.conn.cursor()
-            # Mostra serviços que estão abertos E AINDA NÃO FORAM FATURADOS
-            c.execute('''
-                      SELECT s.id, u.username, s.vehicle_plate, s.labor_price, s.date
-                      FROM services s
-                               JOIN users u ON s.client_id = u.id
-                               LEFT JOIN invoices i ON s.id = i.service_id
-                      WHERE s.status = 'Aberto'
-                        AND i.service_id IS NULL
-                      ORDER BY s.date DESC
-                      ''')
-            for row in c.fetchall():
-                # o campo labor_price é o preço inicial da mão de obra
-                tree.insert("", tk.END, values=(row[1], row[2], row[4], format_currency(row[3])), text=str(row[0]))
-
-        refresh_open_services_tree(open_services_tree)
-
         # FORMULÁRIO DE GERAÇÃO DE FATURA
         form = ttk.Frame(frame);
         form.pack(pady=15)
@@ -1676,68 +1441,113 @@ class MM_Tunning_App:
         def generate_invoice():
             sel = open_services_tree.selection()
             if not sel:
-                messagebox.showwarning("Atenção", "Selecione um Serviço na lista para gerar a fatura.")
+                messagebox.showwarning("Atenção", "Selecione um ou mais Serviços na lista para gerar a fatura.")
                 return
 
-            service_id = open_services_tree.item(sel[0], "text")
+            service_ids = [int(iid) for iid in sel]
             is_paid = paid_var.get()
 
-            success, result = self.update_stock_and_invoice(service_id, is_paid)
+            # Faturamento no worker; a tela mostra o estado de espera até a resposta
+            invoice_btn.config(state=tk.DISABLED)
+            if len(service_ids) == 1:
+                service_id = service_ids[0]
+                status_lbl.config(text=f"Processando fatura da OS #{service_id}...")
+                self.db.submit(lambda repo: repo.invoices.update_stock_and_invoice(service_id, is_paid),
+                               lambda outcome: invoice_done(service_id, outcome),
+                               lambda e: invoice_done(service_id, (False, str(e))))
+            else:
+                # Fechamento em lote: todas as OS selecionadas em poucas transações
+                status_lbl.config(text=f"Processando {len(service_ids)} faturas...")
+                self.db.submit(lambda repo: repo.invoices.invoice_many(service_ids, is_paid),
+                               batch_done,
+                               lambda e: batch_done([(sid, False, str(e)) for sid in service_ids]))
+
+        def invoice_done(service_id, outcome):
+            if not win.winfo_exists():
+                return
+            invoice_btn.config(state=tk.NORMAL)
+            status_lbl.config(text="")
+            success, result = outcome
 
             if success:
                 final_total = result
                 messagebox.showinfo("Sucesso",
                                     f"Fatura para OS #{service_id} gerada.\nTotal (M.O. + Peças): {format_currency(final_total)}\nEstoque atualizado com sucesso.")
-                refresh_open_services_tree(open_services_tree)  # Remove da lista de abertos
-                self.refresh_invoices_tree(invoices_tree)  # Adiciona na lista de faturas
-
-                # Atualiza a tabela na tela de Serviços
-                # Verifica se a janela de Serviços ainda está aberta para atualizar o treeview
-                try:
-                    services_window = next(w for w in self.root.winfo_children() if
-                                           isinstance(w, tk.Toplevel) and w.title().startswith(
-                                               f"Serviços - Abertura de OS"))
-                    services_tree = services_window.winfo_children()[0].winfo_children()[1]
-                    self.refresh_services_tree(services_tree)
-                except StopIteration:
-                    pass  # Janela de Serviços não está aberta
-
-                self.build_dashboard()  # Atualiza o dashboard com novo estoque
+                after_invoicing()
             else:
                 messagebox.showerror("Erro de Faturamento", f"Falha ao gerar fatura ou atualizar estoque:\n{result}")
 
-        ttk.Button(form, text="Gerar Fatura e Dar Baixa no Estoque", style='Primary.TButton',
-                   command=generate_invoice).pack(pady=10)
+        def batch_done(results):
+            if not win.winfo_exists():
+                return
+            invoice_btn.config(state=tk.NORMAL)
+            status_lbl.config(text="")
+
+            done = [(sid, total) for sid, ok, total in results if ok]
+            failed = [(sid, msg) for sid, ok, msg in results if not ok]
+            summary = f"Faturadas: {len(done)} de {len(results)} OS"
+            if done:
+                summary += f" (Total: {format_currency(sum(total for _, total in done))})"
+            lines = [f"OS #{sid}: {format_currency(total)}" for sid, total in done]
+            lines += [f"OS #{sid}: FALHOU - {msg}" for sid, msg in failed]
+            show_msg = messagebox.showwarning if failed else messagebox.showinfo
+            show_msg("Faturamento em Lote", summary + "\n\n" + "\n".join(lines))
+
+            if done:
+                after_invoicing()  # Uma única atualização para o lote todo
+
+        def after_invoicing():
+            refresh_invoice_lists()
+            # A tela de Serviços atualiza o catálogo ao ser reaberta
+            self.build_dashboard()  # Atualiza o dashboard com novo estoque
+
+        def refresh_invoice_lists():
+            # Só as OS alteradas desde a última leitura (faturadas saem, novas entram)
+            open_services_tree.sync()
+            self.refresh_invoices_tree(invoices_tree)  # Adiciona na lista de faturas
+
+        invoice_btn = ttk.Button(form, text="Gerar Fatura e Dar Baixa no Estoque", style='Primary.TButton',
+                                 command=generate_invoice)
+        invoice_btn.pack(pady=10)
+        status_lbl = ttk.Label(form, text="", foreground='#AAAAAA')
+        status_lbl.pack()
+
+        def open_services_loaded(error):
+            invoice_btn.config(state=tk.NORMAL)
+            status_lbl.config(text="")
+            if error is not None:
+                messagebox.showerror("Erro", f"Falha ao carregar os serviços abertos:\n{error}")
+
+        # Primeira página lida no worker; a tela abre já com o estado de carregamento
+        invoice_btn.config(state=tk.DISABLED)
+        status_lbl.config(text="Carregando serviços abertos...")
+        open_services_tree.reload_in(self.db.submit, lambda repo: repo.services.open_listing, open_services_loaded)
 
         # Tabela de Faturas Geradas
         ttk.Label(frame, text="Faturas Geradas:", font=("Inter", 10, 'bold')).pack(pady=5, anchor=tk.W)
-        invoices_tree = ttk.Treeview(frame, columns=("service", "total", "date", "paid"), show="headings")
-        invoices_tree.heading("service", text="Serviço ID")
-        invoices_tree.column("service", width=100, anchor=tk.CENTER)
-        invoices_tree.heading("total", text="Total")
-        invoices_tree.column("total", width=100, anchor=tk.E)
-        invoices_tree.heading("date", text="Data")
-        invoices_tree.column("date", width=100, anchor=tk.CENTER)
-        invoices_tree.heading("paid", text="Pago")
-        invoices_tree.column("paid", width=80, anchor=tk.CENTER)
+        invoices_tree = VirtualTreeview(frame, [("service", "Serviço ID", 100, tk.CENTER, True),
+                                                ("total", "Total", 100, tk.E, True),
+                                                ("date", "Data", 100, tk.CENTER, True),
+                                                ("paid", "Pago", 80, tk.CENTER, True)],
+                                        self.repo.invoices.listing,
+                                        lambda r: (str(r[0]), str(r[0]), (r[1], format_currency(r[2]), r[3],
+                                                                          "Sim" if r[4] else "Não")),
+                                        sort="date", desc=True)
         invoices_tree.pack(fill=tk.BOTH, expand=True, pady=10)
         self.refresh_invoices_tree(invoices_tree)
 
-        ttk.Button(frame, text="Fechar Janela", command=win.destroy).pack(pady=5)
+        ttk.Button(frame, text="Fechar Janela", command=lambda: self.screens.hide(win)).pack(pady=5)
 
-        self.setup_modal_window(win, f"Faturamento - {PROJECT_NAME}")
+        self.setup_modal_window(win, f"Faturamento - {PROJECT_NAME}", "invoices", refresh_invoice_lists)
 
     def refresh_invoices_tree(self, tree):
-        for r in tree.get_children():
-            tree.delete(r)
-        c = self.conn.cursor()
-        c.execute("SELECT id, service_id, total, date, paid FROM invoices ORDER BY date DESC")
-        for row in c.fetchall():
-            tree.insert("", tk.END, values=(row[1], format_currency(row[2]), row[3], "Sim" if row[4] else "Não"),
-                        text=str(row[0]))
+        tree.sync()
 
     # 12) Relatórios (simples) (agora é a 8)
     def build_reports_screen(self):
+        if self.screens.show_modal("reports"):
+            return
+        from exporter import SERVICE_STATUSES  # Exportação carregada só quando a tela é montada
         win = tk.Toplevel(self.root)
 
         frame = ttk.Frame(win, padding=20);
@@ -1750,17 +1560,13 @@ class MM_Tunning_App:
         # Text widget com fundo dark
         rpt = tk.Text(frame, height=18, bg='#3C4855', fg='#FFFFFF', insertbackground=PRIMARY_COLOR)
         rpt.pack(fill=tk.BOTH, expand=True)
+        rpt.insert("1.0", "\nCarregando relatório...")
 
-        # Gerar relatório com dados resumo
-        c = self.conn.cursor()
-        c.execute(
-            "SELECT COUNT(*), SUM(final_total) FROM services WHERE status='Fechado'")  # Soma apenas serviços fechados (faturados)
-        services_cnt, services_sum = c.fetchone()
-        services_sum = services_sum or 0.0
-        c.execute("SELECT COUNT(*), SUM(total) FROM invoices")
-        inv_cnt, inv_sum = c.fetchone()
-        inv_sum = inv_sum or 0.0
-        report_text = f"""
+        def show_report(data):
+            if not rpt.winfo_exists():
+                return
+            (services_cnt, services_sum), (inv_cnt, inv_sum) = data
+            report_text = f"""
 RELATÓRIO DE GESTÃO - {PROJECT_NAME}
 ------------------------------------------------------
 Data de geração: {datetime.datetime.now().strftime('%d/%m/%Y %H:%M')}
@@ -1778,10 +1584,83 @@ Receita faturada (Total das Faturas): {format_currency(inv_sum)}
 - Verificar peças com estoque baixo no Dashboard.
 - Conferir ferramentas emprestadas/indisponíveis.
 """
-        rpt.insert("1.0", report_text)
-        ttk.Button(frame, text="Fechar", command=win.destroy).pack(pady=10)
+            rpt.delete("1.0", tk.END)
+            rpt.insert("1.0", report_text)
+
+        def load_report():
+            # Gerar relatório com dados resumo (no worker), a cada abertura da tela
+            # Soma apenas serviços fechados (faturados)
+            self.db.submit(lambda repo: (repo.services.closed_summary(), repo.invoices.summary()), show_report,
+                           lambda e: rpt.winfo_exists() and rpt.insert(tk.END, f"\nErro ao gerar relatório: {e}"))
+
+        load_report()
+
+        # EXPORTAÇÃO (CSV / JSON Lines) - gravada pelo worker, sem travar a tela
+        ttk.Label(frame, text="Exportar Dados:", font=("Inter", 10, 'bold')).pack(pady=(10, 5), anchor=tk.W)
+        export_form = ttk.Frame(frame)
+        export_form.pack(anchor=tk.W)
+        datasets = {"Serviços (OS)": "services", "Peças usadas nas OS": "service_parts", "Faturas": "invoices"}
+        entry_style = {'background': '#4A5360', 'foreground': TEXT_COLOR, 'insertbackground': PRIMARY_COLOR}
 
-        self.setup_modal_window(win, f"Relatórios - {PROJECT_NAME}")
+        ttk.Label(export_form, text="Dados:").grid(row=0, column=0, sticky=tk.W, padx=5)
+        dataset_cb = ttk.Combobox(export_form, values=list(datasets), state="readonly", width=22)
+        dataset_cb.current(2)
+        dataset_cb.grid(row=0, column=1, padx=5)
+        ttk.Label(export_form, text="De:").grid(row=0, column=2, sticky=tk.W, padx=5)
+        from_entry = tk.Entry(export_form, width=12, **entry_style)
+        from_entry.grid(row=0, column=3, padx=5)
+        ttk.Label(export_form, text="Até:").grid(row=0, column=4, sticky=tk.W, padx=5)
+        to_entry = tk.Entry(export_form, width=12, **entry_style)
+        to_entry.grid(row=0, column=5, padx=5)
+        ttk.Label(export_form, text="Status da OS:").grid(row=0, column=6, sticky=tk.W, padx=5)
+        status_cb = ttk.Combobox(export_form, values=["Todos"] + list(SERVICE_STATUSES), state="readonly", width=10)
+        status_cb.current(0)
+        status_cb.grid(row=0, column=7, padx=5)
+        export_lbl = ttk.Label(frame, text="Datas no formato DD/MM/AAAA (em branco = sem limite).",
+                               foreground='#AAAAAA')
+
+        def export_data():
+            from exporter import export, parse_date
+            try:
+                date_from = parse_date(from_entry.get())
+                date_to = parse_date(to_entry.get())
+            except ValueError as e:
+                messagebox.showerror("Erro", str(e))
+                return
+            dataset = datasets[dataset_cb.get()]
+            status = None if status_cb.get() == "Todos" else status_cb.get()
+            from tkinter import filedialog  # Carregado só quando o diálogo é aberto
+            path = filedialog.asksaveasfilename(defaultextension=".csv", initialfile=f"{dataset}.csv",
+                                                filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl")])
+            if not path:
+                return
+            export_btn.config(state=tk.DISABLED)
+            export_lbl.config(text="Exportando...")
+            self.db.submit(lambda repo: export(repo.conn, dataset, path, date_from=date_from, date_to=date_to,
+                                               status=status,
+                                               progress=lambda n: self.db.notify(show_export_progress, n)),
+                           lambda count: export_done(f"{count} linhas exportadas para {path}"),
+                           lambda e: export_done(f"Erro na exportação: {e}"))
+
+        def show_export_progress(count):
+            if export_lbl.winfo_exists():
+                export_lbl.config(text=f"Exportando... {count} linhas")
+
+        def export_done(message):
+            if export_btn.winfo_exists():
+                export_btn.config(state=tk.NORMAL)
+                export_lbl.config(text=message)
+
+        export_btn = ttk.Button(export_form, text="Exportar...", command=export_data)
+        export_btn.grid(row=0, column=8, padx=10)
+        export_lbl.pack(anchor=tk.W, pady=2)
+        if self.server_url:
+            export_btn.config(state=tk.DISABLED)
+            export_lbl.config(text="No modo servidor, exporte na máquina do servidor (exporter.py).")
+
+        ttk.Button(frame, text="Fechar", command=lambda: self.screens.hide(win)).pack(pady=10)
+
+        self.setup_modal_window(win, f"Relatórios - {PROJECT_NAME}", "reports", load_report)
 
     # 13) Fluxograma (REMOVIDA, era a 7)
 
@@ -1789,6 +1668,8 @@ Receita faturada (Total das Faturas): {format_currency(inv_sum)}
 
     # 15) Sobre / Contato (agora é a 9)
     def build_about_screen(self):
+        if self.screens.show_modal("about"):
+            return
         win = tk.Toplevel(self.root)
 
         f = ttk.Frame(win, padding=20);
@@ -1808,12 +1689,14 @@ Receita faturada (Total das Faturas): {format_currency(inv_sum)}
         ttk.Label(f, text="🌐 Website: www.memtunning.com.br", justify=tk.CENTER).pack(pady=5)
         ttk.Label(f, text="📍 Endereço: Avenida Guarapiranga Jose Benedito 110", justify=tk.CENTER).pack(pady=5)
 
-        ttk.Button(f, text="Fechar", command=win.destroy).pack(pady=15)
+        ttk.Button(f, text="Fechar", command=lambda: self.screens.hide(win)).pack(pady=15)
 
-        self.setup_modal_window(win, f"Sobre / Contato - {PROJECT_NAME}")
+        self.setup_modal_window(win, f"Sobre / Contato - {PROJECT_NAME}", "about")
 
     # 16) Configurações (agora é a 10)
     def build_settings_screen(self):
+        if self.screens.show_modal("settings"):
+            return
         win = tk.Toplevel(self.root)
 
         f = ttk.Frame(win, padding=20);
@@ -1825,23 +1708,162 @@ Receita faturada (Total das Faturas): {format_currency(inv_sum)}
         ttk.Label(f, text="Alterar logo (substituir arquivo logo.png):").pack(anchor=tk.W, pady=5)
 
         def change_logo():
+            from tkinter import filedialog  # Carregado só quando o diálogo é aberto
             p = filedialog.askopenfilename(filetypes=[("PNG/JPG", "*.png;*.jpg;*.jpeg")])
             if p:
                 try:
                     newpath = LOGO_PATH
                     with open(p, "rb") as src, open(newpath, "wb") as dst:
                         dst.write(src.read())
-                    messagebox.showinfo("OK", "Logo atualizada. Reinicie a aplicação para ver mudanças.")
+                    self.images.refresh(LOGO_PATH)  # Atualiza as logos já exibidas, sem reiniciar
+                    messagebox.showinfo("OK", "Logo atualizada.")
                 except Exception as e:
                     messagebox.showerror("Erro", str(e))
 
         ttk.Button(f, text="Selecionar nova logo", command=change_logo).pack(pady=10)
-        ttk.Button(f, text="Fechar", command=win.destroy).pack(pady=15)
 
-        self.setup_modal_window(win, f"Configurações - {PROJECT_NAME}")
+        # Os cards do Dashboard leem contadores mantidos por triggers; aqui é possível conferi-los
+        ttk.Label(f, text="Contadores do Dashboard (conferência com contagem completa):").pack(anchor=tk.W, pady=5)
+        verify_lbl = ttk.Label(f, text="", foreground='#AAAAAA')
+
+        def stats_verified(diff):
+            if not verify_lbl.winfo_exists():
+                return
+            if diff:
+                details = ", ".join(f"{k}: {stored} → {actual}" for k, (stored, actual) in diff.items())
+                verify_lbl.config(text=f"Divergências corrigidas: {details}", foreground='#FF5555')
+            else:
+                verify_lbl.config(text="Contadores conferidos: nenhuma divergência.", foreground='#00FF00')
+
+        def verify_stats():
+            verify_lbl.config(text="Recontando...", foreground='#AAAAAA')
+            self.db.submit(lambda repo: repo.verify_stats(), stats_verified,
+                           lambda e: verify_lbl.winfo_exists() and verify_lbl.config(text=f"Erro: {e}"))
+
+        ttk.Button(f, text="Verificar contadores", command=verify_stats).pack(pady=5)
+        verify_lbl.pack(anchor=tk.W)
+
+        # Cache das consultas repetidas (usuário, placa, nome de peça) da conexão da interface
+        ttk.Label(f, text="Cache de consultas (acertos / faltas / entradas):").pack(anchor=tk.W, pady=5)
+        cache_lbl = ttk.Label(f, text="", foreground='#AAAAAA', justify=tk.LEFT)
+
+        def show_cache_stats():
+            if self.repo.cache is None:
+                cache_lbl.config(text="Modo servidor: o cache fica nas conexões do servidor.")
+                return
+            stats = self.repo.cache.stats()
+            lines = []
+            for name, (hits, misses, size) in stats.items():
+                total = hits + misses
+                rate = f"{hits / total:.0%}" if total else "-"
+                lines.append(f"{name}: {hits} / {misses} / {size} (acertos: {rate})")
+            lines.append(f"Descartes por alteração de outra conexão: {self.repo.cache.invalidations}")
+            cache_lbl.config(text="\n".join(lines))
+
+        def clear_cache():
+            if self.repo.cache is not None:
+                self.repo.cache.clear()
+            show_cache_stats()
+
+        cache_btns = ttk.Frame(f)
+        cache_btns.pack(anchor=tk.W)
+        ttk.Button(cache_btns, text="Atualizar", command=show_cache_stats).pack(side=tk.LEFT, padx=5)
+        ttk.Button(cache_btns, text="Limpar cache", command=clear_cache).pack(side=tk.LEFT, padx=5)
+        cache_lbl.pack(anchor=tk.W)
+        show_cache_stats()
+
+        # Modo do banco (ligado/desligado com --multi-user / --single-user)
+        if self.server_url:
+            mode = f"cliente do servidor {self.server_url}"
+        else:
+            mode = "multiestação (WAL) ativo" if is_multi_user(self.conn) else "estação única (journal padrão)"
+        ttk.Label(f, text=f"Banco de dados: modo {mode}.", foreground='#AAAAAA').pack(anchor=tk.W, pady=5)
+        ttk.Button(f, text="Fechar", command=lambda: self.screens.hide(win)).pack(pady=15)
+
+        def on_show():
+            verify_lbl.config(text="")
+            show_cache_stats()
+
+        self.setup_modal_window(win, f"Configurações - {PROJECT_NAME}", "settings", on_show)
+
+    # 18) Desempenho: consultas SQL mais pesadas (apenas Admin)
+    def build_performance_screen(self):
+        if not self.user or self.user["role"] != "admin":
+            messagebox.showwarning("Acesso", "Apenas administradores podem acessar o painel de desempenho.")
+            return
+        if self.screens.show_modal("performance"):
+            return
+        win = tk.Toplevel(self.root)
+
+        f = ttk.Frame(win, padding=20);
+        f.pack(fill=tk.BOTH, expand=True)
+
+        self.insert_header_logo(f)  # INSERIR LOGO
+
+        ttk.Label(f, text="Desempenho - Consultas SQL", style='Subtitle.TLabel').pack(pady=10, anchor=tk.W)
+        summary_lbl = ttk.Label(f, text="", foreground='#AAAAAA', justify=tk.LEFT)
+        summary_lbl.pack(anchor=tk.W, pady=5)
+
+        columns = [("calls", "Execuções", 80, tk.CENTER), ("total", "Total (ms)", 90, tk.E),
+                   ("mean", "Média (ms)", 90, tk.E), ("p95", "p95 (ms)", 90, tk.E), ("max", "Máx. (ms)", 90, tk.E),
+                   ("rows", "Linhas", 90, tk.E), ("site", "Origem", 260, tk.W), ("sql", "Comando", 500, tk.W)]
+
+        def make_tree(title):
+            ttk.Label(f, text=title, font=("Inter", 10, 'bold')).pack(pady=5, anchor=tk.W)
+            tree = ttk.Treeview(f, columns=[c[0] for c in columns], show="headings", height=8)
+            for col_id, heading, width, anchor in columns:
+                tree.heading(col_id, text=heading)
+                tree.column(col_id, width=width, anchor=anchor)
+            tree.pack(fill=tk.BOTH, expand=True, pady=5)
+            return tree
+
+        total_tree = make_tree("Maior tempo total:")
+        p95_tree = make_tree("Maior p95 (as mais lentas de cada vez):")
+
+        # Latência da interface: só com o monitor do loop do Tk ligado (--watchdog)
+        ttk.Label(f, text="Loop da interface (atraso dos batimentos):", font=("Inter", 10, 'bold')).pack(pady=5,
+                                                                                                        anchor=tk.W)
+        loop_lbl = ttk.Label(f, text="", foreground='#AAAAAA', font=("Courier", 9), justify=tk.LEFT)
+        loop_lbl.pack(anchor=tk.W)
+
+        def refresh():
+            if self.watchdog is None:
+                loop_lbl.config(text="Monitor desligado (inicie com --watchdog).")
+            else:
+                loop_lbl.config(text=f"{self.watchdog.summary()}\nTravamentos registrados em {self.watchdog.log_path}.")
+            for tree in (total_tree, p95_tree):
+                tree.delete(*tree.get_children())
+            if self.tracer is None:
+                summary_lbl.config(text="Rastreamento desligado (modo servidor ou --slow-ms 0).")
+                return
+            tracer = self.tracer
+            summary_lbl.config(text=f"Comandos medidos: {tracer.total} (últimos {len(tracer.records)} em memória). "
+                                    f"Lentos (≥ {tracer.slow * 1000:.0f} ms): {tracer.slow_count}, "
+                                    f"registrados em {tracer.log_path}.")
+            for tree, by in ((total_tree, "total"), (p95_tree, "p95")):
+                for item in tracer.top(by):
+                    tree.insert("", tk.END, values=(item["calls"], f"{item['total_ms']:.1f}", f"{item['mean_ms']:.2f}",
+                                                    f"{item['p95_ms']:.2f}", f"{item['max_ms']:.2f}", item["rows"],
+                                                    item["site"], item["sql"]))
+
+        def clear():
+            if self.tracer is not None:
+                self.tracer.clear()
+            refresh()
+
+        btns = ttk.Frame(f)
+        btns.pack(pady=10)
+        ttk.Button(btns, text="Atualizar", command=refresh).pack(side=tk.LEFT, padx=5)
+        ttk.Button(btns, text="Limpar medidas", command=clear).pack(side=tk.LEFT, padx=5)
+        ttk.Button(btns, text="Fechar", command=lambda: self.screens.hide(win)).pack(side=tk.LEFT, padx=5)
+        refresh()
+
+        self.setup_modal_window(win, f"Desempenho - {PROJECT_NAME}", "performance", refresh)
 
     # 17) Tela de Ajuda (agora é a 11)
     def build_help_screen(self):
+        if self.screens.show_modal("help"):
+            return
         win = tk.Toplevel(self.root)
 
         f = ttk.Frame(win, padding=20);
@@ -1868,6 +1890,7 @@ MANUAL RÁPIDO - {PROJECT_NAME}
     1. Preencha o **Cliente (usuário)** e a **Placa do Veículo** (o sistema valida se a placa pertence ao cliente).
     2. Insira o valor da **Mão de Obra (M.O.)**.
     3. Na seção **Catálogo de Peças** (lado direito), selecione as peças e a quantidade e clique em "Adicionar ao Carrinho".
+       Use o campo **Buscar** para encontrar a peça pelo nome, parte do SKU (ex.: "FIL-01") ou descrição.
     4. O "Carrinho" (lado esquerdo) lista as peças.
     5. Clique em **"Abrir Ordem de Serviço"**.
 
@@ -1879,29 +1902,90 @@ MANUAL RÁPIDO - {PROJECT_NAME}
     3. O sistema irá calcular o **Total Final** (M.O. + Total das Peças da OS).
     4. Clique em **"Gerar Fatura e Dar Baixa no Estoque"**.
     5. **Atenção:** Se o estoque for insuficiente para a OS, a fatura será bloqueada com um alerta.
+    6. **Fechamento em lote:** segure Ctrl (ou Shift) para selecionar várias OS; ao final é exibido um resumo por OS.
 
 **Dica de Visual:**
 - Para que o logo apareça, certifique-se de ter o arquivo **`logo.png`** com fundo escuro na pasta do projeto.
 """
         ttk.Label(f, text=help_txt, justify=tk.LEFT, font=("Inter", 10), foreground='#FFFFFF').pack(pady=10,
                                                                                                     anchor=tk.W)
-        ttk.Button(f, text="Fechar", command=win.destroy).pack(pady=10)
+        ttk.Button(f, text="Fechar", command=lambda: self.screens.hide(win)).pack(pady=10)
 
-        self.setup_modal_window(win, f"Ajuda - {PROJECT_NAME}")
+        self.setup_modal_window(win, f"Ajuda - {PROJECT_NAME}", "help")
 
     def logout(self):
         self.user = None
         messagebox.showinfo("Logout", "Você saiu da sessão.")
+        self.reset_user_screens()
         self.build_welcome_screen()
 
-    def clear_root(self):
-        for w in self.root.winfo_children():
-            w.destroy()
+    def reset_user_screens(self):
+        """Descarta as telas montadas para o usuário anterior (nome no dashboard, vendedor da OS)."""
+        self.screens.reset(keep=("welcome", "login"))
 
 
 # ---------- execução ----------
+class StartupTimer:
+    """Tempos da inicialização por etapa (--profile-startup), medidos desde o início do main.py."""
+
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.phases = []  # (etapa, segundos, desde o início)
+        self._last = _START
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last, now - _START))
+        self._last = now
+
+    def add(self, phase, seconds):
+        """Etapa medida fora da thread do Tk (ex.: init_db em segundo plano)."""
+        self.phases.append((phase, seconds, None))
+
+    def report(self):
+        if not self.enabled:
+            return
+        print("Inicialização (ms):", file=sys.stderr)
+        for phase, seconds, total in self.phases:
+            since = f"{total * 1000:9.1f}" if total is not None else " " * 9
+            print(f"  {phase:32s} {seconds * 1000:9.1f}  {since}", file=sys.stderr)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=f"{PROJECT_NAME} - Sistema Gerenciador de Mecânica")
+    parser.add_argument("--seed-demo", action="store_true",
+                        help="insere os dados de demonstração (idempotente) antes de abrir a aplicação")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="mostra no terminal o tempo de cada etapa da inicialização")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--multi-user", dest="multi_user", action="store_const", const=True, default=None,
+                      help="liga o modo multiestação (WAL) no banco; fica gravado para as próximas aberturas")
+    mode.add_argument("--single-user", dest="multi_user", action="store_const", const=False,
+                      help="volta ao journal padrão (todas as outras estações precisam estar fechadas)")
+    parser.add_argument("--server", default=None, metavar="URL",
+                        help="usa o servidor HTTP (server.py) em vez de abrir o banco, ex.: http://192.168.0.10:8765")
+    parser.add_argument("--slow-ms", type=int, default=None, metavar="MS",
+                        help="comandos SQL mais lentos que isto vão para o log de consultas lentas "
+                             "(padrão: SLOW_QUERY_MS de tracing.py; 0 desliga o rastreamento)")
+    parser.add_argument("--watchdog", action="store_true",
+                        help="mede a latência do loop do Tk; travamentos vão para o log de travamentos (watchdog.py)")
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
-    init_db()
+    args = parse_args()
+    timer = StartupTimer(args.profile_startup)
+    timer.mark("imports")
     root = tk.Tk()
-    app = MM_Tunning_App(root)
+    timer.mark("janela Tk")
+    watchdog = None
+    if args.watchdog:
+        from watchdog import EventLoopWatchdog  # Só com --watchdog
+        # Antes de montar as telas: os comandos dos widgets são registrados na criação
+        watchdog = EventLoopWatchdog(root)
+        watchdog.install()
+    app = MM_Tunning_App(root, seed_demo=args.seed_demo, timer=timer, multi_user=args.multi_user,
+                         server_url=args.server, slow_ms=args.slow_ms, watchdog=watchdog)
     root.mainloop()
+    if watchdog:
+        watchdog.report()
@@ -0,0 +1,134 @@
+"""
+M&M Tunning - Cliente do servidor HTTP/JSON (server.py).
+
+`RemoteRepository` tem a mesma interface do Repository usada pelas telas
+(repo.parts.search(...), repo.invoices.update_stock_and_invoice(...), as
+listagens paginadas...), mas cada chamada vira um POST /api/<método> no
+servidor. Os erros voltam como as mesmas exceções (sqlite3.IntegrityError,
+LookupError, ValueError), então as telas tratam os dois modos do mesmo jeito.
+
+Como uma conexão sqlite3, cada instância deve ser usada por uma única thread
+(a conexão HTTP fica aberta entre as chamadas).
+"""
+
+import http.client
+import json
+import os
+import sqlite3
+from urllib.parse import urlsplit
+
+from repository import InvoiceError
+from server import METHODS, READ, TOKEN_ENV
+
+REMOTE_TIMEOUT = 30  # Segundos de espera por uma resposta do servidor
+
+# Tipo de erro informado pelo servidor -> exceção levantada aqui
+ERROR_TYPES = {
+    "IntegrityError": sqlite3.IntegrityError,
+    "OperationalError": sqlite3.OperationalError,
+    "InvoiceError": InvoiceError,
+    "LookupError": LookupError,
+    "KeyError": LookupError,
+    "ValueError": ValueError,
+    "TypeError": TypeError,
+    "PermissionError": PermissionError,
+}
+
+
+class RemoteError(Exception):
+    """Servidor indisponível ou erro interno dele."""
+
+
+def _tuples(value):
+    # O JSON só tem listas; as linhas do sqlite3 (e as chaves das listagens) são tuplas
+    if isinstance(value, list):
+        return tuple(_tuples(v) for v in value)
+    if isinstance(value, dict):
+        return {k: _tuples(v) for k, v in value.items()}
+    return value
+
+
+class _Proxy:
+    """repo.parts, repo.parts.listing... : cada atributo acrescenta um nível ao nome do método."""
+
+    def __init__(self, client, path):
+        self._client = client
+        self._path = path
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return _Proxy(self._client, f"{self._path}.{name}")
+
+    def __call__(self, *args, **kwargs):
+        return self._client.call(self._path, *args, **kwargs)
+
+
+class RemoteRepository:
+    # Sem acesso direto ao arquivo: importação, exportação e cache local ficam no servidor
+    conn = None
+    cache = None
+
+    def __init__(self, url, timeout=REMOTE_TIMEOUT, token=None):
+        parts = urlsplit(url if "://" in url else f"http://{url}")
+        self.url = f"http://{parts.netloc}"
+        self._host = parts.hostname
+        self._port = parts.port or 80
+        self._timeout = timeout
+        # Token compartilhado exigido pelo servidor fora da máquina local (ver server.py)
+        self._headers = {"Content-Type": "application/json"}
+        token = token or os.environ.get(TOKEN_ENV)
+        if token:
+            self._headers["Authorization"] = f"Bearer {token}"
+        self._http = None
+
+    def __getattr__(self, name):
+        # users, parts, vehicles, dashboard_counts... (só atributos que não existem aqui)
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return _Proxy(self, name)
+
+    def call(self, method, *args, **kwargs):
+        body = json.dumps({"args": args, "kwargs": kwargs}, ensure_ascii=False).encode("utf-8")
+        return self._request("POST", f"/api/{method}", body, METHODS.get(method) == READ)
+
+    def health(self):
+        return self._request("GET", "/api/health", idempotent=True)
+
+    def _request(self, method, path, body=None, idempotent=False):
+        """Envia o pedido e devolve o resultado.
+
+        Uma conexão mantida aberta que o servidor fechou (ex.: reiniciado) é refeita uma vez, mas
+        só quando o pedido certamente não foi processado (falha no envio) ou é uma leitura: uma
+        gravação repetida depois de enviada poderia ser aplicada duas vezes (OS ou baixa em dobro)."""
+        reused = self._http is not None
+        if self._http is None:
+            self._http = http.client.HTTPConnection(self._host, self._port, timeout=self._timeout)
+        sent = False
+        try:
+            self._http.request(method, path, body=body, headers=self._headers)
+            sent = True
+            response = self._http.getresponse()
+            raw = response.read()
+        except (http.client.HTTPException, OSError) as e:
+            self.close()
+            stale = isinstance(e, (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError))
+            if reused and stale and (not sent or idempotent):
+                return self._request(method, path, body, idempotent)
+            if sent and not idempotent:
+                raise RemoteError(f"Sem resposta do servidor ({self.url}): {e}. "
+                                  "A operação pode ter sido gravada; confira antes de repetir.")
+            raise RemoteError(f"Servidor indisponível ({self.url}): {e}")
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            raise RemoteError(f"Resposta inválida do servidor (HTTP {response.status}).")
+        if "error" in data:
+            error = data["error"]
+            raise ERROR_TYPES.get(error.get("type"), RemoteError)(error.get("message", ""))
+        return _tuples(data["result"])
+
+    def close(self):
+        if self._http is not None:
+            self._http.close()
+            self._http = None
@@ -0,0 +1,833 @@
+"""
+M&M Tunning - Camada de acesso a dados (sem interface gráfica).
+
+Todas as consultas SQL do sistema ficam aqui, agrupadas por entidade
+(usuários, peças, ferramentas, veículos, serviços e faturas). A classe
+`MM_Tunning_App` apenas chama estes métodos; rotinas noturnas, importações
+e testes de carga podem usar o mesmo código sem abrir uma janela Tk.
+
+Uso headless:
+    conn = sqlite3.connect("mmtunning.db")
+    repo = Repository(conn)
+    repo.parts.add("Vela", "P-IGN-001", 10, 45.0, "")
+"""
+
+import re
+import sqlite3
+import datetime
+import functools
+
+from cache import LookupCache
+from database import STATS_RECOUNT_SQL, connect, retry_on_busy, transaction
+
+
+class InvoiceError(Exception):
+    """Faturamento recusado (OS inexistente, já faturada ou estoque insuficiente)."""
+
+
+# Quantidade de linhas por página nas listagens (Treeviews virtuais)
+PAGE_SIZE = 200
+
+# Máximo de resultados da busca textual do catálogo
+SEARCH_LIMIT = 100
+
+
+# Acima desta quantidade de resultados a busca não ordena por relevância (ver PartsRepository.search)
+SEARCH_RANK_CANDIDATES = 1000
+
+
+def retrying(method):
+    """Método de escrita refeito com espera crescente se outra estação segurar o banco.
+
+    O método precisa gravar tudo numa única transação (`with transaction(...)`),
+    para que a tentativa desfeita não deixe nada pela metade."""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        return retry_on_busy(self.conn, lambda: method(self, *args, **kwargs))
+
+    return wrapper
+
+
+def fts_query(text):
+    """Converte o texto digitado em consulta FTS5: cada palavra vira um prefixo ("fil"* AND "01"*).
+
+    Letras isoladas (o "P" de "P-FIL") casam só a palavra exata: como prefixo casariam quase tudo."""
+    words = re.findall(r"\w+", text or "")
+    return " ".join(f'"{w}"*' if len(w) > 1 else f'"{w}"' for w in words)
+
+
+# OS faturadas por transação no faturamento em lote
+INVOICE_CHUNK_SIZE = 50
+
+# OS abertas por transação na abertura em lote (contratos de frota)
+ORDER_CHUNK_SIZE = 50
+
+# Máximo de valores num "IN (...)" (bem abaixo do limite de parâmetros do SQLite)
+IN_CHUNK_SIZE = 500
+
+
+class KeysetQuery:
+    """Listagem paginada por chave (keyset): `WHERE (ordem, id) > (?, ?) LIMIT n`.
+
+    Diferente de OFFSET, cada página custa o mesmo não importa a profundidade,
+    desde que exista índice para a coluna de ordenação. `sort_columns` mapeia
+    o nome da coluna exibida para a(s) expressão(ões) SQL usadas no ORDER BY."""
+
+    def __init__(self, select, from_clause, key, sort_columns=None, where=None):
+        self.select = select
+        self.from_clause = from_clause
+        self.key = key
+        self.sort_columns = sort_columns or {}
+        self.where = where
+
+    def _order_exprs(self, sort):
+        if sort is None:
+            return ()
+        if sort not in self.sort_columns:
+            raise ValueError(f"Coluna de ordenação inválida: {sort}")
+        exprs = self.sort_columns[sort]
+        return (exprs,) if isinstance(exprs, str) else tuple(exprs)
+
+    def _after(self, exprs, token, desc):
+        """Predicado "vem depois do token" e seus parâmetros.
+
+        NULLs ficam sempre no início (NULLS FIRST nos dois sentidos), assim a
+        comparação por row-value (que ignora NULLs) é exata enquanto o token não
+        tiver NULL. Só dentro do grupo de NULLs usamos a forma expandida."""
+        cols = exprs + (self.key,)
+        op = "<" if desc else ">"
+        if None not in token:
+            placeholders = ", ".join("?" for _ in token)
+            return f"({', '.join(cols)}) {op} ({placeholders})", list(token)
+
+        terms, params = [], []
+        for i, (col, value) in enumerate(zip(cols, token)):
+            equal = [f"{c} IS ?" for c in cols[:i]]
+            if value is None:
+                after = f"{col} IS NOT NULL"
+                after_params = []
+            else:
+                after = f"{col} {op} ?"
+                after_params = [value]
+            terms.append("(" + " AND ".join(equal + [after]) + ")")
+            params.extend(token[:i])
+            params.extend(after_params)
+        return "(" + " OR ".join(terms) + ")", params
+
+    def page(self, conn, after=None, limit=PAGE_SIZE, sort=None, desc=False):
+        """Retorna (linhas, token_da_próxima_página). O token é None na última página."""
+        keyed, token = self.page_keyed(conn, after, limit, sort, desc)
+        return [row for row, _key in keyed], token
+
+    def page_keyed(self, conn, after=None, limit=PAGE_SIZE, sort=None, desc=False):
+        """Como `page`, mas cada linha vem como (linha, chave_de_ordenação)."""
+        exprs = self._order_exprs(sort)
+        conditions, params = [], []
+        if self.where:
+            conditions.append(self.where)
+        if after is not None:
+            predicate, predicate_params = self._after(exprs, tuple(after), desc)
+            conditions.append(predicate)
+            params.extend(predicate_params)
+
+        direction = " DESC NULLS FIRST" if desc else ""
+        order = [f"{e}{direction}" for e in exprs] + [f"{self.key}{' DESC' if desc else ''}"]
+        # As expressões de ordenação (e a chave) vão no fim da linha para montar o próximo token
+        sql = (f"SELECT {self.select}, {', '.join(exprs + (self.key,))} FROM {self.from_clause}"
+               + (f" WHERE {' AND '.join(conditions)}" if conditions else "")
+               + f" ORDER BY {', '.join(order)} LIMIT ?")
+        params.append(limit)
+
+        width = len(exprs) + 1
+        rows = conn.execute(sql, params).fetchall()
+        keyed = [(row[:-width], tuple(row[-width:])) for row in rows]
+        token = keyed[-1][1] if len(rows) == limit else None
+        return keyed, token
+
+    def rows_by_keys(self, conn, keys, sort=None):
+        """Linhas atuais para as chaves informadas, como (linha, chave_de_ordenação).
+
+        Chaves ausentes do resultado correspondem a linhas apagadas."""
+        exprs = self._order_exprs(sort)
+        keys = list(keys)
+        result = []
+        # Limite de variáveis do SQLite: consulta em blocos
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            conditions = [f"{self.key} IN ({', '.join('?' for _ in chunk)})"]
+            if self.where:
+                conditions.append(self.where)
+            sql = (f"SELECT {self.select}, {', '.join(exprs + (self.key,))} FROM {self.from_clause}"
+                   f" WHERE {' AND '.join(conditions)}")
+            width = len(exprs) + 1
+            result.extend((row[:-width], tuple(row[-width:])) for row in conn.execute(sql, chunk))
+        return result
+
+
+class Listing:
+    """KeysetQuery ligada a uma conexão e à tabela acompanhada pelo change_log.
+
+    É a fonte de dados da VirtualTreeview: páginas, linhas avulsas e alterações."""
+
+    def __init__(self, conn, query, table, changes):
+        self.conn = conn
+        self.query = query
+        self.table = table
+        self.changes = changes
+
+    def page_keyed(self, after=None, limit=PAGE_SIZE, sort=None, desc=False):
+        return self.query.page_keyed(self.conn, after, limit, sort, desc)
+
+    def rows_by_keys(self, keys, sort=None):
+        return self.query.rows_by_keys(self.conn, keys, sort)
+
+    def current_seq(self):
+        return self.changes.current_seq()
+
+    def changed_since(self, seq):
+        return self.changes.since(self.table, seq)
+
+
+# ---------- Registro de alterações ----------
+class ChangeLogRepository:
+    """Leitura do change_log (mantido por triggers, ver database.SCHEMA_V3)."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def current_seq(self):
+        return self.conn.execute("SELECT IFNULL(MAX(seq), 0) FROM change_log").fetchone()[0]
+
+    def since(self, table, seq):
+        """IDs alterados em `table` depois de `seq`, e o novo seq.
+
+        Retorna (None, seq_atual) se o registro já foi podado além de `seq`:
+        nesse caso quem chamou deve recarregar tudo."""
+        oldest = self.conn.execute("SELECT MIN(seq) FROM change_log").fetchone()[0]
+        if oldest is not None and oldest > seq + 1:
+            return None, self.current_seq()
+        rows = self.conn.execute(
+            "SELECT seq, row_id FROM change_log WHERE table_name=? AND seq>? ORDER BY seq",
+            (table, seq)).fetchall()
+        new_seq = max(rows[-1][0], seq) if rows else seq
+        return {row_id for _, row_id in rows}, new_seq
+
+    @retrying
+    def prune(self, keep=10000):
+        """Mantém apenas as últimas `keep` entradas. Listas mais antigas que isso recarregam."""
+        with transaction(self.conn):
+            self.conn.execute("DELETE FROM change_log WHERE seq <= (SELECT MAX(seq) FROM change_log) - ?", (keep,))
+
+
+class BaseRepository:
+    # KeysetQuery e tabela do change_log usadas pela `listing` (quando houver)
+    LISTING = None
+    TABLE = None
+
+    def __init__(self, conn, changes=None, cache=None):
+        self.conn = conn
+        # Cache das consultas repetidas (usuário, placa, nome de peça); ver cache.py
+        self.cache = cache or LookupCache(conn)
+        if self.LISTING is not None:
+            self.listing = Listing(conn, self.LISTING, self.TABLE, changes or ChangeLogRepository(conn))
+
+
+# ---------- Usuários ----------
+class UsersRepository(BaseRepository):
+    TABLE = "users"
+    LISTING = KeysetQuery("id, username, email, phone, role", "users", "id",
+                          {"username": "username", "email": "email", "phone": "phone", "role": "role"})
+
+    def authenticate(self, username, password):
+        """Retorna o dicionário do usuário ou None se as credenciais forem inválidas."""
+        c = self.conn.cursor()
+        c.execute("SELECT id,username,fullname,email,phone,role,photo FROM users WHERE username=? AND password=?",
+                  (username, password))
+        row = c.fetchone()
+        if not row:
+            return None
+        return {
+            "id": row[0], "username": row[1], "fullname": row[2],
+            "email": row[3], "phone": row[4], "role": row[5], "photo": row[6]
+        }
+
+    @retrying
+    def register_client(self, username, password, fullname, email, phone, photo=""):
+        """Cadastra um cliente. Levanta sqlite3.IntegrityError se o usuário já existir."""
+        c = self.conn.cursor()
+        with transaction(self.conn):
+            c.execute(
+                "INSERT INTO users(username,password,fullname,email,phone,role,photo) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (username, password, fullname, email, phone, "client", photo))
+        return c.lastrowid
+
+    def get_id(self, username):
+        return self.cache.lookup("users", username, lambda: self._load_id(username))
+
+    def _load_id(self, username):
+        c = self.conn.cursor()
+        c.execute("SELECT id FROM users WHERE username=?", (username,))
+        row = c.fetchone()
+        return row[0] if row else None
+
+    def page(self, after=None, limit=PAGE_SIZE, sort=None, desc=False):
+        """(id, username, email, phone, role) paginado por chave."""
+        return self.LISTING.page(self.conn, after, limit, sort, desc)
+
+    @retrying
+    def delete(self, username):
+        with transaction(self.conn):
+            self.conn.execute("DELETE FROM users WHERE username=?", (username,))
+        self.cache.invalidate("users", username)
+        self.cache.invalidate("vehicle_checks")
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+
+# ---------- Peças ----------
+class PartsRepository(BaseRepository):
+    TABLE = "parts"
+    LISTING = KeysetQuery("id, name, sku, qty, price", "parts", "id",
+                          {"name": "name", "sku": "sku", "qty": "qty", "price": "price"})
+
+    @retrying
+    def add(self, name, sku, qty, price, description):
+        c = self.conn.cursor()
+        with transaction(self.conn):
+            c.execute("INSERT INTO parts(name,sku,qty,price,description) VALUES (?, ?, ?, ?, ?)",
+                      (name, sku, qty, price, description))
+        return c.lastrowid
+
+    def page(self, after=None, limit=PAGE_SIZE, sort=None, desc=False):
+        """(id, name, sku, qty, price) paginado por chave; usado no cadastro e no catálogo."""
+        return self.LISTING.page(self.conn, after, limit, sort, desc)
+
+    def search(self, text, limit=SEARCH_LIMIT):
+        """Peças que casam com o texto (prefixos de nome, SKU ou descrição). Mesmo formato do `page`.
+
+        Até SEARCH_RANK_CANDIDATES resultados, ordena por relevância (bm25: nome > SKU > descrição).
+        Acima disso o termo é amplo demais para a relevância ajudar e o bm25 custaria uma leitura por
+        resultado: devolve os primeiros `limit` encontrados, por nome. Texto sem palavras devolve []."""
+        query = fts_query(text)
+        if not query:
+            return []
+        c = self.conn.cursor()
+        c.execute("SELECT rowid FROM parts_fts WHERE parts_fts MATCH ? LIMIT ?",
+                  (query, SEARCH_RANK_CANDIDATES + 1))
+        ids = [row[0] for row in c.fetchall()]
+        if len(ids) <= SEARCH_RANK_CANDIDATES:
+            c.execute('''
+                      SELECT p.id, p.name, p.sku, p.qty, p.price
+                      FROM parts_fts f
+                               JOIN parts p ON p.id = f.rowid
+                      WHERE parts_fts MATCH ?
+                      ORDER BY bm25(parts_fts, 10.0, 5.0, 1.0)
+                      LIMIT ?
+                      ''', (query, limit))
+        else:
+            ids = ids[:limit]
+            c.execute(f"SELECT id, name, sku, qty, price FROM parts WHERE id IN ({','.join('?' * len(ids))}) "
+                      "ORDER BY name", ids)
+        return c.fetchall()
+
+    def find_by_skus(self, skus):
+        """{sku: (id, name, qty, price)} das peças cadastradas entre `skus` (as ausentes ficam de fora)."""
+        skus = list(dict.fromkeys(skus))
+        found = {}
+        for start in range(0, len(skus), IN_CHUNK_SIZE):
+            chunk = skus[start:start + IN_CHUNK_SIZE]
+            for part_id, name, sku, qty, price in self.conn.execute(
+                    f"SELECT id, name, sku, qty, price FROM parts WHERE sku IN ({','.join('?' * len(chunk))})",
+                    chunk):
+                found[sku] = (part_id, name, qty, price)
+        return found
+
+    def low_stock(self, limit=5):
+        c = self.conn.cursor()
+        c.execute("SELECT name, qty FROM parts ORDER BY qty ASC LIMIT ?", (limit,))
+        return c.fetchall()
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM parts").fetchone()[0]
+
+
+# ---------- Ferramentas ----------
+class ToolsRepository(BaseRepository):
+    TABLE = "tools"
+    LISTING = KeysetQuery("id, name, code, available", "tools", "id",
+                          {"name": "name", "code": "code", "available": "available"})
+
+    @retrying
+    def add(self, name, code, available, description=""):
+        c = self.conn.cursor()
+        with transaction(self.conn):
+            c.execute("INSERT INTO tools(name,code,available,description) VALUES (?, ?, ?, ?)",
+                      (name, code, available, description))
+        return c.lastrowid
+
+    def page(self, after=None, limit=PAGE_SIZE, sort=None, desc=False):
+        """(id, name, code, available) paginado por chave."""
+        return self.LISTING.page(self.conn, after, limit, sort, desc)
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM tools").fetchone()[0]
+
+
+# ---------- Veículos (Carros e Motos) ----------
+class VehiclesRepository(BaseRepository):
+    def __init__(self, conn, users, changes=None, cache=None):
+        changes = changes or ChangeLogRepository(conn)
+        super().__init__(conn, changes, cache)
+        self.users = users
+        self.cars_listing = Listing(conn, self.CARS_LISTING, "cars", changes)
+        self.motorcycles_listing = Listing(conn, self.MOTORCYCLES_LISTING, "motorcycles", changes)
+
+    def _owner_id(self, username):
+        client_id = self.users.get_id(username)
+        if client_id is None:
+            raise LookupError("Cliente (usuário) não encontrado. Cadastre o cliente primeiro.")
+        return client_id
+
+    @retrying
+    def add_car(self, username, plate, brand, model, year, color, engine):
+        """Cadastra um carro atrelado ao cliente.
+
+        Levanta LookupError se o usuário não existir e sqlite3.IntegrityError se a placa já existir."""
+        client_id = self._owner_id(username)
+        c = self.conn.cursor()
+        with transaction(self.conn):
+            c.execute(
+                "INSERT INTO cars(client_id, license_plate, brand, model, year, color, engine) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (client_id, plate, brand, model, year or None, color, engine))
+        # Validações "placa não cadastrada" guardadas para qualquer cliente
+        self.cache.invalidate("vehicle_checks")
+        return c.lastrowid
+
+    @retrying
+    def add_motorcycle(self, username, plate, brand, model, year, engine_cc):
+        """Cadastra uma moto atrelada ao cliente (mesmas exceções de add_car)."""
+        client_id = self._owner_id(username)
+        c = self.conn.cursor()
+        with transaction(self.conn):
+            c.execute(
+                "INSERT INTO motorcycles(client_id, license_plate, brand, model, year, engine_cc) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (client_id, plate, brand, model, year or None, engine_cc))
+        # Validações "placa não cadastrada" guardadas para qualquer cliente
+        self.cache.invalidate("vehicle_checks")
+        return c.lastrowid
+
+    CARS_LISTING = KeysetQuery(
+        "c.id, u.username, c.license_plate, c.brand, c.model, c.year, c.color, c.engine",
+        "cars c LEFT JOIN users u ON c.client_id = u.id", "c.id",
+        {"client": "u.username", "plate": "c.license_plate", "model": ("c.brand", "c.model"),
+         "year": "c.year", "color": "c.color", "engine": "c.engine"})
+
+    MOTORCYCLES_LISTING = KeysetQuery(
+        "m.id, u.username, m.license_plate, m.brand, m.model, m.year, m.engine_cc",
+        "motorcycles m LEFT JOIN users u ON m.client_id = u.id", "m.id",
+        {"client": "u.username", "plate": "m.license_plate", "model": ("m.brand", "m.model"),
+         "year": "m.year", "cc": "m.engine_cc"})
+
+    def page_cars(self, after=None, limit=PAGE_SIZE, sort=None, desc=False):
+        """(id, username, plate, brand, model, year, color, engine) paginado por chave."""
+        return self.CARS_LISTING.page(self.conn, after, limit, sort, desc)
+
+    def page_motorcycles(self, after=None, limit=PAGE_SIZE, sort=None, desc=False):
+        """(id, username, plate, brand, model, year, engine_cc) paginado por chave."""
+        return self.MOTORCYCLES_LISTING.page(self.conn, after, limit, sort, desc)
+
+    def check_vehicle_and_client(self, username, plate):
+        """Valida se a placa pertence ao cliente. Retorna (client_id, None) ou (None, mensagem_de_erro).
+
+        Uma única consulta: usuário pelo username e veículo pelo índice de placas (carro ou moto);
+        o resultado fica no cache, então reabrir OS para o mesmo veículo não vai ao banco."""
+        row = self.cache.lookup("vehicle_checks", (username, plate),
+                                lambda: self._load_vehicle_check(username, plate))
+        if not row:
+            return None, "Cliente (usuário) não encontrado."
+
+        client_id, vehicle_found, owner_id = row
+        if not vehicle_found:
+            return None, "Veículo com a placa informada não está cadastrado."
+
+        if owner_id != client_id:
+            return None, "O veículo não pertence ao cliente (usuário) informado."
+
+        return client_id, None
+
+    def _load_vehicle_check(self, username, plate):
+        c = self.conn.cursor()
+        c.execute(
+            "SELECT u.id, v.license_plate IS NOT NULL, v.client_id "
+            "FROM users u LEFT JOIN vehicle_index v ON v.license_plate = ? "
+            "WHERE u.username = ?",
+            (plate, username))
+        return c.fetchone()
+
+    def count_cars(self):
+        return self.conn.execute("SELECT COUNT(*) FROM cars").fetchone()[0]
+
+    def count_motorcycles(self):
+        return self.conn.execute("SELECT COUNT(*) FROM motorcycles").fetchone()[0]
+
+
+# ---------- Serviços (Ordens de Serviço) ----------
+class ServicesRepository(BaseRepository):
+    # Serviços abertos E AINDA NÃO FATURADOS (tela de Faturamento); faturar muda o status da OS,
+    # então o change_log de services também tira da lista as OS faturadas
+    OPEN_LISTING = KeysetQuery(
+        "s.id, u.username, s.vehicle_plate, s.labor_price, s.date",
+        "services s JOIN users u ON s.client_id = u.id", "s.id",
+        {"client": "u.username", "plate": "s.vehicle_plate", "date": "s.date", "mo_price": "s.labor_price"},
+        where="s.status = 'Aberto' AND NOT EXISTS (SELECT 1 FROM invoices i WHERE i.service_id = s.id)")
+
+    def __init__(self, conn, vehicles, changes=None, cache=None):
+        changes = changes or ChangeLogRepository(conn)
+        super().__init__(conn, changes, cache)
+        self.vehicles = vehicles
+        self.open_listing = Listing(conn, self.OPEN_LISTING, "services", changes)
+
+    @retrying
+    def open_service_order(self, client_id, plate, description, labor_price, items, seller_name):
+        """Abre uma OS com status 'Aberto' e registra as peças do carrinho.
+
+        `items` é uma sequência de (part_id, qty, price_unit). Retorna o ID da nova OS.
+        OS e itens são gravados na mesma transação (uma nova tentativa não duplica a OS)."""
+        with transaction(self.conn):
+            return self._open(client_id, plate, description, labor_price, items, seller_name,
+                              datetime.date.today().isoformat())
+
+    def _open(self, client_id, plate, description, labor_price, items, seller_name, date):
+        """Grava a OS e seus itens dentro da transação já aberta; devolve o ID da OS."""
+        c = self.conn.cursor()
+        # 1. Abre a OS no Banco
+        c.execute(
+            "INSERT INTO services(client_id, vehicle_plate, description, labor_price, final_total, date, status, seller_name) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (client_id, plate, description, labor_price, 0.0, date, "Aberto", seller_name))
+        new_service_id = c.lastrowid
+
+        # 2. Insere todos os itens do carrinho (peças) num único executemany
+        c.executemany(
+            "INSERT INTO service_parts (service_id, part_id, qty_used, price_unit) VALUES (?, ?, ?, ?)",
+            [(new_service_id, part_id, qty, price) for part_id, qty, price in items])
+        return new_service_id
+
+    def open_service_orders(self, orders, seller_name, chunk_size=ORDER_CHUNK_SIZE):
+        """Abre várias OS de uma vez (contratos de frota), em transações de até `chunk_size` OS.
+
+        `orders` é uma sequência de (username, plate, description, labor_price, items), com
+        `items` como em open_service_order; a mesma peça repetida numa OS vira um item só,
+        com as quantidades somadas. Cliente, placa e peças são conferidos antes da gravação,
+        OS vazias (sem peças nem mão de obra) são recusadas e cada OS é gravada no seu
+        SAVEPOINT: uma OS recusada não impede as demais. Retorna
+        [(sucesso, id_da_OS_ou_mensagem)] na ordem recebida."""
+        orders = [tuple(order) for order in orders]
+        results = [None] * len(orders)
+        part_ids = list({item[0] for order in orders for item in order[4]})
+        known_parts = set()
+        for start in range(0, len(part_ids), IN_CHUNK_SIZE):
+            chunk = part_ids[start:start + IN_CHUNK_SIZE]
+            known_parts.update(row[0] for row in self.conn.execute(
+                f"SELECT id FROM parts WHERE id IN ({','.join('?' * len(chunk))})", chunk))
+
+        valid = []  # (posição, client_id, plate, description, labor_price, items)
+        for index, (username, plate, description, labor_price, items) in enumerate(orders):
+            client_id, error = self.vehicles.check_vehicle_and_client(username, plate)
+            if error is None:
+                missing = sorted({item[0] for item in items} - known_parts)
+                if missing:
+                    error = f"Peça(s) não cadastrada(s): {', '.join(f'#{part_id}' for part_id in missing)}."
+                elif any(item[1] <= 0 for item in items):
+                    error = "Quantidade inválida (deve ser um número inteiro > 0)."
+                elif not items and not labor_price:
+                    error = "A OS está vazia. Adicione peças ou o valor da Mão de Obra."
+                else:
+                    items, error = self._merge_items(items)
+            if error is not None:
+                results[index] = (False, error)
+            else:
+                valid.append((index, client_id, plate, description, labor_price, items))
+
+        date = datetime.date.today().isoformat()
+        for start in range(0, len(valid), chunk_size):
+            chunk = valid[start:start + chunk_size]
+
+            def work():
+                outcome = []
+                with transaction(self.conn):
+                    for index, client_id, plate, description, labor_price, items in chunk:
+                        try:
+                            with transaction(self.conn):
+                                outcome.append((index, (True, self._open(client_id, plate, description, labor_price,
+                                                                         items, seller_name, date))))
+                        except (sqlite3.IntegrityError, sqlite3.InterfaceError, sqlite3.ProgrammingError) as e:
+                            # Dado recusado pelo banco: desfaz só esta OS
+                            outcome.append((index, (False, f"Erro ao abrir OS: {str(e)}")))
+                return outcome
+
+            try:
+                for index, result in retry_on_busy(self.conn, work):
+                    results[index] = result
+            except sqlite3.Error as e:
+                # Erro do banco derruba o lote inteiro (nada dele foi gravado)
+                for entry in chunk:
+                    results[entry[0]] = (False, f"Erro ao abrir OS: {str(e)}")
+        return results
+
+    @staticmethod
+    def _merge_items(items):
+        """Uma linha por peça (UNIQUE(service_id, part_id)), somando as quantidades: (itens, erro)."""
+        merged = {}
+        for part_id, qty, price in items:
+            if part_id in merged:
+                if merged[part_id][1] != price:
+                    return None, f"Peça #{part_id} repetida com preços diferentes."
+                merged[part_id][0] += qty
+            else:
+                merged[part_id] = [qty, price]
+        return [(part_id, qty, price) for part_id, (qty, price) in merged.items()], None
+
+    def list(self):
+        c = self.conn.cursor()
+        c.execute('''
+                  SELECT s.id, u.username, s.vehicle_plate, s.labor_price, s.final_total, s.date, s.status
+                  FROM services s
+                           LEFT JOIN users u ON s.client_id = u.id
+                  ORDER BY s.date DESC
+                  ''')
+        return c.fetchall()
+
+    def list_open_uninvoiced(self):
+        """Serviços abertos E AINDA NÃO FATURADOS: (id, username, plate, labor_price, date)."""
+        c = self.conn.cursor()
+        c.execute('''
+                  SELECT s.id, u.username, s.vehicle_plate, s.labor_price, s.date
+                  FROM services s
+                           JOIN users u ON s.client_id = u.id
+                           LEFT JOIN invoices i ON s.id = i.service_id
+                  WHERE s.status = 'Aberto'
+                    AND i.service_id IS NULL
+                  ORDER BY s.date DESC
+                  ''')
+        return c.fetchall()
+
+    def count_open(self):
+        return self.conn.execute("SELECT COUNT(*) FROM services WHERE status='Aberto'").fetchone()[0]
+
+    def closed_summary(self):
+        """(quantidade, soma de final_total) dos serviços fechados/faturados."""
+        cnt, total = self.conn.execute(
+            "SELECT COUNT(*), SUM(final_total) FROM services WHERE status='Fechado'").fetchone()
+        return cnt, total or 0.0
+
+
+# ---------- Faturas ----------
+class InvoicesRepository(BaseRepository):
+    TABLE = "invoices"
+    LISTING = KeysetQuery("id, service_id, total, date, paid", "invoices", "id",
+                          {"service": "service_id", "total": "total", "date": "date", "paid": "paid"})
+
+    def update_stock_and_invoice(self, service_id, is_paid):
+        """Fecha a OS, dá baixa no estoque e gera a fatura, tudo em BEGIN IMMEDIATE.
+
+        Retorna (True, final_total) em caso de sucesso ou (False, mensagem_de_erro)."""
+
+        def work():
+            with transaction(self.conn):
+                return self._invoice(service_id, is_paid)
+
+        try:
+            # Outra estação gravando: a transação inteira é refeita (ver database.retry_on_busy)
+            return True, retry_on_busy(self.conn, work)
+        except InvoiceError as e:
+            return False, str(e)
+        except sqlite3.Error as e:
+            return False, f"Erro ao processar estoque/fatura: {str(e)}"
+
+    def invoice_many(self, service_ids, is_paid, chunk_size=INVOICE_CHUNK_SIZE):
+        """Fatura várias OS de uma vez, em transações de até `chunk_size` OS.
+
+        Cada OS roda num SAVEPOINT: uma falha (estoque, OS já faturada) desfaz só aquela
+        OS e as demais seguem. Retorna [(service_id, sucesso, total_ou_mensagem), ...]
+        na ordem recebida."""
+        service_ids = list(service_ids)
+        results = []
+        for start in range(0, len(service_ids), chunk_size):
+            chunk = service_ids[start:start + chunk_size]
+
+            def work():
+                outcome = []
+                with transaction(self.conn):
+                    for service_id in chunk:
+                        try:
+                            with transaction(self.conn):
+                                outcome.append((service_id, True, self._invoice(service_id, is_paid)))
+                        except InvoiceError as e:
+                            outcome.append((service_id, False, str(e)))
+                return outcome
+
+            try:
+                chunk_results = retry_on_busy(self.conn, work)
+            except sqlite3.Error as e:
+                # Erro do banco derruba o lote inteiro (nada dele foi gravado)
+                chunk_results = [(service_id, False, f"Erro ao processar estoque/fatura: {str(e)}")
+                                 for service_id in chunk]
+            results.extend(chunk_results)
+        return results
+
+    def _invoice(self, service_id, is_paid):
+        """Fatura uma OS dentro da transação já aberta; levanta InvoiceError se não for possível.
+
+        Poucos comandos em conjunto, não um por peça: um agregado para o total, uma baixa
+        condicional (`qty >= necessário`) para todas as peças, um UPDATE e um INSERT."""
+        c = self.conn.cursor()
+
+        # 1. CALCULA O TOTAL DA OS (Mão de Obra + Peças) num único agregado
+        c.execute('''
+                  SELECT s.status,
+                         IFNULL(s.labor_price, 0),
+                         EXISTS (SELECT 1 FROM invoices i WHERE i.service_id = s.id),
+                         (SELECT COUNT(*) FROM service_parts sp WHERE sp.service_id = s.id),
+                         (SELECT IFNULL(SUM(sp.qty_used * sp.price_unit), 0)
+                          FROM service_parts sp
+                          WHERE sp.service_id = s.id)
+                  FROM services s
+                  WHERE s.id = ?
+                  ''', (service_id,))
+        row = c.fetchone()
+        if not row:
+            raise InvoiceError(f"OS #{service_id} não encontrada.")
+        status, mo_price, invoiced, lines, parts_total = row
+        if status != "Aberto" or invoiced:
+            raise InvoiceError(f"OS #{service_id} já foi faturada.")
+        final_total = mo_price + parts_total
+
+        # 2. BAIXA CONDICIONAL NO ESTOQUE: só linhas com saldo suficiente são atualizadas
+        c.execute("SAVEPOINT invoice_stock")
+        c.execute('''
+                  UPDATE parts
+                  SET qty = parts.qty - sp.qty_used
+                  FROM service_parts sp
+                  WHERE sp.service_id = ?
+                    AND sp.part_id = parts.id
+                    AND parts.qty >= sp.qty_used
+                  ''', (service_id,))
+        if c.rowcount != lines:
+            # Alguma peça sem saldo: desfaz a baixa parcial e informa TODAS as faltas
+            c.execute("ROLLBACK TO invoice_stock")
+            c.execute("RELEASE invoice_stock")
+            raise InvoiceError(self._shortage_message(service_id))
+        c.execute("RELEASE invoice_stock")
+
+        # 3. ATUALIZA O TOTAL DA OS E STATUS PARA FECHADO
+        c.execute("UPDATE services SET final_total = ?, status = 'Fechado' WHERE id=?", (final_total, service_id))
+
+        # 4. GERA A FATURA
+        date = datetime.date.today().isoformat()
+        c.execute("INSERT INTO invoices(service_id, total, date, paid) VALUES (?, ?, ?, ?)",
+                  (service_id, final_total, date, 1 if is_paid else 0))
+        return final_total
+
+    def _shortage_message(self, service_id):
+        rows = self.conn.execute('''
+                                 SELECT sp.part_id, p.sku, sp.qty_used, IFNULL(p.qty, 0)
+                                 FROM service_parts sp
+                                          LEFT JOIN parts p ON p.id = sp.part_id
+                                 WHERE sp.service_id = ?
+                                   AND (p.id IS NULL OR p.qty < sp.qty_used)
+                                 ORDER BY p.sku
+                                 ''', (service_id,)).fetchall()
+        lines = [f"- SKU {sku if sku is not None else f'(peça #{part_id} removida)'}. "
+                 f"Necessário: {needed}, Disponível: {available}"
+                 for part_id, sku, needed, available in rows]
+        return "Estoque insuficiente para as peças:\n" + "\n".join(lines)
+
+    def page(self, after=None, limit=PAGE_SIZE, sort=None, desc=False):
+        """(id, service_id, total, date, paid) paginado por chave."""
+        return self.LISTING.page(self.conn, after, limit, sort, desc)
+
+    def summary(self):
+        """(quantidade, soma dos totais) de todas as faturas."""
+        cnt, total = self.conn.execute("SELECT COUNT(*), SUM(total) FROM invoices").fetchone()
+        return cnt, total or 0.0
+
+
+# ---------- Fachada ----------
+class Repository:
+    """Ponto único de acesso aos dados: repo.users, repo.parts, repo.tools, repo.vehicles,
+    repo.services e repo.invoices compartilham a mesma conexão SQLite."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.changes = ChangeLogRepository(conn)
+        self.cache = LookupCache(conn)
+        self.users = UsersRepository(conn, self.changes, self.cache)
+        self.parts = PartsRepository(conn, self.changes, self.cache)
+        self.tools = ToolsRepository(conn, self.changes, self.cache)
+        self.vehicles = VehiclesRepository(conn, self.users, self.changes, self.cache)
+        self.services = ServicesRepository(conn, self.vehicles, self.changes, self.cache)
+        self.invoices = InvoicesRepository(conn, self.changes, self.cache)
+
+    STATS_COLUMNS = ("parts", "tools", "users", "cars", "motorcycles", "services_open")
+
+    def dashboard_counts(self):
+        """Contagens exibidas nos cards do Dashboard.
+
+        Lê a linha única de `stats` (mantida por triggers) em tempo constante; se a
+        linha não existir, recorre à contagem completa (que grava a linha)."""
+        counts = self.stored_counts()
+        if counts is None:
+            return self.recount_stats()
+        return counts
+
+    def stored_counts(self):
+        """Contagens da linha de `stats`, ou None se ela não existir (só leitura)."""
+        row = self.conn.execute(
+            f"SELECT {', '.join(self.STATS_COLUMNS)} FROM stats WHERE id = 1").fetchone()
+        if row is None:
+            return None
+        return dict(zip(self.STATS_COLUMNS, row))
+
+    def full_counts(self):
+        """Contagem completa (COUNT(*) em cada tabela), para verificação dos contadores."""
+        return {
+            "parts": self.parts.count(),
+            "tools": self.tools.count(),
+            "users": self.users.count(),
+            "services_open": self.services.count_open(),
+            "cars": self.vehicles.count_cars(),
+            "motorcycles": self.vehicles.count_motorcycles(),
+        }
+
+    def verify_stats(self):
+        """Compara `stats` com a contagem completa e corrige se houver divergência.
+
+        Retorna {coluna: (valor_em_stats, valor_real)} apenas para as colunas divergentes."""
+        stored = self.dashboard_counts()
+        actual = self.full_counts()
+        diff = {k: (stored[k], actual[k]) for k in self.STATS_COLUMNS if stored[k] != actual[k]}
+        if diff:
+            self.recount_stats()
+        return diff
+
+    def recount_stats(self):
+        """Recalcula a linha de `stats` a partir das tabelas e devolve as contagens."""
+
+        def work():
+            with transaction(self.conn):
+                self.conn.execute(STATS_RECOUNT_SQL)
+
+        retry_on_busy(self.conn, work)
+        return self.dashboard_counts()
+
+    def close(self):
+        self.conn.close()
+
+
+def open_repository(db_path):
+    """Abre uma conexão própria e devolve o Repository (uso headless)."""
+    return Repository(connect(db_path))
@@ -0,0 +1,80 @@
+"""
+M&M Tunning - Gerenciador de telas.
+
+Cada tela é montada uma única vez:
+- as telas da janela principal (boas-vindas, login, dashboard) são Frames
+  trocados com pack/pack_forget;
+- as telas modais são Toplevels escondidos com `withdraw` ao fechar e
+  reexibidos com `deiconify`.
+Ao reexibir uma tela só a sua função `on_show` roda, para atualizar os dados
+(listas, contadores, formulário limpo), sem recriar widgets nem a logo.
+"""
+
+import tkinter as tk
+
+
+class ScreenManager:
+    def __init__(self, root):
+        self.root = root
+        self.pages = {}  # nome -> (Frame, on_show) da janela principal
+        self.modals = {}  # nome -> (Toplevel, on_show)
+        self.current = None  # tela exibida na janela principal
+
+    # --- Telas da janela principal ---
+    def add_page(self, name, page, on_show=None):
+        self.pages[name] = (page, on_show)
+
+    def show_page(self, name):
+        """Exibe a tela `name` e atualiza seus dados; False se ela ainda não foi montada."""
+        entry = self.pages.get(name)
+        if entry is None or not entry[0].winfo_exists():
+            return False
+        page, on_show = entry
+        if self.current != name:
+            if self.current in self.pages:
+                self.pages[self.current][0].pack_forget()
+            page.pack(fill=tk.BOTH, expand=True)
+            self.current = name
+        if on_show:
+            on_show()
+        return True
+
+    # --- Telas modais ---
+    def add_modal(self, name, win, on_show=None):
+        """Registra e exibe a tela modal recém-montada; o botão X da janela passa a escondê-la."""
+        self.modals[name] = (win, on_show)
+        win.protocol("WM_DELETE_WINDOW", lambda: self.hide(win))
+        self._present(win)
+
+    def show_modal(self, name):
+        """Reexibe a tela modal `name` com os dados atualizados; False se ela ainda não foi montada."""
+        entry = self.modals.get(name)
+        if entry is None or not entry[0].winfo_exists():
+            return False
+        win, on_show = entry
+        if on_show:
+            on_show()
+        self._present(win)
+        return True
+
+    def _present(self, win):
+        win.deiconify()
+        win.attributes('-fullscreen', True)
+        win.lift()
+        win.grab_set()  # Impede interação com outras janelas
+        win.focus_set()
+
+    def hide(self, win):
+        """Fecha a tela modal sem destruí-la."""
+        win.grab_release()
+        win.withdraw()
+
+    def reset(self, keep=()):
+        """Destrói as telas montadas (exceto `keep`), p.ex. ao trocar de usuário."""
+        for name in [n for n in self.modals if n not in keep]:
+            self.modals.pop(name)[0].destroy()
+        for name in [n for n in self.pages if n not in keep]:
+            page = self.pages.pop(name)[0]
+            page.destroy()
+            if self.current == name:
+                self.current = None
@@ -0,0 +1,380 @@
+"""
+M&M Tunning - Servidor local HTTP/JSON (opcional) para as estações.
+
+Em vez de cada PC abrir o arquivo SQLite, um único processo o abre e atende
+as estações pela rede local (asyncio, só biblioteca padrão):
+- leituras rodam num pool pequeno de conexões somente leitura (WAL);
+- escritas vão para UMA conexão de escrita, por uma fila: os pedidos que chegam
+  enquanto um lote está sendo gravado são gravados juntos numa única transação,
+  cada um no seu SAVEPOINT (a falha de um não desfaz os outros).
+Assim não há disputa de lock entre estações e cada lote custa um único commit.
+
+Protocolo (JSON, UTF-8):
+    POST /api/<método>            corpo {"args": [...], "kwargs": {...}}
+    GET  /api/<método>?nome=valor só leituras; valores em JSON ou texto puro
+    GET  /api/health
+Resposta: {"result": ...} ou {"error": {"type": "...", "message": "..."}}.
+Os métodos são os do Repository (parts.search, services.open_service_order,
+invoices.update_stock_and_invoice...), liberados um a um em METHODS.
+
+Por padrão o servidor só aceita conexões da própria máquina (127.0.0.1). Para
+atender outras estações é obrigatório um token compartilhado (variável de
+ambiente MMTUNNING_TOKEN ou --token), conferido em todo pedido pelo cabeçalho
+"Authorization: Bearer <token>"; as estações usam a mesma variável.
+
+Uso:
+    python server.py [--port 8765] [--db mmtunning.db] [--readers 4]
+    MMTUNNING_TOKEN=segredo python server.py --host 0.0.0.0
+    MMTUNNING_TOKEN=segredo python main.py --server http://192.168.0.10:8765
+"""
+
+import argparse
+import asyncio
+import hmac
+import ipaddress
+import json
+import os
+import sqlite3
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qsl, urlsplit
+
+from database import DB_NAME, SCHEMA_VERSION, connect, init_db, retry_on_busy, transaction
+from repository import InvoiceError, Repository
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+TOKEN_ENV = "MMTUNNING_TOKEN"  # Variável de ambiente com o token compartilhado (servidor e estações)
+DEFAULT_READERS = 4  # Conexões de leitura (threads do pool)
+WRITE_BATCH_MAX = 100  # Pedidos de escrita gravados por transação, no máximo
+MAX_BODY = 10 * 1024 * 1024  # Tamanho máximo do corpo de um pedido (bytes)
+
+READ, WRITE = "read", "write"
+
+# Listagens paginadas (VirtualTreeview) e os métodos que elas usam
+LISTINGS = ("users.listing", "parts.listing", "tools.listing", "vehicles.cars_listing",
+            "vehicles.motorcycles_listing", "services.open_listing", "invoices.listing")
+LISTING_METHODS = ("page_keyed", "rows_by_keys", "current_seq", "changed_since")
+
+# Métodos do Repository atendidos pelo servidor; qualquer outro nome é recusado
+METHODS = {
+    "dashboard_counts": READ,
+    "full_counts": READ,
+    "verify_stats": WRITE,
+    "users.authenticate": READ,
+    "users.get_id": READ,
+    "users.register_client": WRITE,
+    "users.delete": WRITE,
+    "parts.search": READ,
+    "parts.find_by_skus": READ,
+    "parts.low_stock": READ,
+    "parts.add": WRITE,
+    "tools.add": WRITE,
+    "vehicles.check_vehicle_and_client": READ,
+    "vehicles.add_car": WRITE,
+    "vehicles.add_motorcycle": WRITE,
+    "services.list": READ,
+    "services.list_open_uninvoiced": READ,
+    "services.closed_summary": READ,
+    "services.open_service_order": WRITE,
+    "services.open_service_orders": WRITE,
+    "invoices.summary": READ,
+    "invoices.update_stock_and_invoice": WRITE,
+    "invoices.invoice_many": WRITE,
+}
+METHODS.update({f"{listing}.{method}": READ for listing in LISTINGS for method in LISTING_METHODS})
+
+# Erros esperados (dados inválidos, duplicados...) versus falhas do servidor
+CLIENT_ERRORS = (LookupError, ValueError, sqlite3.IntegrityError, InvoiceError)
+
+
+def is_loopback(host):
+    """True se `host` só aceita conexões da própria máquina (127.x, ::1, localhost)."""
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class BadRequest(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def resolve(repo, name):
+    """Método `name` ("parts.search", "invoices.listing.page_keyed"...) do Repository."""
+    target = repo
+    for part in name.split("."):
+        target = getattr(target, part)
+    return target
+
+
+def _json_default(value):
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Tipo não serializável: {type(value).__name__}")
+
+
+def _query_value(text):
+    # ?limit=5 -> 5, ?desc=true -> True, ?text=filtro -> "filtro"
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+class ApiServer:
+    def __init__(self, db_path=DB_NAME, readers=DEFAULT_READERS, batch_max=WRITE_BATCH_MAX, token=None):
+        self.db_path = db_path
+        self.token = token  # Exigido em todo pedido quando definido
+        self.batch_max = batch_max
+        self._local = threading.local()
+        self._readers = ThreadPoolExecutor(readers, "ApiReader", initializer=self._open_reader)
+        self._writer = ThreadPoolExecutor(1, "ApiWriter", initializer=self._open_writer)
+        self._writes = None  # asyncio.Queue, criada dentro do loop
+        self.reader_count = readers
+        self.requests = 0
+        self.write_batches = 0
+        self.writes = 0
+
+    # --- conexões (uma por thread) ---
+    def _open_reader(self):
+        repo = Repository(connect(self.db_path))
+        repo.conn.execute("PRAGMA query_only = 1")  # Leitor nunca grava nem segura lock de escrita
+        self._local.repo = repo
+
+    def _open_writer(self):
+        self._local.repo = Repository(connect(self.db_path))
+
+    def _read(self, name, args, kwargs):
+        return resolve(self._local.repo, name)(*args, **kwargs)
+
+    def _write_batch(self, batch):
+        """Grava o lote numa transação, cada pedido num SAVEPOINT. Retorna [(sucesso, resultado_ou_exceção)]."""
+        repo = self._local.repo
+        attempts = []
+
+        def work():
+            if attempts:
+                repo.cache.clear()  # A tentativa anterior foi desfeita por inteiro
+            attempts.append(1)
+            outcome = []
+            with transaction(repo.conn):
+                for name, args, kwargs in batch:
+                    try:
+                        with transaction(repo.conn):
+                            outcome.append((True, resolve(repo, name)(*args, **kwargs)))
+                    except Exception as e:
+                        outcome.append((False, e))
+            return outcome
+
+        return retry_on_busy(repo.conn, work)
+
+    # --- fila de escrita ---
+    async def _write_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._writes.get()]
+            # Junta o que chegou enquanto o lote anterior gravava (sem esperar por mais)
+            while len(batch) < self.batch_max and not self._writes.empty():
+                batch.append(self._writes.get_nowait())
+            try:
+                outcomes = await loop.run_in_executor(
+                    self._writer, self._write_batch, [(name, args, kwargs) for name, args, kwargs, _ in batch])
+            except Exception as e:
+                outcomes = [(False, e)] * len(batch)
+            self.write_batches += 1
+            self.writes += len(batch)
+            for (_name, _args, _kwargs, future), (ok, value) in zip(batch, outcomes):
+                if future.cancelled():
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+
+    # --- HTTP ---
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except BadRequest as e:
+                    self._send(writer, e.status, self._error(e), keep_alive=False)
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, target, version, headers, body = request
+                self.requests += 1
+                if self.authorized(headers):
+                    status, payload = await self.dispatch(method, target, body)
+                else:
+                    status, payload = HTTPStatus.UNAUTHORIZED, self._error(
+                        PermissionError("Token de acesso ausente ou inválido (MMTUNNING_TOKEN)."))
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                self._send(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass  # Estação desligada ou conexão interrompida
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            raise BadRequest(HTTPStatus.BAD_REQUEST, "Linha de requisição inválida.")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise BadRequest(HTTPStatus.BAD_REQUEST, "Content-Length inválido.")
+        if length > MAX_BODY:
+            raise BadRequest(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Corpo da requisição muito grande.")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target, version.upper(), headers, body
+
+    def authorized(self, headers):
+        if not self.token:
+            return True
+        scheme, _, token = headers.get("authorization", "").partition(" ")
+        return scheme.lower() == "bearer" and hmac.compare_digest(token.strip().encode(), self.token.encode())
+
+    @staticmethod
+    def _send(writer, status, payload, keep_alive):
+        body = json.dumps(payload, ensure_ascii=False, default=_json_default).encode("utf-8")
+        status = HTTPStatus(status)
+        head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                "Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+
+    @staticmethod
+    def _error(e):
+        return {"error": {"type": type(e).__name__, "message": str(e)}}
+
+    async def dispatch(self, http_method, target, body=b""):
+        """(status HTTP, resposta JSON) para um pedido."""
+        url = urlsplit(target)
+        if url.path == "/api/health":
+            return HTTPStatus.OK, {"result": self.health()}
+        name = url.path[len("/api/"):] if url.path.startswith("/api/") else ""
+        kind = METHODS.get(name)
+        try:
+            if kind is None:
+                raise BadRequest(HTTPStatus.NOT_FOUND, f"Método desconhecido: {url.path}")
+            if http_method == "GET":
+                if kind != READ:
+                    raise BadRequest(HTTPStatus.METHOD_NOT_ALLOWED, f"{name} grava dados: use POST.")
+                args, kwargs = [], {key: _query_value(value) for key, value in parse_qsl(url.query)}
+            elif http_method == "POST":
+                try:
+                    data = json.loads(body or b"{}")
+                    args, kwargs = data.get("args", []), data.get("kwargs", {})
+                except (ValueError, AttributeError):
+                    raise BadRequest(HTTPStatus.BAD_REQUEST, "Corpo JSON inválido.")
+                if not isinstance(args, list) or not isinstance(kwargs, dict):
+                    raise BadRequest(HTTPStatus.BAD_REQUEST, "Use {\"args\": [...], \"kwargs\": {...}}.")
+            else:
+                raise BadRequest(HTTPStatus.METHOD_NOT_ALLOWED, f"Método HTTP não suportado: {http_method}")
+        except BadRequest as e:
+            return e.status, self._error(e)
+
+        try:
+            if name == "dashboard_counts":
+                # Leitores são somente leitura: sem a linha de stats, a recontagem vai para a conexão de escrita
+                result = await self._call_read("stored_counts", args, kwargs)
+                if result is None:
+                    result = await self._call_write("recount_stats", [], {})
+            elif kind == READ:
+                result = await self._call_read(name, args, kwargs)
+            else:
+                result = await self._call_write(name, args, kwargs)
+        except TypeError as e:
+            return HTTPStatus.BAD_REQUEST, self._error(e)  # Argumentos errados para o método
+        except CLIENT_ERRORS as e:
+            return HTTPStatus.UNPROCESSABLE_ENTITY, self._error(e)
+        except Exception as e:
+            return HTTPStatus.INTERNAL_SERVER_ERROR, self._error(e)
+        return HTTPStatus.OK, {"result": result}
+
+    async def _call_read(self, name, args, kwargs):
+        return await asyncio.get_running_loop().run_in_executor(self._readers, self._read, name, args, kwargs)
+
+    async def _call_write(self, name, args, kwargs):
+        future = asyncio.get_running_loop().create_future()
+        await self._writes.put((name, args, kwargs, future))
+        return await future
+
+    def health(self):
+        return {"status": "ok", "schema": SCHEMA_VERSION, "readers": self.reader_count,
+                "requests": self.requests, "writes": self.writes, "write_batches": self.write_batches}
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT, ready=None):
+        """Atende até ser cancelado. `ready(host, port)` é chamado quando o socket está aberto."""
+        self._writes = asyncio.Queue()
+        write_task = asyncio.create_task(self._write_loop())
+        server = await asyncio.start_server(self._handle, host, port)
+        try:
+            if ready:
+                ready(*server.sockets[0].getsockname()[:2])
+            async with server:
+                await server.serve_forever()
+        finally:
+            write_task.cancel()
+            self.close()
+
+    def close(self):
+        self._readers.shutdown(wait=False)
+        self._writer.shutdown(wait=False)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor HTTP/JSON - M&M Tunning")
+    parser.add_argument("--host", default=DEFAULT_HOST,
+                        help="endereço (padrão: só esta máquina; 0.0.0.0 aceita outras estações e exige token)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--db", default=DB_NAME, help="arquivo do banco SQLite")
+    parser.add_argument("--readers", type=int, default=DEFAULT_READERS, help="conexões de leitura")
+    parser.add_argument("--token", default=os.environ.get(TOKEN_ENV),
+                        help=f"token exigido em todo pedido (padrão: variável {TOKEN_ENV})")
+    args = parser.parse_args(argv)
+    if not args.token and not is_loopback(args.host):
+        parser.error(f"--host {args.host} aceita outras máquinas: defina um token ({TOKEN_ENV} ou --token).")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Leitores e a conexão de escrita no mesmo processo: WAL para não se bloquearem
+    init_db(args.db, multi_user=True)
+    server = ApiServer(args.db, args.readers, token=args.token)
+    try:
+        asyncio.run(server.serve(args.host, args.port,
+                                 lambda host, port: print(f"Servidor em http://{host}:{port} (banco {args.db})",
+                                                          file=sys.stderr)))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,287 @@
+"""
+M&M Tunning - Rastreamento das consultas SQL (tempo, linhas e origem).
+
+`TracedConnection` é uma conexão sqlite3 cujos cursores medem cada comando:
+o tempo vai do `execute` até a última linha lida (ou até o cursor ser fechado/
+descartado), junto com a quantidade de linhas e o ponto do código que o
+executou (ex.: "repository.py:511 list_open_uninvoiced"). COMMIT e ROLLBACK
+também são medidos. As medidas ficam num buffer circular em memória
+(`RING_SIZE` comandos mais recentes), lido pela tela de Desempenho; as que
+passam de `SLOW_QUERY_MS` são gravadas no log de consultas lentas.
+
+Os callbacks do próprio SQLite completam o quadro quando algo trava: o trace
+anota o comando que começou a rodar e o progress handler, chamado durante a
+execução, registra no log um comando que ainda está rodando além do limite
+(antes mesmo de terminar, ou se nunca terminar).
+
+Uso:
+    tracer = QueryTracer()
+    conn = tracer.attach(connect(DB_NAME, factory=TracedConnection))
+"""
+
+import collections
+import datetime
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+# Comandos mais lentos que isto vão para o log de consultas lentas
+SLOW_QUERY_MS = 100
+SLOW_LOG_PATH = "consultas_lentas.log"
+
+# Comandos guardados em memória (os mais antigos são descartados)
+RING_SIZE = 5000
+
+# Instruções da VM do SQLite entre duas verificações do comando em andamento
+PROGRESS_STEPS = 100000
+
+# Arquivos ignorados ao procurar quem executou o comando (transações, novas tentativas)
+_SKIPPED_FILES = ("tracing.py", "database.py", "contextlib.py", "functools.py")
+
+
+def call_site():
+    """'arquivo.py:linha função' do primeiro chamador fora do rastreamento e dos utilitários do banco."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        name = os.path.basename(frame.f_code.co_filename)
+        if name not in _SKIPPED_FILES:
+            return f"{name}:{frame.f_lineno} {frame.f_code.co_name}"
+        frame = frame.f_back
+    return "?"
+
+
+def normalize_sql(sql):
+    return " ".join(sql.split())
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class QueryRecord:
+    __slots__ = ("sql", "elapsed", "rows", "site", "thread", "started")
+
+    def __init__(self, sql, site, thread, started):
+        self.sql = sql
+        self.elapsed = 0.0  # segundos
+        self.rows = 0
+        self.site = site
+        self.thread = thread
+        self.started = started  # time.time() do início
+
+
+class QueryTracer:
+    """Buffer circular das medidas e log das consultas lentas, compartilhado pelas conexões rastreadas."""
+
+    def __init__(self, slow_ms=SLOW_QUERY_MS, log_path=SLOW_LOG_PATH, capacity=RING_SIZE):
+        self.slow = slow_ms / 1000
+        self.log_path = log_path
+        self.records = collections.deque(maxlen=capacity)
+        self.total = 0  # Comandos medidos desde o início (inclusive os que já saíram do buffer)
+        self.slow_count = 0
+        self._lock = threading.Lock()
+
+    def attach(self, conn):
+        """Liga o rastreamento numa TracedConnection e a devolve."""
+        conn.tracer = self
+        conn.set_trace_callback(conn._on_statement)
+        conn.set_progress_handler(conn._on_progress, PROGRESS_STEPS)
+        return conn
+
+    def begin(self, sql):
+        return QueryRecord(sql, call_site(), threading.current_thread().name, time.time())
+
+    def finish(self, record):
+        with self._lock:
+            self.records.append(record)
+            self.total += 1
+            slow = record.elapsed >= self.slow
+            if slow:
+                self.slow_count += 1
+        if slow:
+            self._log(record.started, record.elapsed, f"{record.rows} linhas", record.site, record.thread,
+                      record.sql)
+
+    def running_too_long(self, sql, started, elapsed):
+        """Comando ainda em execução além do limite (chamado pelo progress handler, uma vez por comando)."""
+        self._log(started, elapsed, "EM ANDAMENTO", call_site(), threading.current_thread().name, sql)
+
+    def _log(self, started, elapsed, detail, site, thread, sql):
+        when = datetime.datetime.fromtimestamp(started).isoformat(timespec="milliseconds")
+        line = f"{when} | {elapsed * 1000:.1f} ms | {detail} | {site} | {thread} | {normalize_sql(sql)}\n"
+        try:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(line)
+        except OSError:
+            pass  # O log é auxiliar: nunca derruba a operação medida
+
+    def top(self, by="total", limit=20):
+        """Comandos agrupados pelo SQL, ordenados por tempo total (`by="total"`) ou p95 (`by="p95"`).
+
+        Cada item: {sql, calls, total_ms, mean_ms, p95_ms, max_ms, rows, site}."""
+        with self._lock:
+            records = list(self.records)
+        groups = {}
+        for record in records:
+            groups.setdefault(normalize_sql(record.sql), []).append(record)
+        summary = []
+        for sql, items in groups.items():
+            times = [r.elapsed * 1000 for r in items]
+            summary.append({
+                "sql": sql,
+                "calls": len(items),
+                "total_ms": sum(times),
+                "mean_ms": sum(times) / len(times),
+                "p95_ms": percentile(times, 0.95),
+                "max_ms": max(times),
+                "rows": sum(r.rows for r in items),
+                "site": items[-1].site,
+            })
+        summary.sort(key=lambda item: item[f"{by}_ms"], reverse=True)
+        return summary[:limit]
+
+    def clear(self):
+        """Zera o buffer e os contadores ("Limpar medidas" na tela de Desempenho)."""
+        with self._lock:
+            self.records.clear()
+            self.total = 0
+            self.slow_count = 0
+
+
+class TracedCursor(sqlite3.Cursor):
+    _record = None
+
+    def execute(self, sql, parameters=()):
+        return self._timed(sql, super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._timed(sql, super().executemany, sql, seq_of_parameters)
+
+    def _timed(self, sql, method, *args):
+        self._finish()
+        tracer = self.connection.tracer
+        if tracer is None:
+            method(*args)
+            return self
+        record = tracer.begin(sql)
+        start = time.perf_counter()
+        try:
+            method(*args)
+        except BaseException:
+            record.elapsed = time.perf_counter() - start
+            tracer.finish(record)
+            raise
+        record.elapsed = time.perf_counter() - start
+        if self.description is None:
+            # Sem linhas a ler (INSERT, UPDATE, BEGIN...): a medida termina aqui
+            record.rows = max(self.rowcount, 0)
+            tracer.finish(record)
+        else:
+            self._record = record
+        return self
+
+    def _fetched(self, method, *args):
+        record = self._record
+        if record is None:
+            return method(*args)
+        start = time.perf_counter()
+        result = method(*args)
+        record.elapsed += time.perf_counter() - start
+        return result
+
+    def fetchone(self):
+        row = self._fetched(super().fetchone)
+        if self._record is not None:
+            if row is None:
+                self._finish()
+            else:
+                self._record.rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        rows = self._fetched(super().fetchmany, size)
+        if self._record is not None:
+            self._record.rows += len(rows)
+            if len(rows) < size:
+                self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._fetched(super().fetchall)
+        if self._record is not None:
+            self._record.rows += len(rows)
+            self._finish()
+        return rows
+
+    def __next__(self):
+        row = self.fetchone()
+        if row is None:
+            raise StopIteration
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        # conn.execute(...).fetchone(): o cursor é descartado sem chegar ao fim das linhas
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+    def _finish(self):
+        record, self._record = self._record, None
+        if record is not None:
+            self.connection.tracer.finish(record)
+
+
+class TracedConnection(sqlite3.Connection):
+    """Conexão cujos comandos (inclusive `conn.execute`) passam por TracedCursor."""
+
+    tracer = None
+    _running = None  # [sql, início (perf_counter), time.time(), já registrado no log]
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        self._timed_end("COMMIT", super().commit)
+
+    def rollback(self):
+        self._timed_end("ROLLBACK", super().rollback)
+
+    def _timed_end(self, sql, method):
+        if self.tracer is None or not self.in_transaction:
+            method()
+            return
+        record = self.tracer.begin(sql)
+        start = time.perf_counter()
+        try:
+            method()
+        finally:
+            record.elapsed = time.perf_counter() - start
+            self.tracer.finish(record)
+
+    # --- callbacks do SQLite ---
+    def _on_statement(self, sql):
+        self._running = [sql, time.perf_counter(), time.time(), False]
+
+    def _on_progress(self):
+        running = self._running
+        if running is not None and not running[3]:
+            elapsed = time.perf_counter() - running[1]
+            if elapsed >= self.tracer.slow:
+                running[3] = True
+                self.tracer.running_too_long(running[0], running[2], elapsed)
+        return 0  # Continua a execução
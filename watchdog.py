@@ -0,0 +1,194 @@
+"""
+M&M Tunning - Monitor de latência do loop de eventos do Tk (opcional, --watchdog).
+
+Enquanto um callback roda (comando de botão, montagem de tela, `after`), o Tk
+não redesenha nem atende cliques: para o balcão, a tela "travou". O monitor:
+- agenda um batimento (`root.after`) a cada `HEARTBEAT_MS` e mede quanto ele
+  atrasou; os atrasos vão para um histograma;
+- envolve `tkinter.CallWrapper` (por onde passam todos os callbacks do Tk) e
+  mede cada callback, guardando o nome (ex.: MM_Tunning_App.build_dashboard);
+- grava no log de travamentos todo atraso ou callback acima de `STALL_MS`,
+  com o callback mais lento que rodou no intervalo.
+
+`install()` precisa ser chamado antes de montar as telas: o Tk guarda o
+CallWrapper de cada comando no momento em que o widget é criado.
+
+Uso:
+    watchdog = EventLoopWatchdog(root)
+    watchdog.install()
+    ... root.mainloop()
+    watchdog.report()
+"""
+
+import datetime
+import os
+import sys
+import time
+import tkinter
+
+# Intervalo entre batimentos e atraso (ou duração de callback) considerado travamento
+HEARTBEAT_MS = 50
+STALL_MS = 100
+STALL_LOG_PATH = "travamentos.log"
+
+# Limites superiores (ms) das faixas do histograma de atrasos; a última faixa é "acima de"
+HISTOGRAM_BOUNDS = (16, 33, 50, 100, 250, 500, 1000)
+
+
+def scheduled(func):
+    """A função agendada por `after`/`after_idle` (o Tk recebe uma função interna `callit`), ou a própria `func`."""
+    code = getattr(func, "__code__", None)
+    if code is not None and code.co_name == "callit" and "func" in code.co_freevars:
+        return func.__closure__[code.co_freevars.index("func")].cell_contents
+    return func
+
+
+def describe(func):
+    """Nome legível do callback: Classe.método, função (lambdas com arquivo:linha)."""
+    func = scheduled(func)
+    func = getattr(func, "__func__", func)
+    name = getattr(func, "__qualname__", None) or type(func).__qualname__
+    code = getattr(func, "__code__", None)
+    if code is not None and "<lambda>" in name:
+        name = f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    return name
+
+
+class EventLoopWatchdog:
+    def __init__(self, root, heartbeat_ms=HEARTBEAT_MS, stall_ms=STALL_MS, log_path=STALL_LOG_PATH):
+        self.root = root
+        self.heartbeat_ms = heartbeat_ms
+        self.stall = stall_ms / 1000
+        self.log_path = log_path
+        self.histogram = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+        self.beats = 0
+        self.max_delay = 0.0
+        self.stalls = 0
+        # nome do callback -> [execuções acima do limite, tempo total (s), maior (s)]
+        self.slow_callbacks = {}
+        self._slowest = None  # (segundos, nome) do callback mais lento desde o último batimento
+        # Callbacks em execução (aninhados quando um deles roda um loop interno, ex.: messagebox):
+        # [última vez que o loop foi atendido, maior intervalo sem atendimento]
+        self._running = []
+        self._expected = None
+        self._after_id = None
+        self._original_wrapper = None
+
+    # --- instalação ---
+    def install(self):
+        """Passa a medir os callbacks do Tk e começa os batimentos."""
+        if self._original_wrapper is None:
+            self._original_wrapper = tkinter.CallWrapper
+            tkinter.CallWrapper = self._make_wrapper(self._original_wrapper)
+        self._schedule()
+
+    def uninstall(self):
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        if self._original_wrapper is not None:
+            tkinter.CallWrapper = self._original_wrapper
+            self._original_wrapper = None
+
+    def _make_wrapper(self, base):
+        watchdog = self
+
+        class TimedCallWrapper(base):
+            def __call__(self, *args):
+                watchdog._enter()
+                try:
+                    return super().__call__(*args)
+                finally:
+                    watchdog._exit(self.func)
+
+        return TimedCallWrapper
+
+    # --- medidas ---
+    def _enter(self):
+        now = time.perf_counter()
+        if self._running:
+            # Um callback dentro de outro: o loop do Tk está sendo atendido (messagebox, update)
+            outer = self._running[-1]
+            outer[1] = max(outer[1], now - outer[0])
+        self._running.append([now, 0.0])
+
+    def _exit(self, func):
+        now = time.perf_counter()
+        mark, longest = self._running.pop()
+        # Conta só o maior trecho sem atender o loop: o tempo com uma messagebox aberta não é travamento
+        blocked = max(longest, now - mark)
+        if self._running:
+            self._running[-1][0] = now
+        self._callback_done(func, blocked)
+
+    def _callback_done(self, func, seconds):
+        name = None
+        if seconds >= self.stall:
+            name = describe(func)
+            entry = self.slow_callbacks.setdefault(name, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+            self._log(f"CALLBACK {seconds * 1000:.1f} ms | {name}")
+        if (self._slowest is None or seconds > self._slowest[0]) and scheduled(func) != self._beat:
+            self._slowest = (seconds, name or describe(func))
+
+    def _schedule(self):
+        self._expected = time.perf_counter() + self.heartbeat_ms / 1000
+        self._after_id = self.root.after(self.heartbeat_ms, self._beat)
+
+    def _beat(self):
+        delay = max(0.0, time.perf_counter() - self._expected)
+        self.beats += 1
+        self.max_delay = max(self.max_delay, delay)
+        ms = delay * 1000
+        bucket = next((i for i, bound in enumerate(HISTOGRAM_BOUNDS) if ms < bound), len(HISTOGRAM_BOUNDS))
+        self.histogram[bucket] += 1
+        if delay >= self.stall:
+            self.stalls += 1
+            culprit = "nenhum callback Python (redesenho, imagens ou sistema)"
+            if self._slowest is not None:
+                culprit = f"{self._slowest[1]} ({self._slowest[0] * 1000:.1f} ms)"
+            self._log(f"ATRASO {ms:.1f} ms | durante: {culprit}")
+        self._slowest = None
+        self._schedule()
+
+    def _log(self, text):
+        line = f"{datetime.datetime.now().isoformat(timespec='milliseconds')} | {text}\n"
+        try:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(line)
+        except OSError:
+            pass  # O log é auxiliar: nunca interrompe a interface
+
+    # --- relatório ---
+    def histogram_lines(self):
+        lines = []
+        lower = 0
+        for i, count in enumerate(self.histogram):
+            label = f"{lower}-{HISTOGRAM_BOUNDS[i]} ms" if i < len(HISTOGRAM_BOUNDS) else f">= {lower} ms"
+            share = count / self.beats if self.beats else 0
+            lines.append(f"{label:>13s}: {count:7d}  {'#' * round(share * 40)}")
+            if i < len(HISTOGRAM_BOUNDS):
+                lower = HISTOGRAM_BOUNDS[i]
+        return lines
+
+    def top_callbacks(self, limit=10):
+        """[(nome, vezes acima do limite, total ms, maior ms)] ordenado pelo tempo total."""
+        items = [(name, n, total * 1000, worst * 1000) for name, (n, total, worst) in self.slow_callbacks.items()]
+        items.sort(key=lambda item: item[2], reverse=True)
+        return items[:limit]
+
+    def summary(self):
+        lines = [f"Batimentos: {self.beats} (a cada {self.heartbeat_ms} ms); atrasos >= {self.stall * 1000:.0f} ms: "
+                 f"{self.stalls}; maior atraso: {self.max_delay * 1000:.1f} ms"]
+        lines += self.histogram_lines()
+        top = self.top_callbacks()
+        if top:
+            lines.append(f"Callbacks acima de {self.stall * 1000:.0f} ms (vezes / total / maior):")
+            lines += [f"  {name}: {n} / {total:.1f} ms / {worst:.1f} ms" for name, n, total, worst in top]
+        return "\n".join(lines)
+
+    def report(self):
+        print("Loop de eventos do Tk:", file=sys.stderr)
+        print(self.summary(), file=sys.stderr)
@@ -0,0 +1,248 @@
+"""
+M&M Tunning - Widgets reutilizáveis da interface Tkinter.
+"""
+
+import tkinter as tk
+from tkinter import ttk
+from bisect import bisect_left
+from functools import cmp_to_key
+
+from repository import PAGE_SIZE
+
+SORT_ASC_MARK = " ▲"
+SORT_DESC_MARK = " ▼"
+
+
+def _sql_rank(value):
+    """Ordem de tipos do SQLite: NULL < números < texto < blob."""
+    if value is None:
+        return 0, 0
+    if isinstance(value, (int, float)):
+        return 1, value
+    if isinstance(value, str):
+        return 2, value
+    return 3, value
+
+
+def compare_sort_keys(a, b, desc=False):
+    """Compara duas chaves de ordenação como o ORDER BY da KeysetQuery (NULLS FIRST)."""
+    for x, y in zip(a, b):
+        if x is None or y is None:
+            if x is None and y is None:
+                continue
+            return -1 if x is None else 1
+        rx, ry = _sql_rank(x), _sql_rank(y)
+        if rx == ry:
+            continue
+        result = -1 if rx < ry else 1
+        return -result if desc else result
+    return 0
+
+
+class VirtualTreeview(ttk.Frame):
+    """Treeview que carrega os dados por páginas conforme o usuário rola a lista.
+
+    `listing` é um `repository.Listing` (páginas por chave, linhas avulsas e
+    alterações do change_log) e `format_row(linha)` devolve (iid, text, values).
+    Clicar no cabeçalho reordena a consulta no próprio SQL, sem ordenar em Python.
+    `sync()` aplica apenas as linhas inseridas, alteradas ou removidas desde a
+    última sincronização, usando a chave primária como iid.
+
+    `columns` é uma lista de (id, título, largura, alinhamento, ordenável)."""
+
+    # Fração da barra de rolagem a partir da qual a próxima página é buscada
+    LOAD_THRESHOLD = 0.9
+
+    def __init__(self, parent, columns, listing, format_row, sort=None, desc=False,
+                 page_size=PAGE_SIZE, **tree_options):
+        super().__init__(parent)
+        self.listing = listing
+        self.format_row = format_row
+        self.sort = sort
+        self.desc = desc
+        self.page_size = page_size
+        self._token = None
+        self._exhausted = False
+        self._load_pending = False
+        self._seq = None
+        # Primeira página pedida ao worker (reload_in) e ainda sem resposta
+        self._loading = False
+        self._generation = 0
+        # Chaves de ordenação das linhas carregadas, na ordem exibida
+        self._order = []
+        self._keys = {}
+        self._headings = {}
+
+        self.tree = ttk.Treeview(self, columns=[c[0] for c in columns], show="headings", **tree_options)
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self._on_yscroll)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        for col_id, heading, width, anchor, sortable in columns:
+            self._headings[col_id] = heading
+            command = (lambda c=col_id: self.sort_by(c)) if sortable else None
+            self.tree.heading(col_id, text=heading, command=command)
+            self.tree.column(col_id, width=width, anchor=anchor)
+        self._update_headings()
+
+    # --- API usada pelas telas (mesmos nomes do ttk.Treeview) ---
+    def selection(self):
+        return self.tree.selection()
+
+    def item(self, iid, option=None, **kw):
+        return self.tree.item(iid, option, **kw)
+
+    def bind(self, sequence=None, func=None, add=None):
+        return self.tree.bind(sequence, func, add)
+
+    def set(self, iid, column=None, value=None):
+        return self.tree.set(iid, column, value)
+
+    # --- Paginação ---
+    def reload(self):
+        """Descarta as linhas carregadas e busca a primeira página."""
+        self._clear()
+        self._exhausted = False
+        # Guarda o seq antes de ler: alterações concorrentes serão reaplicadas no próximo sync
+        self._seq = self.listing.current_seq()
+        self.load_more()
+
+    def reload_in(self, submit, listing_of, on_loaded=None):
+        """Como `reload`, mas a primeira página é lida no worker (`submit` = DBWorker.submit).
+
+        `listing_of(repo)` devolve a mesma listagem no Repository do worker e
+        `on_loaded(erro)` é chamado na thread do Tk quando a página chega (erro None)."""
+        self._clear()
+        self._exhausted = True  # Nada a paginar até a primeira página chegar
+        self._seq = None
+        self._loading = True
+        generation, sort, desc, limit = self._generation, self.sort, self.desc, self.page_size
+
+        def job(repo):
+            listing = listing_of(repo)
+            seq = listing.current_seq()  # Antes de ler, como em reload
+            return seq, listing.page_keyed(None, limit, sort, desc)
+
+        def done(result):
+            # Ignora a resposta se a lista foi recarregada (ou fechada) enquanto isso
+            if generation != self._generation or not self.winfo_exists():
+                return
+            self._loading = False
+            self._seq, (rows, self._token) = result
+            self._append(rows)
+            if on_loaded:
+                on_loaded(None)
+
+        def failed(error):
+            if generation != self._generation or not self.winfo_exists():
+                return
+            self._loading = False  # Sem seq: o próximo sync recarrega
+            if on_loaded:
+                on_loaded(error)
+
+        submit(job, done, failed)
+
+    def _clear(self):
+        self.tree.delete(*self.tree.get_children())
+        self._order = []
+        self._keys = {}
+        self._token = None
+        self._loading = False
+        self._generation += 1
+
+    def load_more(self):
+        self._load_pending = False
+        if self._exhausted:
+            return
+        rows, self._token = self.listing.page_keyed(self._token, self.page_size, self.sort, self.desc)
+        self._append(rows)
+
+    def _append(self, rows):
+        for row, key in rows:
+            iid, text, values = self.format_row(row)
+            if iid in self._keys:
+                # Linha alterada para depois da janela carregada desde o último sync
+                self._remove(iid)
+            self.tree.insert("", tk.END, iid=iid, text=text, values=values)
+            self._order.append(key)
+            self._keys[iid] = key
+        self._exhausted = self._token is None
+
+    def _on_yscroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if not self._exhausted and not self._load_pending and float(last) >= self.LOAD_THRESHOLD:
+            # Adia para não inserir linhas dentro do próprio callback de rolagem
+            self._load_pending = True
+            self.after_idle(self.load_more)
+
+    # --- Atualização incremental ---
+    def sync(self):
+        """Aplica as alterações do change_log desde a última leitura (O(alterações))."""
+        if self._loading:
+            return  # A página pedida ao worker já traz o estado atual
+        if self._seq is None:
+            self.reload()
+            return
+        changed, self._seq = self.listing.changed_since(self._seq)
+        if changed is None:
+            self.reload()
+            return
+        if not changed:
+            return
+        current = {}
+        for row, key in self.listing.rows_by_keys(changed, self.sort):
+            current[key[-1]] = (row, key)
+        for row_id in changed:
+            if row_id in current:
+                self._place(*current[row_id])
+            elif str(row_id) in self._keys:
+                self._remove(str(row_id))
+
+    def _sort_key(self):
+        return cmp_to_key(lambda a, b: compare_sort_keys(a, b, self.desc))
+
+    def _remove(self, iid):
+        self._remove_key_only(iid)
+        self.tree.delete(iid)
+
+    def _place(self, row, key):
+        """Insere ou move a linha para a posição correta entre as já carregadas."""
+        iid, text, values = self.format_row(row)
+        if iid in self._keys:
+            self._remove_key_only(iid)
+        sort_key = self._sort_key()
+        index = bisect_left(self._order, sort_key(key), key=sort_key)
+        if index == len(self._order) and not self._exhausted:
+            # Fica depois da última linha carregada: virá na próxima página
+            if self.tree.exists(iid):
+                self.tree.delete(iid)
+            return
+        self._order.insert(index, key)
+        self._keys[iid] = key
+        if self.tree.exists(iid):
+            self.tree.item(iid, text=text, values=values)
+            self.tree.move(iid, "", index)
+        else:
+            self.tree.insert("", index, iid=iid, text=text, values=values)
+
+    def _remove_key_only(self, iid):
+        key = self._keys.pop(iid)
+        sort_key = self._sort_key()
+        self._order.pop(bisect_left(self._order, sort_key(key), key=sort_key))
+
+    # --- Ordenação ---
+    def sort_by(self, col_id):
+        if self.sort == col_id:
+            self.desc = not self.desc
+        else:
+            self.sort, self.desc = col_id, False
+        self._update_headings()
+        self.reload()
+
+    def _update_headings(self):
+        for col_id, heading in self._headings.items():
+            mark = ""
+            if col_id == self.sort:
+                mark = SORT_DESC_MARK if self.desc else SORT_ASC_MARK
+            self.tree.heading(col_id, text=heading + mark)
@@ -0,0 +1,94 @@
+"""
+M&M Tunning - Worker de banco de dados em segundo plano.
+
+O loop do Tk nunca deve esperar o SQLite: consultas demoradas (contagens do
+Dashboard, relatórios, faturamento) são enviadas para uma thread que possui a
+sua própria conexão. O resultado volta para a thread do Tk por uma fila lida
+com `root.after`, nunca chamando widgets a partir da thread do worker.
+
+Uso:
+    worker = DBWorker(root, DB_NAME)
+    worker.submit(lambda repo: repo.dashboard_counts(), on_done=mostrar_cards)
+"""
+
+import queue
+import threading
+
+from database import connect
+from repository import Repository
+
+
+class DBWorker:
+    # Intervalo (ms) em que a thread do Tk verifica se há resultados prontos
+    POLL_MS = 20
+
+    def __init__(self, root, db_path, repo_factory=None):
+        self.root = root
+        self.db_path = db_path
+        # repo_factory() cria o repositório na thread do worker (ex.: RemoteRepository); padrão: SQLite local
+        self.repo_factory = repo_factory
+        self._requests = queue.Queue()
+        self._results = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="DBWorker", daemon=True)
+        self._thread.start()
+        self._stopped = False
+        self._poll_id = self.root.after(self.POLL_MS, self._poll)
+
+    def submit(self, job, on_done=None, on_error=None):
+        """Agenda `job(repo)` na thread do worker.
+
+        `on_done(resultado)` ou `on_error(exceção)` são chamados depois, na thread do Tk."""
+        self._requests.put((job, on_done, on_error))
+
+    def notify(self, callback, value):
+        """Chamado de dentro de um job: agenda `callback(value)` na thread do Tk (ex.: progresso)."""
+        self._results.put((callback, value, False))
+
+    def stop(self):
+        self._requests.put(None)
+        self._stopped = True
+        if self._poll_id is not None:
+            self.root.after_cancel(self._poll_id)
+            self._poll_id = None
+
+    # --- thread do worker ---
+    def _run(self):
+        # A conexão pertence a esta thread (sqlite3 não compartilha conexões entre threads)
+        repo = self.repo_factory() if self.repo_factory else Repository(connect(self.db_path))
+        try:
+            while True:
+                request = self._requests.get()
+                if request is None:
+                    break
+                job, on_done, on_error = request
+                try:
+                    result = job(repo)
+                except Exception as e:
+                    if repo.conn is not None and repo.conn.in_transaction:
+                        repo.conn.rollback()
+                    self._results.put((on_error, e, True))
+                else:
+                    self._results.put((on_done, result, False))
+        finally:
+            repo.close()
+
+    # --- thread do Tk ---
+    def _poll(self):
+        try:
+            while True:
+                try:
+                    callback, value, failed = self._results.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    if callback is not None:
+                        callback(value)
+                    elif failed:
+                        # Erro sem tratador: deixa o Tk reportar, como em qualquer callback
+                        self.root.report_callback_exception(type(value), value, value.__traceback__)
+                except Exception as e:
+                    # Um on_done/on_error com erro é reportado, sem impedir a entrega dos próximos resultados
+                    self.root.report_callback_exception(type(e), e, e.__traceback__)
+        finally:
+            if not self._stopped:
+                self._poll_id = self.root.after(self.POLL_MS, self._poll)